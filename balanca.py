@@ -0,0 +1,191 @@
+import argparse
+import os
+
+import pandas as pd
+
+from dicionario import carregar_dicionarios, traduzir_coluna
+from esquema import FORMATOS, aplicar_esquema, concatenar, gravar_tabela
+from f_mun_pato import (_descrever_filtro, _exibir_mensagens, _municipio_ou_padrao, _processar_arquivo,
+                        _resumir_arquivos)
+from leitor_bruto import (MOTOR_PADRAO, MOTORES, TAMANHO_BLOCO_PADRAO, executar_por_arquivo, listar_arquivos_anuais,
+                          normalizar_filtro, resolver_motor)
+from pipeline import ordenar_e_traduzir
+from relatorio import NIVEIS, avisar, definir_verbosidade, etapa, mostrar
+
+# Exportação e importação processadas juntas: os arquivos anuais das duas pastas entram
+# numa única leitura (os dois fluxos se sobrepõem no mesmo pool de processos), cada linha
+# recebe a coluna FLUXO ('EXP' ou 'IMP') e as ordenações e traduções rodam uma vez só
+# sobre os dados combinados (f_sh6 conta as frequências dentro de cada fluxo). Além das
+# tabelas ordenadas, grava a balança comercial do município por ano, por SH4 e por país:
+# exportado, importado e saldo (exportado - importado) de VL_FOB e KG_LIQUIDO.
+FLUXOS = ('EXP', 'IMP')
+MEDIDAS = ['VL_FOB', 'KG_LIQUIDO']
+
+# Tabela de balança → coluna de agrupamento
+BALANCAS = {
+    'ano': 'CO_ANO',
+    'sh4': 'SH4',
+    'pais': 'CO_PAIS',
+}
+
+
+def filtrar_fluxos(pasta_exportacoes, pasta_importacoes, codigo_municipio=None,
+                   tamanho_bloco=TAMANHO_BLOCO_PADRAO, workers=1, uf=None, pre_filtro=False, pasta_indice=None,
+                   motor=MOTOR_PADRAO):
+    """
+    Filtra numa única leitura os arquivos anuais de exportação e de importação.
+    Com workers > 1 os arquivos dos dois fluxos são distribuídos no mesmo pool.
+    Retorna o DataFrame combinado com a coluna FLUXO, ordenado por ano e mês (ou None
+    se nada foi encontrado). Filtros e opções como em processar_arquivos_mal_formatados;
+    sem codigo_municipio nem uf, filtra o município 4118501 (só com uf, a UF inteira)
+    """
+
+    codigos, ufs = normalizar_filtro(_municipio_ou_padrao(codigo_municipio, uf), uf)
+
+    tarefas = []
+    for fluxo, pasta in zip(FLUXOS, (pasta_exportacoes, pasta_importacoes)):
+        if pasta is None:
+            continue
+        arquivos = listar_arquivos_anuais(pasta)
+        if not arquivos:
+            avisar(f"Nenhum arquivo CSV encontrado em {pasta}")
+        tarefas += [(fluxo, arquivo) for arquivo in arquivos]
+
+    if not tarefas:
+        return None
+
+    mostrar(f"Encontrados {len(tarefas)} arquivos CSV (exportação e importação)")
+
+    with etapa('filtrar_fluxos', filtro=_descrever_filtro(codigos, ufs)) as metricas:
+        dados_filtrados = []
+        medidas = []
+
+        arquivos = [arquivo for _, arquivo in tarefas]
+        motor = resolver_motor(motor, arquivos, tamanho_bloco)
+        resultados = executar_por_arquivo(_processar_arquivo, arquivos, workers,
+                                          codigos, ufs, tamanho_bloco, pre_filtro, pasta_indice, motor)
+        for (fluxo, _), (df_filtrado, mensagens, medida) in zip(tarefas, resultados):
+            _exibir_mensagens(mensagens, medida)
+            medida['fluxo'] = fluxo
+            medidas.append(medida)
+            if df_filtrado is not None:
+                dados_filtrados.append(df_filtrado.assign(FLUXO=fluxo))
+
+        _resumir_arquivos(metricas, medidas)
+
+        if not dados_filtrados:
+            metricas['linhas_saida'] = 0
+            avisar(f"\n🚫 Nenhum dado encontrado para {_descrever_filtro(codigos, ufs)}")
+            return None
+
+        df_final = concatenar(dados_filtrados)
+        df_final = df_final.sort_values(['CO_ANO', 'CO_MES'], kind='stable', ignore_index=True)
+        metricas['linhas_saida'] = len(df_final)
+
+    return df_final
+
+
+def calcular_balanca(df, coluna):
+    """
+    Exportado, importado e saldo de VL_FOB e KG_LIQUIDO para cada valor de 'coluna'
+    (CO_ANO, SH4, CO_PAIS...), a partir do DataFrame com FLUXO de filtrar_fluxos.
+    Colunas: coluna, VL_FOB_EXP, VL_FOB_IMP, VL_FOB_SALDO, KG_LIQUIDO_EXP, ...
+    """
+
+    somas = df.groupby([coluna, 'FLUXO'], observed=True)[MEDIDAS].sum().unstack('FLUXO', fill_value=0)
+
+    tabela = pd.DataFrame(index=somas.index)
+    for medida in MEDIDAS:
+        # Um fluxo sem nenhum registro aparece como zero
+        for fluxo in FLUXOS:
+            tabela[f"{medida}_{fluxo}"] = somas[(medida, fluxo)] if (medida, fluxo) in somas.columns else 0
+        tabela[f"{medida}_SALDO"] = tabela[f"{medida}_EXP"] - tabela[f"{medida}_IMP"]
+
+    return aplicar_esquema(tabela.astype('int64').sort_index().reset_index())
+
+
+def _traduzir_balanca(tabela, coluna, dicionarios):
+    """
+    Acrescenta NO_SH4_POR ou NO_PAIS ao lado do código nas balanças por SH4 e por país
+    """
+
+    if dicionarios is None or coluna not in ('SH4', 'CO_PAIS'):
+        return tabela
+
+    tabela_sh4, tabela_pais = dicionarios
+    nome, tabela_codigos = ('NO_SH4_POR', tabela_sh4) if coluna == 'SH4' else ('NO_PAIS', tabela_pais)
+    tabela.insert(1, nome, traduzir_coluna(tabela[coluna], tabela_codigos)[0])
+    return tabela
+
+
+def executar_balanca(pasta_exportacoes, pasta_importacoes, pasta_saida, arquivo_sh4, arquivo_pais,
+                     codigo_municipio=None, prefixo="dados", salvar_intermediarios=False, dicionarios=None,
+                     formato='csv', **opcoes_filtro):
+    """
+    Uma execução para os dois fluxos: filtra exportação e importação juntas, grava as
+    duas ordenações traduzidas (com a coluna FLUXO) como executar_pipeline e as
+    balanças <prefixo>_balanca_ano.csv, <prefixo>_balanca_sh4.csv e <prefixo>_balanca_pais.csv.
+    opcoes_filtro são repassadas a filtrar_fluxos (workers, uf, pre_filtro, pasta_indice,
+    tamanho_bloco, motor), que aplica o mesmo município padrão. Retorna a lista de arquivos gravados
+    """
+
+    if dicionarios is None:
+        dicionarios = carregar_dicionarios(arquivo_sh4, arquivo_pais)
+        if dicionarios is None:
+            return []
+
+    df_filtrado = filtrar_fluxos(pasta_exportacoes, pasta_importacoes, codigo_municipio, **opcoes_filtro)
+    if df_filtrado is None:
+        return []
+    mostrar(f"✅ Registros filtrados: {len(df_filtrado)} "
+            f"({(df_filtrado['FLUXO'] == 'EXP').sum()} de exportação)")
+
+    arquivos_salvos = ordenar_e_traduzir(df_filtrado, pasta_saida, *dicionarios, prefixo,
+                                         salvar_intermediarios, formato)
+
+    for nome, coluna in BALANCAS.items():
+        with etapa('balanca', prefixo=prefixo, tabela=nome) as metricas:
+            metricas['linhas_entrada'] = len(df_filtrado)
+            tabela = _traduzir_balanca(calcular_balanca(df_filtrado, coluna), coluna, dicionarios)
+            arquivo = gravar_tabela(tabela, os.path.join(pasta_saida, f"{prefixo}_balanca_{nome}.csv"), formato)
+            arquivos_salvos.append(arquivo)
+            metricas.update(linhas_saida=len(tabela), arquivos_saida=[arquivo])
+
+    mostrar(f"\n🎉 BALANÇA CONCLUÍDA!")
+    for arquivo in arquivos_salvos:
+        mostrar(f"📁 Arquivo salvo: {arquivo}")
+
+    return arquivos_salvos
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(
+        description="Processa exportação e importação juntas e grava a balança comercial do município")
+    parser.add_argument("--exportacoes", default="Bruto_EXP", help="pasta com os arquivos anuais de exportação")
+    parser.add_argument("--importacoes", default="Bruto", help="pasta com os arquivos anuais de importação")
+    parser.add_argument("--saida", default=".", help="pasta onde gravar as tabelas")
+    parser.add_argument("--municipio", type=int, nargs="+",
+                        help="código(s) CO_MUN (sem --municipio nem --uf: 4118501, Pato Branco)")
+    parser.add_argument("--uf", nargs="+", help="sigla(s) SG_UF_MUN")
+    parser.add_argument("--sh4", default="dicionario_sh4.csv", help="dicionário de SH4")
+    parser.add_argument("--pais", default="dicionario_pais.csv", help="dicionário de países")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processos de leitura")
+    parser.add_argument("--indice", help="pasta do índice por município")
+    parser.add_argument("--intermediarios", action="store_true", help="grava também as etapas intermediárias")
+    parser.add_argument("--motor", choices=["auto"] + list(MOTORES), default=MOTOR_PADRAO,
+                        help="parser das linhas brutas (auto = o mais rápido disponível)")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--verbosidade", choices=NIVEIS, default="metricas")
+    parser.add_argument("--metricas", help="arquivo onde acrescentar as métricas JSON (padrão: a saída padrão)")
+    # Sem --municipio nem --uf, filtrar_fluxos usa o município padrão
+    return parser.parse_args()
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    args = _argumentos()
+    definir_verbosidade(args.verbosidade, args.metricas)
+
+    executar_balanca(args.exportacoes, args.importacoes, args.saida, args.sh4, args.pais, args.municipio,
+                     salvar_intermediarios=args.intermediarios, formato=args.formato, workers=args.workers,
+                     uf=args.uf, pre_filtro=True, pasta_indice=args.indice, motor=args.motor)
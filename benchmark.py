@@ -0,0 +1,280 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dados_sinteticos import MUNICIPIOS_FIXOS, gerar_dicionarios, gerar_serie
+from dicionario import traduzir_dados_com_csv
+from f_mun_pato import processar_arquivos_mal_formatados
+from f_sh6 import ordenar_hierarquicamente, ordenar_por_ano_e_frequencia
+from leitor_bruto import (converter_linhas, filtrar_arquivo_em_blocos, ler_blocos, listar_arquivos_anuais,
+                          motores_disponiveis)
+
+# Benchmark de ponta a ponta sobre dados sintéticos (ver dados_sinteticos): mede tempo
+# e pico de memória de cada etapa em várias escalas e grava os resultados em JSON, para
+# comparar versões (comparar_resultados).
+
+# Registros por ano de cada escala
+ESCALAS_PADRAO = (10_000, 100_000, 1_000_000)
+
+# Linhas malformadas misturadas aos dados sintéticos na comparação dos motores de
+# leitura: campo vazio, linhas com 5 e 9 campos, número inválido, decimal, 'NA',
+# linha em branco e fim de linha do Windows
+LINHAS_ANOMALAS = [
+    '"2024";"01";"0101";"23";"PR";"4118501";"";"5"\n',
+    '"2024";"01";"0101";"23";"PR"\n',
+    '"2024";"01";"0101";"23";"PR";"4118501";"1";"5";"9"\n',
+    '"2024";"xx";"0101";"23";"";"4118501";"1";"5"\r\n',
+    '"2024";"01";"01.5";"23";"NA";"4118501";"1";"5"\n',
+    '  \n',
+]
+
+
+def medir_tempo(funcao, *args, **kwargs):
+    """
+    Executa funcao(*args, **kwargs) sem a saída no terminal. Retorna (resultado, segundos)
+    """
+
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = funcao(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+
+def medir_memoria(funcao, *args, **kwargs):
+    """
+    Pico de memória alocada (em bytes) durante funcao(*args, **kwargs), pelo tracemalloc
+    (que inclui os arrays do numpy/pandas). O rastreamento deixa o código bem mais
+    lento, por isso tempo e memória são medidos em execuções separadas
+    """
+
+    tracemalloc.start()
+    try:
+        medir_tempo(funcao, *args, **kwargs)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico
+
+
+def _contar_linhas(arquivo):
+    if not os.path.exists(arquivo):
+        return 0
+    with open(arquivo, 'rb') as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def preparar_dados(pasta_trabalho, registros_por_ano, anos, municipios, assimetria, semente):
+    """
+    Gera (uma vez por configuração) a série sintética e os dicionários da escala.
+    Retorna (pasta_bruto, arquivo_sh4, arquivo_pais)
+    """
+
+    pasta = os.path.join(pasta_trabalho, f"dados_{registros_por_ano}_{len(anos)}a_{municipios}m_s{semente}")
+    pasta_bruto = os.path.join(pasta, "Bruto")
+    if not os.path.isdir(pasta_bruto):
+        with contextlib.redirect_stdout(io.StringIO()):
+            gerar_serie(pasta_bruto, anos, registros_por_ano, municipios, assimetria, semente=semente)
+    arquivo_sh4, arquivo_pais = os.path.join(pasta, "NCM_SH.csv"), os.path.join(pasta, "PAIS.csv")
+    if not os.path.exists(arquivo_pais):
+        gerar_dicionarios(pasta, semente)
+    return pasta_bruto, arquivo_sh4, arquivo_pais
+
+
+def _etapas(pasta_bruto, arquivo_sh4, arquivo_pais, pasta_saida, codigo_municipio, workers):
+    """
+    As etapas medidas, na ordem do fluxo do Leia-me:
+    (nome, função, args, kwargs, arquivo de saída)
+    """
+
+    caminho = lambda nome: os.path.join(pasta_saida, nome)
+    return [
+        ("filtrar", processar_arquivos_mal_formatados,
+         (pasta_bruto, caminho("filtrados.csv"), codigo_municipio), {'workers': workers}, caminho("filtrados.csv")),
+        ("ordenar_hierarquicamente", ordenar_hierarquicamente,
+         (caminho("filtrados.csv"), caminho("hierarquico.csv")), {}, caminho("hierarquico.csv")),
+        ("ordenar_por_ano", ordenar_por_ano_e_frequencia,
+         (caminho("filtrados.csv"), caminho("por_ano.csv")), {}, caminho("por_ano.csv")),
+        ("traduzir_hierarquico", traduzir_dados_com_csv,
+         (caminho("hierarquico.csv"), caminho("hierarquico_traduzido.csv"), arquivo_sh4, arquivo_pais), {},
+         caminho("hierarquico_traduzido.csv")),
+        ("traduzir_por_ano", traduzir_dados_com_csv,
+         (caminho("por_ano.csv"), caminho("por_ano_traduzido.csv"), arquivo_sh4, arquivo_pais), {},
+         caminho("por_ano_traduzido.csv")),
+    ]
+
+
+def _versao_do_codigo():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar_benchmark(pasta_trabalho, escalas=ESCALAS_PADRAO, anos=range(2020, 2025), municipios=500,
+                       assimetria=1.1, repeticoes=3, codigo_municipio=None, workers=1, semente=0,
+                       arquivo_resultados=None):
+    """
+    Mede cada etapa (filtro, as duas ordenações e as duas traduções) em cada escala
+    (registros por ano). O tempo é medido 'repeticoes' vezes (fica a menor e a mediana);
+    a memória, numa execução a mais.
+    Sem codigo_municipio é filtrado o primeiro dos MUNICIPIOS_FIXOS (Pato Branco).
+    Retorna o dicionário de resultados, gravado também em arquivo_resultados (JSON)
+    """
+
+    codigo_municipio = codigo_municipio or MUNICIPIOS_FIXOS[0]
+    medidas = []
+
+    for registros_por_ano in escalas:
+        print(f"\n📏 Escala: {registros_por_ano} registros/ano × {len(anos)} anos")
+        pasta_bruto, arquivo_sh4, arquivo_pais = preparar_dados(pasta_trabalho, registros_por_ano, anos,
+                                                                 municipios, assimetria, semente)
+        bytes_entrada = sum(os.path.getsize(os.path.join(pasta_bruto, nome)) for nome in os.listdir(pasta_bruto))
+        pasta_saida = os.path.join(pasta_trabalho, f"saida_{registros_por_ano}")
+        os.makedirs(pasta_saida, exist_ok=True)
+
+        for nome, funcao, args, kwargs, saida in _etapas(pasta_bruto, arquivo_sh4, arquivo_pais, pasta_saida,
+                                                         codigo_municipio, workers):
+            tempos = [medir_tempo(funcao, *args, **kwargs)[1] for _ in range(repeticoes)]
+            pico = medir_memoria(funcao, *args, **kwargs)
+
+            medida = {
+                'escala': registros_por_ano,
+                'anos': len(anos),
+                'etapa': nome,
+                'segundos': min(tempos),
+                'segundos_mediana': float(np.median(tempos)),
+                'pico_memoria_mb': pico / 2 ** 20,
+                'registros_saida': _contar_linhas(saida),
+                'bytes_entrada': bytes_entrada if nome == "filtrar" else os.path.getsize(args[0]),
+            }
+            medidas.append(medida)
+            print(f"   ⏱️  {nome}: {medida['segundos']:.3f} s, pico {medida['pico_memoria_mb']:.1f} MB, "
+                  f"{medida['registros_saida']} registros")
+
+    resultados = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'versao': _versao_do_codigo(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'parametros': {'anos': [min(anos), max(anos)], 'municipios': municipios, 'assimetria': assimetria,
+                       'repeticoes': repeticoes, 'codigo_municipio': codigo_municipio, 'workers': workers,
+                       'semente': semente},
+        'medidas': medidas,
+    }
+
+    if arquivo_resultados:
+        with open(arquivo_resultados, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados salvos: {arquivo_resultados}")
+
+    return resultados
+
+
+def comparar_motores(pasta_trabalho, registros_por_ano=100_000, anos=range(2023, 2025), municipios=500,
+                     assimetria=1.1, repeticoes=3, semente=0):
+    """
+    Verifica que todos os motores de leitura disponíveis (leitor_bruto.MOTORES)
+    convertem as linhas dos arquivos sintéticos, com LINHAS_ANOMALAS no meio, no mesmo
+    DataFrame do motor 'python', e mede o tempo de conversão de cada um. Confere também
+    a filtragem de uma UF em blocos (inclusive as categorias de SG_UF_MUN).
+    Retorna {motor: {'segundos': ..., 'igual': bool}}
+    """
+
+    pasta_bruto, _, _ = preparar_dados(pasta_trabalho, registros_por_ano, anos, municipios, assimetria, semente)
+    brutos = listar_arquivos_anuais(pasta_bruto)
+    filtrar = lambda motor: [filtrar_arquivo_em_blocos(arquivo, None, {'PR'}, motor=motor)[0] for arquivo in brutos]
+    iguais = lambda dfs, refs: all(df.equals(ref) and (df.dtypes == ref.dtypes).all() for df, ref in zip(dfs, refs))
+
+    arquivos = []
+    for arquivo in brutos:
+        linhas = [linha for bloco in ler_blocos(arquivo, None) for linha in bloco]
+        meio = len(linhas) // 2
+        arquivos.append(linhas[:meio] + LINHAS_ANOMALAS + linhas[meio:])
+
+    referencia = [converter_linhas(linhas, 0, 'python') for linhas in arquivos]
+    referencia_filtrada = filtrar('python')
+    resultados = {}
+
+    for motor in motores_disponiveis():
+        tempos = [medir_tempo(lambda: [converter_linhas(linhas, 0, motor) for linhas in arquivos])[1]
+                  for _ in range(repeticoes)]
+        convertidos = [converter_linhas(linhas, 0, motor) for linhas in arquivos]
+        igual = iguais(convertidos, referencia) and iguais(filtrar(motor), referencia_filtrada)
+
+        resultados[motor] = {'segundos': min(tempos), 'igual': igual}
+        print(f"   {'✅' if igual else '❌'} {motor:<8} {min(tempos):.3f} s")
+
+    return resultados
+
+
+def comparar_resultados(arquivo_base, arquivo_novo, tolerancia=0.10):
+    """
+    Compara dois JSON de executar_benchmark etapa a etapa. Retorna as medidas em que o
+    tempo ou o pico de memória pioraram mais que 'tolerancia' (fração)
+    """
+
+    with open(arquivo_base, 'r', encoding='utf-8') as f:
+        base = {(m['escala'], m['etapa']): m for m in json.load(f)['medidas']}
+    with open(arquivo_novo, 'r', encoding='utf-8') as f:
+        novo = {(m['escala'], m['etapa']): m for m in json.load(f)['medidas']}
+
+    regressoes = []
+    print(f"{'escala':>10} {'etapa':<26} {'tempo':>8} {'memória':>8}")
+    for chave in sorted(set(base) & set(novo)):
+        razao_tempo = novo[chave]['segundos'] / max(base[chave]['segundos'], 1e-9)
+        razao_memoria = novo[chave]['pico_memoria_mb'] / max(base[chave]['pico_memoria_mb'], 1e-9)
+        marca = ""
+        if razao_tempo > 1 + tolerancia or razao_memoria > 1 + tolerancia:
+            regressoes.append(dict(novo[chave], razao_tempo=razao_tempo, razao_memoria=razao_memoria))
+            marca = "  ⚠️"
+        print(f"{chave[0]:>10} {chave[1]:<26} {razao_tempo:>7.2f}x {razao_memoria:>7.2f}x{marca}")
+
+    return regressoes
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Benchmark das etapas sobre dados sintéticos")
+    parser.add_argument("--pasta", default="benchmark_dados", help="pasta de trabalho (dados e saídas)")
+    parser.add_argument("--escalas", type=int, nargs="+", default=list(ESCALAS_PADRAO),
+                        help="registros por ano de cada escala")
+    parser.add_argument("--anos", type=int, default=5, help="número de anos (terminando em 2024)")
+    parser.add_argument("--municipios", type=int, default=500)
+    parser.add_argument("--assimetria", type=float, default=1.1)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processos do filtro (com mais de 1, a memória medida é só a do processo principal)")
+    parser.add_argument("--saida", default="benchmark.json", help="arquivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--motores", action="store_true",
+                        help="só confere e mede os motores de leitura (na primeira escala)")
+    return parser.parse_args()
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    args = _argumentos()
+
+    if args.motores:
+        print(f"🔎 Motores de leitura ({args.escalas[0]} registros/ano):")
+        comparar_motores(args.pasta, args.escalas[0], range(2025 - args.anos, 2025), args.municipios,
+                         args.assimetria, args.repeticoes)
+        raise SystemExit
+
+    executar_benchmark(args.pasta, args.escalas, range(2025 - args.anos, 2025), args.municipios, args.assimetria,
+                       args.repeticoes, workers=args.workers, arquivo_resultados=args.saida)
+
+    if args.comparar:
+        print(f"\n📊 Comparação com {args.comparar}:")
+        comparar_resultados(args.comparar, args.saida)
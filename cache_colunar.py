@@ -0,0 +1,241 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import shutil
+import hashlib
+
+from esquema import COLUNAS, aplicar_esquema, para_numpy
+from leitor_bruto import (MOTOR_PADRAO, TAMANHO_BLOCO_PADRAO, converter_linhas, executar_por_arquivo, ler_blocos,
+                          listar_arquivos_anuais, mascara_filtro, montar_dataframe, nome_base, resolver_motor)
+from relatorio import mostrar
+
+# Cache colunar dos arquivos anuais: cada CSV de Bruto/ vira uma pasta com um .npy por
+# coluna (já nos tipos compactos de esquema.py), e o manifesto registra de qual versão do CSV ela foi gerada.
+# Como a Secex congela os anos anteriores, só o último ano costuma ser reconvertido.
+# O manifesto separa as entradas por pasta de origem (caminho absoluto) e as colunas de
+# cada origem ficam numa subpasta própria (hash do caminho), de modo que importação e
+# exportação (ou duas cópias de Bruto/ com os mesmos nomes de arquivo) podem dividir a
+# mesma pasta de cache sem se misturar nem apagar uma à outra.
+ARQUIVO_MANIFESTO = "manifesto.json"
+
+# Incrementar quando o formato das colunas ou do manifesto mudar (força a reconversão de tudo)
+VERSAO_CACHE = 4
+
+
+def _hash_arquivo(arquivo, tamanho_bloco=8 * 1024 * 1024):
+    """
+    SHA-256 do conteúdo do arquivo, lido em blocos
+    """
+
+    h = hashlib.sha256()
+    with open(arquivo, 'rb') as f:
+        while True:
+            bloco = f.read(tamanho_bloco)
+            if not bloco:
+                break
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _carregar_manifesto(pasta_cache):
+    """
+    Entradas do manifesto por pasta de origem: {pasta_absoluta: {arquivo: entrada}}
+    """
+
+    caminho = os.path.join(pasta_cache, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {}
+
+    with open(caminho, 'r', encoding='utf-8') as f:
+        manifesto = json.load(f)
+
+    if manifesto.get('versao') != VERSAO_CACHE:
+        return {}
+    return manifesto.get('origens', {})
+
+
+def _salvar_manifesto(pasta_cache, origens):
+    caminho = os.path.join(pasta_cache, ARQUIVO_MANIFESTO)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({'versao': VERSAO_CACHE, 'origens': origens}, f, indent=2, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+def pasta_da_origem(pasta_cache, pasta_entrada):
+    """
+    Subpasta do cache com as colunas dos arquivos de uma pasta de entrada
+    """
+
+    origem = os.path.abspath(pasta_entrada)
+    return os.path.join(pasta_cache, hashlib.sha256(origem.encode('utf-8')).hexdigest()[:16])
+
+
+def pasta_do_arquivo(pasta_cache, arquivo):
+    """
+    Pasta do cache que guarda as colunas de um arquivo anual (dentro da subpasta da
+    pasta de origem do arquivo)
+    """
+
+    return os.path.join(pasta_da_origem(pasta_cache, os.path.dirname(arquivo)), nome_base(arquivo))
+
+
+def _converter_arquivo(arquivo, destino, tamanho_bloco, motor='python'):
+    """
+    Converte um CSV anual para colunas tipadas (um .npy por coluna), lendo em blocos
+    com o motor de leitura pedido (ver leitor_bruto.MOTORES).
+    Retorna o número de registros gravados
+    """
+
+    blocos = {col: [] for col in COLUNAS}
+    inicio = 0
+
+    for linhas in ler_blocos(arquivo, tamanho_bloco):
+        df = converter_linhas(linhas, inicio, motor)
+        inicio += len(linhas)
+
+        for col in COLUNAS:
+            blocos[col].append(para_numpy(df[col]))
+
+    # Grava numa pasta temporária e só então substitui a versão anterior
+    temporario = destino + ".tmp"
+    if os.path.exists(temporario):
+        shutil.rmtree(temporario)
+    os.makedirs(temporario)
+
+    total = 0
+    for col in COLUNAS:
+        valores = np.concatenate(blocos[col]) if blocos[col] else para_numpy(montar_dataframe([])[col])
+        np.save(os.path.join(temporario, f"{col}.npy"), valores, allow_pickle=False)
+        total = len(valores)
+
+    if os.path.exists(destino):
+        shutil.rmtree(destino)
+    os.replace(temporario, destino)
+
+    return total
+
+
+def _verificar_e_converter(arquivo, entrada_anterior, destino, tamanho_bloco, motor='python'):
+    """
+    Compara o arquivo com sua entrada no manifesto (tamanho, mtime e hash) e reconverte
+    apenas se o conteúdo mudou. Retorna (entrada_nova, situação)
+    """
+
+    estado = os.stat(arquivo)
+    entrada = {'tamanho': estado.st_size, 'mtime': estado.st_mtime}
+
+    if entrada_anterior and os.path.isdir(destino):
+        # Tamanho e data iguais: arquivo congelado, nem precisa calcular o hash
+        if (entrada_anterior['tamanho'] == entrada['tamanho']
+                and entrada_anterior['mtime'] == entrada['mtime']):
+            return entrada_anterior, 'atual'
+
+        # Data mudou (ex.: novo download), mas o conteúdo pode ser o mesmo
+        entrada['sha256'] = _hash_arquivo(arquivo)
+        if entrada_anterior['tamanho'] == entrada['tamanho'] and entrada_anterior['sha256'] == entrada['sha256']:
+            return dict(entrada_anterior, mtime=entrada['mtime']), 'atual'
+
+    if 'sha256' not in entrada:
+        entrada['sha256'] = _hash_arquivo(arquivo)
+
+    entrada['registros'] = _converter_arquivo(arquivo, destino, tamanho_bloco, motor)
+    return entrada, 'convertido'
+
+
+def _atualizar_um(arquivo, pasta_cache, anteriores, tamanho_bloco, motor='python'):
+    entrada_anterior = anteriores.get(os.path.basename(arquivo))
+    return _verificar_e_converter(arquivo, entrada_anterior, pasta_do_arquivo(pasta_cache, arquivo),
+                                  tamanho_bloco, motor)
+
+
+def atualizar_cache(pasta_entrada, pasta_cache, tamanho_bloco=TAMANHO_BLOCO_PADRAO, workers=1, motor=MOTOR_PADRAO):
+    """
+    Converte para o cache colunar os arquivos anuais de pasta_entrada (CSV ou
+    compactados) que ainda não foram convertidos ou que mudaram desde a última
+    conversão, e atualiza o manifesto. motor escolhe o parser das linhas brutas
+    (ver leitor_bruto.MOTORES; 'auto' = o mais rápido disponível).
+    Retorna a lista de pastas do cache, na ordem dos arquivos (ordem de ano)
+    """
+
+    arquivos_csv = listar_arquivos_anuais(pasta_entrada)
+    os.makedirs(pasta_cache, exist_ok=True)
+
+    origens = _carregar_manifesto(pasta_cache)
+    origem = os.path.abspath(pasta_entrada)
+    anteriores = origens.get(origem, {})
+    entradas = {}
+    convertidos = 0
+
+    # A verificação/conversão de cada ano é independente e pode rodar em paralelo
+    motor = resolver_motor(motor, arquivos_csv, tamanho_bloco)
+    resultados = executar_por_arquivo(_atualizar_um, arquivos_csv, workers, pasta_cache, anteriores,
+                                      tamanho_bloco, motor)
+
+    for arquivo, (entrada, situacao) in zip(arquivos_csv, resultados):
+        nome = os.path.basename(arquivo)
+        entradas[nome] = entrada
+        if situacao == 'convertido':
+            convertidos += 1
+            mostrar(f"🗜️  Convertido para o cache: {nome} ({entrada['registros']} registros)")
+
+    # Remove do cache os arquivos que não existem mais nesta pasta de entrada (só da
+    # subpasta desta origem)
+    origens[origem] = entradas
+    for nome in set(anteriores) - set(entradas):
+        destino = pasta_do_arquivo(pasta_cache, os.path.join(origem, nome))
+        if os.path.isdir(destino):
+            shutil.rmtree(destino)
+
+    _salvar_manifesto(pasta_cache, origens)
+    mostrar(f"📦 Cache colunar: {convertidos} arquivo(s) convertido(s), "
+            f"{len(arquivos_csv) - convertidos} reaproveitado(s)")
+
+    return [pasta_do_arquivo(pasta_cache, arquivo) for arquivo in arquivos_csv]
+
+
+def ler_colunas(pasta_arquivo, colunas=None):
+    """
+    Lê (por mapeamento em memória) as colunas de um arquivo anual do cache.
+    Retorna um dicionário coluna -> array
+    """
+
+    colunas = colunas or COLUNAS
+    return {col: np.load(os.path.join(pasta_arquivo, f"{col}.npy"), mmap_mode='r') for col in colunas}
+
+
+def montar_do_cache(colunas, posicoes=None):
+    """
+    Monta o DataFrame (no esquema compacto, como na leitura do CSV) a partir das
+    colunas do cache, opcionalmente só com as linhas em 'posicoes'
+    """
+
+    dados = {}
+    for col, valores in colunas.items():
+        dados[col] = np.array(valores if posicoes is None else valores[posicoes])
+    return aplicar_esquema(pd.DataFrame(dados, columns=list(colunas)))
+
+
+def filtrar_cache(pasta_arquivo, codigos=None, ufs=None, candidatas=None):
+    """
+    Aplica o filtro de municípios/UF sobre um arquivo anual do cache. Apenas CO_MUN e
+    SG_UF_MUN são lidas por inteiro; as demais colunas só nas linhas selecionadas.
+    Com 'candidatas' (posições vindas do índice por município) só essas linhas são
+    examinadas.
+
+    Retorna (df_filtrado, total_de_registros, amostra)
+    """
+
+    colunas = ler_colunas(pasta_arquivo)
+    total = len(colunas['CO_MUN'])
+
+    amostra = montar_do_cache(colunas, np.arange(min(2, total)))
+
+    if candidatas is None:
+        candidatas = np.arange(total)
+    filtro = pd.DataFrame({'CO_MUN': colunas['CO_MUN'][candidatas],
+                           'SG_UF_MUN': colunas['SG_UF_MUN'][candidatas]})
+    posicoes = candidatas[mascara_filtro(filtro, codigos, ufs).to_numpy()]
+
+    return montar_do_cache(colunas, posicoes), total, amostra
@@ -0,0 +1,168 @@
+import pandas as pd
+import numpy as np
+import os
+import re
+
+from esquema import COLUNAS, concatenar
+from leitor_bruto import (TAMANHO_BLOCO_PADRAO, dividir_linhas, executar_por_arquivo, ler_blocos,
+                          listar_arquivos_anuais, montar_dataframe, nome_base, normalizar_filtro)
+from indice_municipios import carregar_indice, filtrar_por_indice
+from relatorio import mostrar
+
+# Consulta genérica sobre a série bruta. Os predicados são empurrados o mais cedo
+# possível: arquivos anuais fora dos anos pedidos nem são abertos (o ano vem do nome
+# do arquivo) e, nos demais, as linhas são testadas ainda como texto, bloco a bloco;
+# só as que passam em todos os predicados viram colunas tipadas.
+
+# Ano no nome do arquivo (IMP_2024_MUN.csv, EXP_1997_MUN.zip...)
+PADRAO_ANO = re.compile(r'(?<!\d)(19\d{2}|20\d{2})(?!\d)')
+
+
+def _conjunto(valores):
+    """
+    Um valor, uma coleção ou um range → frozenset de inteiros (None = sem restrição)
+    """
+
+    if valores is None:
+        return None
+    if isinstance(valores, (int, str, np.integer)):
+        valores = [valores]
+    return frozenset(int(valor) for valor in valores)
+
+
+def montar_predicados(codigo_municipio=None, uf=None, anos=None, meses=None, sh2=None, paises=None):
+    """
+    Normaliza os filtros de consultar num dicionário coluna -> conjunto de valores
+    aceitos. 'SH2' é o capítulo (os dois primeiros dígitos do SH4)
+    """
+
+    codigos, ufs = normalizar_filtro(codigo_municipio, uf)
+    predicados = {
+        'CO_ANO': _conjunto(anos),
+        'CO_MES': _conjunto(meses),
+        'SH2': _conjunto(sh2),
+        'CO_PAIS': _conjunto(paises),
+        'SG_UF_MUN': ufs,
+        'CO_MUN': codigos,
+    }
+    return {col: valores for col, valores in predicados.items() if valores is not None}
+
+
+def ano_do_arquivo(arquivo):
+    """
+    Ano indicado no nome do arquivo anual, ou None se o nome não traz um ano
+    """
+
+    encontrado = PADRAO_ANO.search(nome_base(arquivo))
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def selecionar_por_predicados(dados, predicados):
+    """
+    Mantém apenas as linhas (ainda como listas de texto) que atendem a todos os
+    predicados. Cada predicado só examina as linhas que passaram nos anteriores
+    """
+
+    for col, valores in predicados.items():
+        if not dados:
+            break
+
+        if col == 'SG_UF_MUN':
+            indice = COLUNAS.index(col)
+            dados = [partes for partes in dados if partes[indice] in valores]
+            continue
+
+        indice = COLUNAS.index('SH4' if col == 'SH2' else col)
+        numeros = pd.to_numeric(pd.Series([partes[indice] for partes in dados]), errors='coerce')
+        if col == 'SH2':
+            numeros = numeros // 100
+        mascara = numeros.isin(list(valores)).to_numpy()
+        dados = [dados[i] for i in mascara.nonzero()[0]]
+
+    return dados
+
+
+def mascara_predicados(df, predicados):
+    """
+    Versão dos predicados para um DataFrame já convertido (máscara booleana)
+    """
+
+    mascara = pd.Series(True, index=df.index)
+    for col, valores in predicados.items():
+        if col == 'SH2':
+            mascara &= (df['SH4'] // 100).isin(list(valores))
+        else:
+            mascara &= df[col].isin(list(valores))
+    return mascara
+
+
+def _consultar_arquivo(arquivo, predicados, tamanho_bloco, pasta_indice=None):
+    """
+    Aplica os predicados a um arquivo anual. Retorna (df_selecionado, modo de leitura)
+    """
+
+    codigos = predicados.get('CO_MUN')
+    indice = None
+    if pasta_indice is not None and codigos is not None:
+        indice = carregar_indice(pasta_indice, arquivo)
+
+    if indice is not None:
+        # Só as linhas dos municípios pedidos são lidas; o resto dos predicados vem depois
+        df, _ = filtrar_por_indice(arquivo, indice, codigos, predicados.get('SG_UF_MUN'))
+        return df[mascara_predicados(df, predicados)].reset_index(drop=True), 'índice'
+
+    partes = []
+    inicio = 0
+    for linhas in ler_blocos(arquivo, tamanho_bloco):
+        dados = selecionar_por_predicados(dividir_linhas(linhas, inicio), predicados)
+        inicio += len(linhas)
+        if dados:
+            partes.append(montar_dataframe(dados))
+
+    return (concatenar(partes) if partes else montar_dataframe([])), 'varredura'
+
+
+def consultar(pasta_entrada, codigo_municipio=None, uf=None, anos=None, meses=None, sh2=None, paises=None,
+              colunas=None, tamanho_bloco=TAMANHO_BLOCO_PADRAO, workers=1, pasta_indice=None):
+    """
+    Seleciona linhas da série bruta (arquivos anuais de pasta_entrada, CSV ou compactados).
+    Cada filtro aceita um valor, uma coleção ou um range; None não restringe:
+      codigo_municipio → CO_MUN, uf → SG_UF_MUN, anos → CO_ANO, meses → CO_MES,
+      sh2 → capítulo do SH4 (ex.: 84 seleciona os SH4 8401–8499), paises → CO_PAIS.
+    'colunas' restringe as colunas devolvidas. Arquivos cujo nome indica um ano fora
+    de 'anos' não são lidos; com pasta_indice (ver indice_municipios) e um filtro de
+    CO_MUN, só as faixas dos municípios são lidas.
+    Retorna o DataFrame selecionado, na ordem dos arquivos (ordem de ano)
+    """
+
+    predicados = montar_predicados(codigo_municipio, uf, anos, meses, sh2, paises)
+    arquivos = listar_arquivos_anuais(pasta_entrada)
+    total_arquivos = len(arquivos)
+
+    anos_pedidos = predicados.get('CO_ANO')
+    if anos_pedidos is not None:
+        arquivos = [arquivo for arquivo in arquivos
+                    if ano_do_arquivo(arquivo) is None or ano_do_arquivo(arquivo) in anos_pedidos]
+
+    mostrar(f"🔎 Consulta: {len(arquivos)} arquivo(s) a ler, "
+            f"{total_arquivos - len(arquivos)} pulado(s) pelo ano")
+
+    partes = []
+    for arquivo, (df, modo) in zip(arquivos, executar_por_arquivo(_consultar_arquivo, arquivos, workers,
+                                                                   predicados, tamanho_bloco, pasta_indice)):
+        mostrar(f"   {os.path.basename(arquivo)}: {len(df)} registros ({modo})")
+        if len(df):
+            partes.append(df)
+
+    resultado = concatenar(partes) if partes else montar_dataframe([])
+    if colunas is not None:
+        resultado = resultado[list(colunas)]
+    return resultado
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    # Importações de Pato Branco, capítulo 84 (máquinas), de 2020 a 2024
+    df = consultar("Bruto", codigo_municipio=4118501, anos=range(2020, 2025), sh2=84,
+                   colunas=['CO_ANO', 'CO_MES', 'SH4', 'CO_PAIS', 'VL_FOB'], workers=os.cpu_count())
+    print(df.to_string(index=False))
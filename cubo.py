@@ -0,0 +1,259 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import shutil
+
+from esquema import aplicar_esquema, concatenar, para_numpy
+from leitor_bruto import (TAMANHO_BLOCO_PADRAO, dividir_linhas, executar_por_arquivo, ler_blocos,
+                          listar_arquivos_anuais, montar_dataframe, nome_base, normalizar_filtro)
+from relatorio import mostrar
+
+# Cubo agregado dos arquivos anuais: para cada (ano, mês, SH4, país, município), o número
+# de registros e as somas de VL_FOB e KG_LIQUIDO. Cada arquivo anual vira uma pasta com
+# um .npy por coluna, ordenada por município, com ponteiros para o início de cada um:
+# a consulta de um município lê (por mapeamento em memória) só o seu trecho.
+# O número de registros é a mesma contagem que f_sh6 usa nas frequências (FREQ_SH4,
+# FREQ_PAIS e as versões por ano): registros com alguma dimensão ausente (<NA>) formam
+# células próprias, em vez de sumir do cubo.
+# Uma pasta de cubo guarda uma única pasta de entrada (o manifesto registra qual): os
+# arquivos de exportação e de importação têm os mesmos nomes de ano e não podem se
+# misturar nem se apagar.
+ARQUIVO_MANIFESTO = "manifesto.json"
+
+# Incrementar quando o formato do cubo mudar (força a reconstrução de tudo)
+VERSAO_CUBO = 2
+
+DIMENSOES = ['CO_MUN', 'CO_ANO', 'CO_MES', 'SH4', 'CO_PAIS']
+MEDIDAS = ['REGISTROS', 'VL_FOB', 'KG_LIQUIDO']
+
+
+def _carregar_manifesto(pasta_cubo):
+    """
+    (pasta de entrada absoluta, {arquivo: entrada}) do cubo; (None, {}) se não houver
+    manifesto ou se ele for de outra versão
+    """
+
+    caminho = os.path.join(pasta_cubo, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return None, {}
+
+    with open(caminho, 'r', encoding='utf-8') as f:
+        manifesto = json.load(f)
+
+    if manifesto.get('versao') != VERSAO_CUBO:
+        return None, {}
+    return manifesto.get('origem'), manifesto.get('arquivos', {})
+
+
+def _salvar_manifesto(pasta_cubo, origem, entradas):
+    caminho = os.path.join(pasta_cubo, ARQUIVO_MANIFESTO)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({'versao': VERSAO_CUBO, 'origem': origem, 'arquivos': entradas}, f, indent=2, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+def _agregar(df):
+    """
+    Agrega um DataFrame com as colunas do cubo (ou do layout bruto, com REGISTROS=1)
+    pelas DIMENSOES
+    """
+
+    if 'REGISTROS' not in df.columns:
+        df = df.assign(REGISTROS=1)
+
+    return df.groupby(DIMENSOES, sort=False, observed=True, dropna=False)[MEDIDAS].sum().reset_index()
+
+
+def _agregar_arquivo(arquivo, pasta_cubo, tamanho_bloco):
+    """
+    Lê um arquivo anual em blocos, agrega cada bloco e grava a pasta do cubo do arquivo.
+    Retorna a entrada do manifesto
+    """
+
+    estado = os.stat(arquivo)
+    partes = []
+    inicio = 0
+
+    # Cada bloco é reduzido às suas combinações antes de juntar com os demais
+    for linhas in ler_blocos(arquivo, tamanho_bloco):
+        df = montar_dataframe(dividir_linhas(linhas, inicio))
+        inicio += len(linhas)
+        if len(df):
+            partes.append(_agregar(df))
+
+    if partes:
+        cubo = _agregar(pd.concat(partes, ignore_index=True))
+    else:
+        cubo = pd.DataFrame({col: [] for col in DIMENSOES + MEDIDAS})
+    cubo = aplicar_esquema(cubo.sort_values(DIMENSOES, ignore_index=True))
+
+    # Células sem CO_MUN ficam no fim (fora dos ponteiros): só entram sem filtro de município
+    co_mun = cubo['CO_MUN'].dropna().to_numpy(dtype=np.int64)
+    municipios, ponteiros = np.unique(co_mun, return_index=True)
+
+    destino = os.path.join(pasta_cubo, nome_base(arquivo))
+    temporario = destino + ".tmp"
+    if os.path.exists(temporario):
+        shutil.rmtree(temporario)
+    os.makedirs(temporario)
+
+    # Dimensões com ausentes são gravadas como float64 com NaN (ver esquema.para_numpy)
+    for col in DIMENSOES + MEDIDAS:
+        valores = cubo[col].to_numpy(dtype='int64') if col in MEDIDAS else para_numpy(cubo[col])
+        np.save(os.path.join(temporario, f"{col}.npy"), valores, allow_pickle=False)
+    np.save(os.path.join(temporario, "municipios.npy"), municipios)
+    np.save(os.path.join(temporario, "ponteiros.npy"), np.append(ponteiros, len(co_mun)).astype(np.int64))
+
+    if os.path.exists(destino):
+        shutil.rmtree(destino)
+    os.replace(temporario, destino)
+
+    return {
+        'tamanho': estado.st_size,
+        'mtime': estado.st_mtime,
+        'anos': sorted(int(ano) for ano in cubo['CO_ANO'].dropna().unique()),
+        'celulas': len(cubo),
+        'registros': int(cubo['REGISTROS'].sum()),
+    }
+
+
+def construir_cubo(pasta_entrada, pasta_cubo, tamanho_bloco=TAMANHO_BLOCO_PADRAO, workers=1, forcar=False):
+    """
+    Constrói (ou atualiza) o cubo agregado a partir dos arquivos anuais de pasta_entrada.
+    Só os arquivos novos ou alterados (tamanho ou data) são reagregados, a menos que
+    forcar=True. Com workers > 1 os anos são agregados em paralelo.
+    ValueError se pasta_cubo já guarda o cubo de outra pasta de entrada
+    """
+
+    origem = os.path.abspath(pasta_entrada)
+    origem_anterior, anteriores = _carregar_manifesto(pasta_cubo)
+    if origem_anterior is not None and origem_anterior != origem:
+        raise ValueError(f"{pasta_cubo} guarda o cubo de {origem_anterior}; use outra pasta para {origem}")
+
+    arquivos = listar_arquivos_anuais(pasta_entrada)
+    os.makedirs(pasta_cubo, exist_ok=True)
+
+    entradas = {}
+    pendentes = []
+
+    for arquivo in arquivos:
+        nome = os.path.basename(arquivo)
+        estado = os.stat(arquivo)
+        anterior = anteriores.get(nome)
+        if (not forcar and anterior is not None
+                and anterior['tamanho'] == estado.st_size and anterior['mtime'] == estado.st_mtime
+                and os.path.isdir(os.path.join(pasta_cubo, nome_base(arquivo)))):
+            entradas[nome] = anterior
+        else:
+            pendentes.append(arquivo)
+
+    mostrar(f"🧊 Cubo agregado: {len(pendentes)} de {len(arquivos)} arquivo(s) a agregar")
+
+    for arquivo, entrada in zip(pendentes, executar_por_arquivo(_agregar_arquivo, pendentes, workers,
+                                                                  pasta_cubo, tamanho_bloco)):
+        entradas[os.path.basename(arquivo)] = entrada
+        mostrar(f"   ✅ {os.path.basename(arquivo)}: {entrada['registros']} registros → {entrada['celulas']} células")
+
+    # Remove do cubo os arquivos que não existem mais na pasta de entrada
+    for nome in set(anteriores) - set(entradas):
+        destino = os.path.join(pasta_cubo, nome_base(nome))
+        if os.path.isdir(destino):
+            shutil.rmtree(destino)
+
+    _salvar_manifesto(pasta_cubo, origem, entradas)
+
+
+def _ler_fatia(pasta_ano, codigos):
+    """
+    Células de um arquivo anual do cubo, só dos municípios em 'codigos' (None = todos)
+    """
+
+    colunas = {col: np.load(os.path.join(pasta_ano, f"{col}.npy"), mmap_mode='r')
+               for col in DIMENSOES + MEDIDAS}
+
+    if codigos is None:
+        posicoes = slice(None)
+    else:
+        municipios = np.load(os.path.join(pasta_ano, "municipios.npy"))
+        ponteiros = np.load(os.path.join(pasta_ano, "ponteiros.npy"))
+        encontrados = np.searchsorted(municipios, sorted(codigos))
+        faixas = [np.arange(ponteiros[i], ponteiros[i + 1])
+                  for i, codigo in zip(encontrados, sorted(codigos))
+                  if i < len(municipios) and municipios[i] == codigo]
+        posicoes = np.concatenate(faixas) if faixas else np.empty(0, dtype=np.int64)
+
+    return pd.DataFrame({col: np.array(valores[posicoes]) for col, valores in colunas.items()})
+
+
+def carregar_cubo(pasta_cubo, codigo_municipio=None, ano_inicial=None, ano_final=None):
+    """
+    Células do cubo (DIMENSOES + MEDIDAS) dos municípios e anos pedidos.
+    codigo_municipio aceita um código ou um conjunto (None = todos); os arquivos
+    anuais fora do intervalo de anos nem são abertos
+    """
+
+    codigos, _ = normalizar_filtro(codigo_municipio)
+    _, entradas = _carregar_manifesto(pasta_cubo)
+    partes = []
+
+    for nome in sorted(entradas):
+        anos = entradas[nome]['anos']
+        if not anos:
+            continue
+        if ano_inicial is not None and max(anos) < ano_inicial:
+            continue
+        if ano_final is not None and min(anos) > ano_final:
+            continue
+        partes.append(_ler_fatia(os.path.join(pasta_cubo, nome_base(nome)), codigos))
+
+    if not partes:
+        return aplicar_esquema(pd.DataFrame({col: np.empty(0, dtype=np.int64) for col in DIMENSOES + MEDIDAS}))
+
+    cubo = concatenar(partes)
+    if ano_inicial is not None:
+        cubo = cubo[cubo['CO_ANO'] >= ano_inicial]
+    if ano_final is not None:
+        cubo = cubo[cubo['CO_ANO'] <= ano_final]
+    return cubo.reset_index(drop=True)
+
+
+def consultar_cubo(pasta_cubo, dimensao='SH4', codigo_municipio=None, ano_inicial=None, ano_final=None,
+                   limite=None, por_ano=False):
+    """
+    Ranking de 'dimensao' (SH4 ou CO_PAIS) para os municípios e anos pedidos, calculado
+    só com o cubo: número de registros (a frequência de f_sh6), VL_FOB e KG_LIQUIDO.
+    Ordena do mais frequente para o menos frequente (empates pelo menor código); com
+    por_ano=True o ranking é feito dentro de cada ano (FREQ_SH4_ANO / FREQ_PAIS_ANO).
+    limite restringe o resultado aos primeiros de cada ranking
+    """
+
+    cubo = carregar_cubo(pasta_cubo, codigo_municipio, ano_inicial, ano_final)
+
+    chaves = ['CO_ANO', dimensao] if por_ano else [dimensao]
+    ranking = cubo.groupby(chaves, observed=True)[MEDIDAS].sum().reset_index()
+    ranking = ranking.sort_values(chaves[:-1] + ['REGISTROS', dimensao],
+                                  ascending=[True] * (len(chaves) - 1) + [False, True],
+                                  kind='stable', ignore_index=True)
+
+    if limite is not None:
+        ranking = ranking.groupby(chaves[:-1], sort=False).head(limite) if por_ano else ranking.head(limite)
+        ranking = ranking.reset_index(drop=True)
+
+    return ranking
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    PASTA_ENTRADA = "Bruto"
+    PASTA_CUBO = "cubo"
+    CODIGO_MUNICIPIO = 4118501
+
+    construir_cubo(PASTA_ENTRADA, PASTA_CUBO, workers=os.cpu_count())
+
+    print("\n🏆 TOP 10 SH4 mais frequentes:")
+    print(consultar_cubo(PASTA_CUBO, 'SH4', CODIGO_MUNICIPIO, limite=10).to_string(index=False))
+
+    print("\n🌍 TOP 10 países mais frequentes:")
+    print(consultar_cubo(PASTA_CUBO, 'CO_PAIS', CODIGO_MUNICIPIO, limite=10).to_string(index=False))
@@ -0,0 +1,228 @@
+import argparse
+import csv
+import gzip
+import lzma
+import os
+import shutil
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from esquema import COLUNAS
+
+# Gerador de dados no formato do Comex Stat, para medir e testar os scripts sem os
+# downloads reais: arquivos anuais com as 8 colunas entre aspas separadas por ';'
+# (o layout que processar_arquivos_mal_formatados espera) e dicionários NCM_SH.csv e
+# PAIS.csv compatíveis com dicionario.py. Tudo é determinístico para uma mesma semente.
+
+# Municípios sempre presentes (Pato Branco e capitais usadas nos exemplos)
+MUNICIPIOS_FIXOS = [4118501, 4106902, 3550308]
+
+# Prefixo IBGE do município → sigla da UF
+UF_POR_PREFIXO = {
+    11: 'RO', 12: 'AC', 13: 'AM', 14: 'RR', 15: 'PA', 16: 'AP', 17: 'TO', 21: 'MA', 22: 'PI',
+    23: 'CE', 24: 'RN', 25: 'PB', 26: 'PE', 27: 'AL', 28: 'SE', 29: 'BA', 31: 'MG', 32: 'ES',
+    33: 'RJ', 35: 'SP', 41: 'PR', 42: 'SC', 43: 'RS', 50: 'MS', 51: 'MT', 52: 'GO', 53: 'DF',
+}
+
+# Fração dos SH4 dos dados que não existe no dicionário (exercita as linhas não traduzidas)
+FRACAO_SH4_SEM_DESCRICAO = 0.01
+
+
+def _pesos_zipf(quantidade, assimetria):
+    """
+    Probabilidades de uma distribuição de Zipf: o primeiro elemento é o mais frequente
+    """
+
+    pesos = 1.0 / np.arange(1, quantidade + 1) ** assimetria
+    return pesos / pesos.sum()
+
+
+def sortear_municipios(quantidade, gerador):
+    """
+    'quantidade' códigos CO_MUN de 7 dígitos com prefixos de UF reais, começando
+    pelos MUNICIPIOS_FIXOS
+    """
+
+    prefixos = np.array(sorted(UF_POR_PREFIXO))
+    codigos = list(MUNICIPIOS_FIXOS)
+    vistos = set(codigos)
+    while len(codigos) < quantidade:
+        codigo = int(gerador.choice(prefixos)) * 100000 + int(gerador.integers(0, 100000))
+        if codigo not in vistos:
+            vistos.add(codigo)
+            codigos.append(codigo)
+    return np.array(codigos[:quantidade], dtype=np.int64)
+
+
+def codigos_sh4(gerador):
+    """
+    SH4 "existentes" (os do dicionário): de 0101 a 9706, com lacunas como na tabela real
+    """
+
+    todos = np.arange(101, 9707)
+    return np.sort(gerador.choice(todos, size=1200, replace=False))
+
+
+def codigos_paises(gerador):
+    return np.sort(gerador.choice(np.arange(13, 900), size=250, replace=False))
+
+
+def gerar_ano(ano, registros, municipios, pesos_municipios, sh4, pesos_sh4, paises, pesos_paises, gerador):
+    """
+    DataFrame (ainda numérico) com os registros de um ano
+    """
+
+    co_mun = gerador.choice(municipios, size=registros, p=pesos_municipios)
+    return pd.DataFrame({
+        'CO_ANO': np.full(registros, ano),
+        'CO_MES': gerador.integers(1, 13, size=registros),
+        'SH4': gerador.choice(sh4, size=registros, p=pesos_sh4),
+        'CO_PAIS': gerador.choice(paises, size=registros, p=pesos_paises),
+        'SG_UF_MUN': [UF_POR_PREFIXO[codigo // 100000] for codigo in co_mun],
+        'CO_MUN': co_mun,
+        'KG_LIQUIDO': gerador.lognormal(8, 2.5, size=registros).astype(np.int64),
+        'VL_FOB': gerador.lognormal(10, 2.5, size=registros).astype(np.int64),
+    }, columns=COLUNAS)
+
+
+def gravar_ano(df, arquivo):
+    """
+    Grava no layout bruto: todos os campos entre aspas, ';' como separador,
+    mês com 2 dígitos e SH4 com 4 dígitos
+    """
+
+    texto = df.astype(str)
+    texto['CO_MES'] = texto['CO_MES'].str.zfill(2)
+    texto['SH4'] = texto['SH4'].str.zfill(4)
+    texto.to_csv(arquivo, sep=';', index=False, quoting=csv.QUOTE_ALL, encoding='utf-8', lineterminator='\n')
+
+
+def _compactar(arquivo, formato):
+    """
+    Substitui o CSV pelo arquivo compactado ('zip', 'gz' ou 'xz') e devolve o novo caminho
+    """
+
+    if formato == 'zip':
+        destino = os.path.splitext(arquivo)[0] + ".zip"
+        with zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED) as pacote:
+            pacote.write(arquivo, os.path.basename(arquivo))
+    else:
+        destino = f"{arquivo}.{formato}"
+        abrir = gzip.open if formato == 'gz' else lzma.open
+        with open(arquivo, 'rb') as origem, abrir(destino, 'wb') as saida:
+            shutil.copyfileobj(origem, saida)
+
+    os.remove(arquivo)
+    return destino
+
+
+def gerar_serie(pasta_saida, anos=range(2015, 2025), registros_por_ano=100_000, municipios=500,
+                assimetria=1.1, fluxo="IMP", semente=0, compactar=None):
+    """
+    Grava um arquivo anual por ano em pasta_saida (<fluxo>_<ano>_MUN.csv).
+    municipios é o número de CO_MUN distintos; assimetria é o expoente de Zipf da
+    distribuição dos registros entre eles (0 = uniforme; com 1.1, o primeiro município
+    sorteado concentra uma boa parte dos registros). compactar='zip', 'gz' ou 'xz'
+    grava os anos compactados, como os downloads do Comex Stat.
+    Retorna a lista de arquivos gravados
+    """
+
+    gerador = np.random.default_rng(semente)
+    os.makedirs(pasta_saida, exist_ok=True)
+
+    lista_municipios = sortear_municipios(municipios, gerador)
+    # Sem favorecer sempre o mesmo: o município mais frequente é sorteado
+    pesos_municipios = gerador.permutation(_pesos_zipf(municipios, assimetria))
+
+    sh4 = codigos_sh4(np.random.default_rng(semente))
+    faltantes = gerador.choice(np.setdiff1d(np.arange(101, 9707), sh4),
+                               size=max(1, int(len(sh4) * FRACAO_SH4_SEM_DESCRICAO)), replace=False)
+    sh4_dados = np.concatenate([sh4, faltantes])
+    pesos_sh4 = gerador.permutation(_pesos_zipf(len(sh4_dados), 0.9))
+
+    paises = codigos_paises(np.random.default_rng(semente))
+    pesos_paises = gerador.permutation(_pesos_zipf(len(paises), 1.2))
+
+    arquivos = []
+    for ano in anos:
+        df = gerar_ano(ano, registros_por_ano, lista_municipios, pesos_municipios,
+                       sh4_dados, pesos_sh4, paises, pesos_paises, gerador)
+        arquivo = os.path.join(pasta_saida, f"{fluxo}_{ano}_MUN.csv")
+        gravar_ano(df, arquivo)
+        if compactar:
+            arquivo = _compactar(arquivo, compactar)
+        arquivos.append(arquivo)
+        print(f"   ✅ {os.path.basename(arquivo)}: {registros_por_ano} registros")
+
+    return arquivos
+
+
+def gerar_dicionarios(pasta_saida, semente=0):
+    """
+    Grava NCM_SH.csv (de 1 a 3 SH6 por SH4, com as descrições de SH4, SH2 e seção) e
+    PAIS.csv com os mesmos códigos usados por gerar_serie com a mesma semente.
+    Retorna (arquivo_sh4, arquivo_pais)
+    """
+
+    os.makedirs(pasta_saida, exist_ok=True)
+    gerador = np.random.default_rng(semente + 1)
+
+    arquivo_sh4 = os.path.join(pasta_saida, "NCM_SH.csv")
+    with open(arquivo_sh4, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(['CO_SH6', 'NO_SH6_POR', 'CO_SH4', 'NO_SH4_POR', 'CO_SH2', 'NO_SH2_POR',
+                           'CO_NCM_SECROM', 'NO_SEC_POR'])
+        for codigo in codigos_sh4(np.random.default_rng(semente)):
+            sh2 = codigo // 100
+            secao = _secao_sintetica(sh2)
+            for k in range(int(gerador.integers(1, 4))):
+                escritor.writerow([f"{codigo * 100 + k + 10:06d}", f"Subposição {codigo}.{k + 10}",
+                                   f"{codigo:04d}", f"Posição {codigo:04d}; \"descrição\", sintética",
+                                   f"{sh2:02d}", f"Capítulo {sh2:02d}", secao, f"Seção {secao}"])
+
+    arquivo_pais = os.path.join(pasta_saida, "PAIS.csv")
+    with open(arquivo_pais, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(['CO_PAIS', 'CO_PAIS_ISON3', 'CO_PAIS_ISOA3', 'NO_PAIS', 'NO_PAIS_ING', 'NO_PAIS_ESP'])
+        for codigo in codigos_paises(np.random.default_rng(semente)):
+            escritor.writerow([codigo, codigo, f"P{codigo:02d}", f"País {codigo}", f"Country {codigo}",
+                               f"País {codigo}"])
+
+    return arquivo_sh4, arquivo_pais
+
+
+def _secao_sintetica(sh2):
+    """
+    Seção (algarismos romanos I–XXI) aproximada para o capítulo sh2
+    """
+
+    romanos = ['I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX', 'X', 'XI', 'XII', 'XIII', 'XIV',
+               'XV', 'XVI', 'XVII', 'XVIII', 'XIX', 'XX', 'XXI']
+    return romanos[min(sh2 * len(romanos) // 98, len(romanos) - 1)]
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Gera arquivos anuais e dicionários sintéticos do Comex Stat")
+    parser.add_argument("pasta", help="pasta de saída")
+    parser.add_argument("--registros", type=int, default=100_000, help="registros por ano")
+    parser.add_argument("--ano-inicial", type=int, default=2015)
+    parser.add_argument("--ano-final", type=int, default=2024)
+    parser.add_argument("--municipios", type=int, default=500, help="CO_MUN distintos")
+    parser.add_argument("--assimetria", type=float, default=1.1, help="expoente de Zipf entre municípios")
+    parser.add_argument("--fluxo", default="IMP", choices=["IMP", "EXP"])
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--compactar", choices=["zip", "gz", "xz"])
+    return parser.parse_args()
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    args = _argumentos()
+
+    print(f"🧪 Gerando {args.fluxo} {args.ano_inicial}–{args.ano_final} em {args.pasta}")
+    gerar_serie(os.path.join(args.pasta, "Bruto"), range(args.ano_inicial, args.ano_final + 1), args.registros,
+                args.municipios, args.assimetria, args.fluxo, args.semente, args.compactar)
+    for arquivo in gerar_dicionarios(args.pasta, args.semente):
+        print(f"   📚 {arquivo}")
@@ -1,143 +1,383 @@
 import pandas as pd
+import numpy as np
 import os
 
-def traduzir_dados_com_csv(arquivo_entrada, arquivo_saida, arquivo_sh4, arquivo_pais):
+from esquema import aplicar_esquema, gravar_tabela, ler_tabela, localizar_tabela
+from relatorio import avisar, detalhado, etapa, mostrar
+
+# Os dicionários são compilados em tabelas de consulta densas, indexadas pelo próprio
+# código: 'indices'[codigo] é a posição da descrição em 'descricoes' (-1 se o código não
+# existe). Traduzir uma coluna vira um acesso vetorizado ao array, sem merge.
+# As tabelas ficam em memória enquanto o processo vive e, opcionalmente, num .npz em
+# pasta_cache; nos dois casos são recompiladas se o CSV de origem mudar.
+
+# SH4 tem 4 dígitos: a tabela cobre 0–9999 mesmo que o dicionário não use todos
+TAMANHO_MINIMO_SH4 = 10000
+
+# Capítulos (SH2) vão de 01 a 97
+TAMANHO_SH2 = 100
+
+# Valores dos algarismos romanos das seções (CO_NCM_SECROM)
+ROMANOS = {'I': 1, 'V': 5, 'X': 10, 'L': 50}
+
+# Tabelas já compiladas neste processo: (caminho, coluna) -> (assinatura do CSV, tabela)
+_TABELAS_COMPILADAS = {}
+
+
+def _assinatura(arquivo):
+    estado = os.stat(arquivo)
+    return estado.st_size, estado.st_mtime_ns
+
+
+def compilar_tabela(codigos, descricoes, coluna, tamanho_minimo=0):
+    """
+    Compila pares (código, descrição) numa tabela de consulta densa. Códigos
+    inválidos ou sem descrição são ignorados; código repetido fica com a primeira
+    descrição (a tradução nunca multiplica linhas)
+    """
+
+    codigos = pd.to_numeric(pd.Series(codigos), errors='coerce')
+    descricoes = pd.Series(descricoes, index=codigos.index)
+    validos = codigos.notna() & descricoes.notna() & (codigos >= 0) & (codigos % 1 == 0)
+
+    codigos = codigos[validos].to_numpy(dtype=np.int64)
+    descricoes = descricoes[validos].to_numpy(dtype=str)
+
+    categorias, posicoes = np.unique(descricoes, return_inverse=True)
+    unicos, primeiros = np.unique(codigos, return_index=True)
+
+    tamanho = max(tamanho_minimo, int(unicos[-1]) + 1 if len(unicos) else 0)
+    indices = np.full(tamanho, -1, dtype=np.int32)
+    indices[unicos] = posicoes[primeiros]
+
+    return {'coluna': coluna, 'indices': indices, 'descricoes': categorias}
+
+
+def _arquivo_compilado(pasta_cache, arquivo):
+    return os.path.join(pasta_cache, os.path.splitext(os.path.basename(arquivo))[0] + ".npz")
+
+
+def _carregar_compilada(pasta_cache, arquivo, coluna, assinatura):
+    """
+    Tabela gravada em pasta_cache, ou None se não existir ou for de outra versão do CSV
+    """
+
+    caminho = _arquivo_compilado(pasta_cache, arquivo)
+    if not os.path.exists(caminho):
+        return None
+
+    with np.load(caminho) as dados:
+        if (int(dados['tamanho']), int(dados['mtime_ns'])) != assinatura or str(dados['coluna']) != coluna:
+            return None
+        return {'coluna': coluna, 'indices': dados['indices'], 'descricoes': dados['descricoes']}
+
+
+def _salvar_compilada(pasta_cache, arquivo, tabela, assinatura):
+    os.makedirs(pasta_cache, exist_ok=True)
+    destino = _arquivo_compilado(pasta_cache, arquivo)
+    temporario = destino + ".tmp.npz"
+    np.savez(temporario, tamanho=np.int64(assinatura[0]), mtime_ns=np.int64(assinatura[1]),
+             coluna=np.str_(tabela['coluna']), indices=tabela['indices'], descricoes=tabela['descricoes'])
+    os.replace(temporario, destino)
+
+
+def _compilar_dicionario(arquivo, rotulo, palavras_codigo, palavras_nome, coluna_codigo, coluna, tamanho_minimo,
+                         pasta_cache):
     """
-    Lê os dados ordenados e traduz SH4 e CO_PAIS usando dicionários CSV
+    Tabela de consulta de um dicionário CSV: do cache em memória, do cache em disco ou,
+    se o CSV mudou (ou nunca foi compilado), lendo e compilando o CSV
     """
 
-    print("🚀 INICIANDO TRADUÇÃO DE DADOS COM DICIONÁRIOS CSV")
-    print("=" * 60)
+    chave = (os.path.abspath(arquivo), coluna)
+    assinatura = _assinatura(arquivo)
+
+    anterior = _TABELAS_COMPILADAS.get(chave)
+    if anterior is not None and anterior[0] == assinatura:
+        mostrar(f"♻️  Dicionário {rotulo} já compilado: {arquivo}")
+        return anterior[1]
 
-    # Carrega os dicionários CSV
-    print("📚 Carregando dicionários CSV...")
+    tabela = None
+    if pasta_cache is not None:
+        tabela = _carregar_compilada(pasta_cache, arquivo, coluna, assinatura)
+        if tabela is not None:
+            mostrar(f"♻️  Dicionário {rotulo} lido do cache: {arquivo}")
+
+    if tabela is None:
+        mostrar(f"📖 Lendo dicionário {rotulo}: {arquivo}")
+        df = pd.read_csv(arquivo, encoding='utf-8')
+        mostrar(f"✅ Dicionário {rotulo} carregado: {len(df)} registros")
+        mostrar(f"   Colunas disponíveis: {list(df.columns)}")
+
+        # Identifica as colunas do dicionário
+        coluna_origem = [col for col in df.columns if any(palavra in col.upper() for palavra in palavras_codigo)][0]
+        coluna_nome = [col for col in df.columns if any(palavra in col.upper() for palavra in palavras_nome)][0]
+        mostrar(f"   🔧 Mapeamento: {coluna_origem} → {coluna_codigo}, {coluna_nome} → {coluna}")
+
+        tabela = compilar_tabela(df[coluna_origem], df[coluna_nome], coluna, tamanho_minimo)
+        if pasta_cache is not None:
+            _salvar_compilada(pasta_cache, arquivo, tabela, assinatura)
+
+    _TABELAS_COMPILADAS[chave] = (assinatura, tabela)
+    return tabela
+
+
+def carregar_dicionarios(arquivo_sh4, arquivo_pais, pasta_cache=None):
+    """
+    Carrega os dicionários CSV de SH4 e de países já compilados em tabelas de consulta
+    (ver compilar_tabela). Com pasta_cache as tabelas também são gravadas em disco e
+    reaproveitadas por outras execuções enquanto os CSV não mudarem.
+    Retorna (tabela_sh4, tabela_pais), ou None em caso de erro
+    """
+
+    mostrar("📚 Carregando dicionários CSV...")
 
     try:
-        # Carrega dicionário SH4
-        print(f"📖 Lendo dicionário SH4: {arquivo_sh4}")
-        df_sh4 = pd.read_csv(arquivo_sh4, encoding='utf-8')
-        print(f"✅ Dicionário SH4 carregado: {len(df_sh4)} registros")
-        print(f"   Colunas disponíveis: {list(df_sh4.columns)}")
-
-        # Identifica colunas do dicionário SH4
-        coluna_sh4 = [col for col in df_sh4.columns if 'SH4' in col.upper()][0]
-        coluna_nome_sh4 = [col for col in df_sh4.columns if any(palavra in col.upper() for palavra in ['NOME', 'DESCRIÇÃO', 'DESCRICAO', 'NO_SH4_POR'])][0]
-
-        dicionario_sh4 = df_sh4[[coluna_sh4, coluna_nome_sh4]].copy()
-        dicionario_sh4.columns = ['SH4', 'NO_SH4_POR']
-        dicionario_sh4 = dicionario_sh4.drop_duplicates()
-        print(f"   🔧 Mapeamento: {coluna_sh4} → SH4, {coluna_nome_sh4} → NO_SH4_POR")
-
-        # Carrega dicionário de países
-        print(f"📖 Lendo dicionário países: {arquivo_pais}")
-        df_pais = pd.read_csv(arquivo_pais, encoding='utf-8')
-        print(f"✅ Dicionário países carregado: {len(df_pais)} registros")
-        print(f"   Colunas disponíveis: {list(df_pais.columns)}")
-
-        # Identifica colunas do dicionário de países
-        coluna_pais = [col for col in df_pais.columns if any(palavra in col.upper() for palavra in ['CO_PAIS', 'COD_PAIS', 'PAIS'])][0]
-        coluna_nome_pais = [col for col in df_pais.columns if any(palavra in col.upper() for palavra in ['NOME', 'NO_PAIS', 'NOME_PAIS'])][0]
-
-        dicionario_pais = df_pais[[coluna_pais, coluna_nome_pais]].copy()
-        dicionario_pais.columns = ['CO_PAIS', 'NO_PAIS']
-        dicionario_pais = dicionario_pais.drop_duplicates()
-        print(f"   🔧 Mapeamento: {coluna_pais} → CO_PAIS, {coluna_nome_pais} → NO_PAIS")
+        tabela_sh4 = _compilar_dicionario(arquivo_sh4, "SH4", ['SH4'],
+                                          ['NOME', 'DESCRIÇÃO', 'DESCRICAO', 'NO_SH4_POR'],
+                                          'SH4', 'NO_SH4_POR', TAMANHO_MINIMO_SH4, pasta_cache)
+        tabela_pais = _compilar_dicionario(arquivo_pais, "países", ['CO_PAIS', 'COD_PAIS', 'PAIS'],
+                                           ['NOME', 'NO_PAIS', 'NOME_PAIS'],
+                                           'CO_PAIS', 'NO_PAIS', 0, pasta_cache)
 
     except Exception as e:
-        print(f"❌ Erro ao carregar dicionários: {e}")
-        print("💡 Dica: Verifique se os arquivos CSV estão na mesma pasta do script")
-        return
+        avisar(f"❌ Erro ao carregar dicionários: {e}")
+        avisar("💡 Dica: Verifique se os arquivos CSV estão na mesma pasta do script")
+        return None
 
-    print("\n📖 Lendo arquivo de dados ordenados...")
+    return tabela_sh4, tabela_pais
 
-    try:
-        # Tenta ler como CSV (com diferentes separadores)
-        try:
-            df = pd.read_csv(arquivo_entrada, encoding='utf-8')
-        except:
-            try:
-                df = pd.read_csv(arquivo_entrada, sep='\t', encoding='utf-8')
-            except:
-                df = pd.read_csv(arquivo_entrada, sep=';', encoding='utf-8')
 
-        print(f"✅ Dados carregados: {len(df)} registros")
-        print(f"📊 Colunas disponíveis: {list(df.columns)}")
+def numero_secao(codigo):
+    """
+    Número da seção do SH a partir do código em algarismos romanos de NCM_SH.csv
+    (CO_NCM_SECROM: 'I'...'XXI'); -1 se o código não for reconhecido
+    """
+
+    texto = str(codigo).strip().upper()
+    if texto.isdigit():
+        return int(texto)
+    if not texto or any(letra not in ROMANOS for letra in texto):
+        return -1
+
+    total = maior = 0
+    for letra in reversed(texto):
+        valor = ROMANOS[letra]
+        total += valor if valor >= maior else -valor
+        maior = max(maior, valor)
+    return total
+
+
+def compilar_hierarquia(df):
+    """
+    Tabela da hierarquia do SH a partir de NCM_SH.csv já lido: capítulo de cada SH4
+    (SH4 // 100), seção de cada capítulo ('secao_do_sh2'[SH2], -1 se desconhecida) e
+    as tabelas de consulta das descrições de capítulo ('sh2') e de seção ('secao')
+    """
+
+    sh2 = pd.to_numeric(df['CO_SH2'], errors='coerce') if 'CO_SH2' in df.columns \
+        else pd.to_numeric(df['CO_SH4'], errors='coerce') // 100
+    secao = df['CO_NCM_SECROM'].map(numero_secao)
+
+    validos = sh2.notna() & (sh2 >= 0) & (sh2 < TAMANHO_SH2)
+    unicos, primeiros = np.unique(sh2[validos].to_numpy(dtype=np.int64), return_index=True)
+    secao_do_sh2 = np.full(TAMANHO_SH2, -1, dtype=np.int8)
+    secao_do_sh2[unicos] = secao[validos].to_numpy(dtype=np.int8)[primeiros]
+
+    return {
+        'secao_do_sh2': secao_do_sh2,
+        'sh2': compilar_tabela(sh2, df['NO_SH2_POR'], 'NO_SH2_POR', TAMANHO_SH2),
+        'secao': compilar_tabela(secao.where(secao >= 0), df['NO_SEC_POR'], 'NO_SEC_POR'),
+    }
+
+
+def _arquivo_hierarquia(pasta_cache, arquivo):
+    return os.path.join(pasta_cache, os.path.splitext(os.path.basename(arquivo))[0] + "_hierarquia.npz")
+
+
+def carregar_hierarquia(arquivo_sh4, pasta_cache=None):
+    """
+    Hierarquia do SH (seção → capítulo SH2 → posição SH4) do NCM_SH.csv, compilada uma
+    vez por processo (e, com pasta_cache, gravada em disco) como as tabelas de
+    carregar_dicionarios. Retorna o dicionário de compilar_hierarquia, ou None em caso de erro
+    """
+
+    chave = (os.path.abspath(arquivo_sh4), 'HIERARQUIA')
+    try:
+        assinatura = _assinatura(arquivo_sh4)
+        anterior = _TABELAS_COMPILADAS.get(chave)
+        if anterior is not None and anterior[0] == assinatura:
+            return anterior[1]
+
+        hierarquia = None
+        caminho = _arquivo_hierarquia(pasta_cache, arquivo_sh4) if pasta_cache is not None else None
+        if caminho is not None and os.path.exists(caminho):
+            with np.load(caminho) as dados:
+                if (int(dados['tamanho']), int(dados['mtime_ns'])) == assinatura:
+                    hierarquia = {
+                        'secao_do_sh2': dados['secao_do_sh2'],
+                        'sh2': {'coluna': 'NO_SH2_POR', 'indices': dados['sh2_indices'],
+                                'descricoes': dados['sh2_descricoes']},
+                        'secao': {'coluna': 'NO_SEC_POR', 'indices': dados['secao_indices'],
+                                  'descricoes': dados['secao_descricoes']},
+                    }
+
+        if hierarquia is None:
+            mostrar(f"📖 Lendo hierarquia do SH: {arquivo_sh4}")
+            hierarquia = compilar_hierarquia(pd.read_csv(arquivo_sh4, encoding='utf-8', dtype=str))
+            if caminho is not None:
+                os.makedirs(pasta_cache, exist_ok=True)
+                temporario = caminho + ".tmp.npz"
+                np.savez(temporario, tamanho=np.int64(assinatura[0]), mtime_ns=np.int64(assinatura[1]),
+                         secao_do_sh2=hierarquia['secao_do_sh2'],
+                         sh2_indices=hierarquia['sh2']['indices'], sh2_descricoes=hierarquia['sh2']['descricoes'],
+                         secao_indices=hierarquia['secao']['indices'],
+                         secao_descricoes=hierarquia['secao']['descricoes'])
+                os.replace(temporario, caminho)
 
     except Exception as e:
-        print(f"❌ Erro ao ler arquivo de dados: {e}")
-        return
+        avisar(f"❌ Erro ao carregar a hierarquia do SH: {e}")
+        return None
+
+    _TABELAS_COMPILADAS[chave] = (assinatura, hierarquia)
+    return hierarquia
+
+
+def traduzir_coluna(codigos, tabela):
+    """
+    Traduz uma série de códigos pela tabela de consulta. Retorna (Categorical com as
+    descrições, máscara dos códigos traduzidos); códigos ausentes da tabela ficam NaN
+    """
+
+    valores = pd.to_numeric(pd.Series(codigos), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    indices = tabela['indices']
+
+    validos = (valores >= 0) & (valores < len(indices)) & (valores % 1 == 0)
+    posicoes = np.full(len(valores), -1, dtype=np.int32)
+    posicoes[validos] = indices[valores[validos].astype(np.int64)]
+
+    traducao = pd.Categorical.from_codes(posicoes, categories=tabela['descricoes'])
+    return traducao, posicoes >= 0
+
+
+def traduzir_dataframe(df, tabela_sh4, tabela_pais):
+    """
+    Núcleo de traduzir_dados_com_csv, sobre um DataFrame já carregado (não o altera).
+    Retorna (df_traduzido, sh4_traduzidos, pais_traduzidos), ou None se faltar alguma coluna
+    """
 
     # Verifica se as colunas necessárias existem
     colunas_necessarias = ['SH4', 'CO_PAIS']
     for coluna in colunas_necessarias:
         if coluna not in df.columns:
-            print(f"❌ Coluna '{coluna}' não encontrada nos dados")
-            return
+            avisar(f"❌ Coluna '{coluna}' não encontrada nos dados")
+            return None
 
-    print("\n🔍 Realizando traduções...")
+    mostrar("\n🔍 Realizando traduções...")
 
     # Faz uma cópia do DataFrame original
     df_traduzido = df.copy()
 
     # Converte colunas para o mesmo tipo dos dicionários
-    print("🔄 Convertendo tipos de dados para compatibilidade...")
+    mostrar("🔄 Convertendo tipos de dados para compatibilidade...")
 
     df_traduzido['SH4'] = pd.to_numeric(df_traduzido['SH4'], errors='coerce')
     df_traduzido['CO_PAIS'] = pd.to_numeric(df_traduzido['CO_PAIS'], errors='coerce')
 
-    dicionario_sh4['SH4'] = pd.to_numeric(dicionario_sh4['SH4'], errors='coerce')
-    dicionario_pais['CO_PAIS'] = pd.to_numeric(dicionario_pais['CO_PAIS'], errors='coerce')
-
     # 1. Traduz SH4 para NO_SH4_POR
-    print("📦 Traduzindo códigos SH4...")
-    registros_antes = len(df_traduzido)
-    df_traduzido = df_traduzido.merge(dicionario_sh4, on='SH4', how='left')
+    mostrar("📦 Traduzindo códigos SH4...")
+    traducao_sh4, traduzidos = traduzir_coluna(df_traduzido['SH4'], tabela_sh4)
+    df_traduzido['NO_SH4_POR'] = traducao_sh4
 
     # Verifica quantos SH4 não foram traduzidos
-    sh4_nao_traduzidos = df_traduzido['NO_SH4_POR'].isna().sum()
-    sh4_traduzidos = len(df_traduzido) - sh4_nao_traduzidos
-    print(f"   ✅ SH4 traduzidos: {sh4_traduzidos}/{len(df_traduzido)} ({sh4_traduzidos/len(df_traduzido)*100:.1f}%)")
+    sh4_traduzidos = int(traduzidos.sum())
+    sh4_nao_traduzidos = len(df_traduzido) - sh4_traduzidos
+    mostrar(f"   ✅ SH4 traduzidos: {sh4_traduzidos}/{len(df_traduzido)} ({sh4_traduzidos/len(df_traduzido)*100:.1f}%)")
 
-    if sh4_nao_traduzidos > 0:
-        sh4_faltantes = df_traduzido[df_traduzido['NO_SH4_POR'].isna()]['SH4'].unique()
-        print(f"   ⚠️  SH4 não encontrados no dicionário: {sh4_nao_traduzidos}")
-        print(f"   🔍 Códigos faltantes (amostra): {sh4_faltantes[:10]}")
+    if sh4_nao_traduzidos > 0 and detalhado():
+        sh4_faltantes = df_traduzido['SH4'][~traduzidos].unique()
+        mostrar(f"   ⚠️  SH4 não encontrados no dicionário: {sh4_nao_traduzidos}")
+        mostrar(f"   🔍 Códigos faltantes (amostra): {sh4_faltantes[:10]}")
 
     # 2. Traduz CO_PAIS para NO_PAIS
-    print("🌍 Traduzindo códigos de países...")
-    df_traduzido = df_traduzido.merge(dicionario_pais, on='CO_PAIS', how='left')
+    mostrar("🌍 Traduzindo códigos de países...")
+    traducao_pais, traduzidos = traduzir_coluna(df_traduzido['CO_PAIS'], tabela_pais)
+    df_traduzido['NO_PAIS'] = traducao_pais
 
     # Verifica quantos países não foram traduzidos
-    pais_nao_traduzidos = df_traduzido['NO_PAIS'].isna().sum()
-    pais_traduzidos = len(df_traduzido) - pais_nao_traduzidos
-    print(f"   ✅ Países traduzidos: {pais_traduzidos}/{len(df_traduzido)} ({pais_traduzidos/len(df_traduzido)*100:.1f}%)")
+    pais_traduzidos = int(traduzidos.sum())
+    pais_nao_traduzidos = len(df_traduzido) - pais_traduzidos
+    mostrar(f"   ✅ Países traduzidos: {pais_traduzidos}/{len(df_traduzido)} ({pais_traduzidos/len(df_traduzido)*100:.1f}%)")
 
-    if pais_nao_traduzidos > 0:
-        pais_faltantes = df_traduzido[df_traduzido['NO_PAIS'].isna()]['CO_PAIS'].unique()
-        print(f"   ⚠️  Países não encontrados no dicionário: {pais_nao_traduzidos}")
-        print(f"   🔍 Códigos faltantes (amostra): {pais_faltantes[:10]}")
+    if pais_nao_traduzidos > 0 and detalhado():
+        pais_faltantes = df_traduzido['CO_PAIS'][~traduzidos].unique()
+        mostrar(f"   ⚠️  Países não encontrados no dicionário: {pais_nao_traduzidos}")
+        mostrar(f"   🔍 Códigos faltantes (amostra): {pais_faltantes[:10]}")
 
     # Reorganiza as colunas - coloca as novas colunas ao lado das originais
     colunas_ordenadas = []
 
     for coluna in df.columns:
+        if coluna in ('NO_SH4_POR', 'NO_PAIS'):
+            continue
         colunas_ordenadas.append(coluna)
         if coluna == 'SH4':
             colunas_ordenadas.append('NO_SH4_POR')
         elif coluna == 'CO_PAIS':
             colunas_ordenadas.append('NO_PAIS')
 
-    # Adiciona quaisquer colunas que possam ter ficado de fora
-    for coluna in df_traduzido.columns:
-        if coluna not in colunas_ordenadas:
-            colunas_ordenadas.append(coluna)
+    df_traduzido = aplicar_esquema(df_traduzido[colunas_ordenadas].copy())
+
+    return df_traduzido, sh4_traduzidos, pais_traduzidos
+
+def traduzir_dados_com_csv(arquivo_entrada, arquivo_saida, arquivo_sh4, arquivo_pais, formato='csv'):
+    """
+    Lê os dados ordenados (CSV ou colunar) e traduz SH4 e CO_PAIS usando dicionários CSV.
+    Com formato='colunar' a saída é gravada em .npz, com NO_SH4_POR e NO_PAIS como
+    dicionário (cada descrição uma vez só)
+    """
+
+    mostrar("🚀 INICIANDO TRADUÇÃO DE DADOS COM DICIONÁRIOS CSV")
+    mostrar("=" * 60)
 
-    df_traduzido = df_traduzido[colunas_ordenadas]
+    with etapa('traduzir') as metricas:
+        # Carrega os dicionários CSV
+        dicionarios = carregar_dicionarios(arquivo_sh4, arquivo_pais)
+        if dicionarios is None:
+            metricas['erro'] = "dicionários não carregados"
+            return
+        tabela_sh4, tabela_pais = dicionarios
+
+        mostrar("\n📖 Lendo arquivo de dados ordenados...")
+        arquivo_entrada = localizar_tabela(arquivo_entrada)
+
+        try:
+            # Formato detectado pelo conteúdo; no CSV, o separador (vírgula, tab ou
+            # ponto e vírgula) é detectado pelo cabeçalho
+            df = ler_tabela(arquivo_entrada)
+
+            mostrar(f"✅ Dados carregados: {len(df)} registros")
+            mostrar(f"📊 Colunas disponíveis: {list(df.columns)}")
 
-    print("\n💾 Salvando arquivo traduzido...")
+        except Exception as e:
+            avisar(f"❌ Erro ao ler arquivo de dados: {e}")
+            metricas['erro'] = str(e)
+            return
 
-    # Salva o novo arquivo
-    df_traduzido.to_csv(arquivo_saida, index=False, encoding='utf-8')
+        metricas.update(linhas_entrada=len(df), bytes_lidos=os.path.getsize(arquivo_entrada))
+        resultado = traduzir_dataframe(df, tabela_sh4, tabela_pais)
+        if resultado is None:
+            return
+        df_traduzido, sh4_traduzidos, pais_traduzidos = resultado
+
+        mostrar("\n💾 Salvando arquivo traduzido...")
+
+        # Salva o novo arquivo
+        arquivo_saida = gravar_tabela(df_traduzido, arquivo_saida, formato)
+        metricas.update(linhas_saida=len(df_traduzido), sh4_traduzidos=sh4_traduzidos,
+                        paises_traduzidos=pais_traduzidos, arquivos_saida=[arquivo_saida])
+
+    if not detalhado():
+        return
 
     print(f"\n🎉 TRADUÇÃO CONCLUÍDA!")
     print(f"📁 Arquivo salvo: {arquivo_saida}")
@@ -169,12 +409,12 @@ if __name__ == "__main__":
     ARQUIVO_PAIS = "dicionario_pais.csv"    # Arquivo CSV com códigos de países
 
     # Verifica se os arquivos existem
-    print("🔍 Verificando arquivos...")
+    mostrar("🔍 Verificando arquivos...")
     for arquivo in [ARQUIVO_ENTRADA, ARQUIVO_SH4, ARQUIVO_PAIS]:
         if os.path.exists(arquivo):
-            print(f"   ✅ {arquivo} - encontrado")
+            mostrar(f"   ✅ {arquivo} - encontrado")
         else:
-            print(f"   ❌ {arquivo} - não encontrado")
+            mostrar(f"   ❌ {arquivo} - não encontrado")
 
-    print("\n")
+    mostrar("\n")
     traduzir_dados_com_csv(ARQUIVO_ENTRADA, ARQUIVO_SAIDA, ARQUIVO_SH4, ARQUIVO_PAIS)
@@ -0,0 +1,246 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Layout dos arquivos anuais do Comex Stat (município x SH4)
+COLUNAS = ['CO_ANO', 'CO_MES', 'SH4', 'CO_PAIS', 'SG_UF_MUN', 'CO_MUN', 'KG_LIQUIDO', 'VL_FOB']
+COLUNAS_NUMERICAS = ['CO_ANO', 'CO_MES', 'SH4', 'CO_PAIS', 'CO_MUN', 'KG_LIQUIDO', 'VL_FOB']
+
+# Tipos compactos usados em todas as etapas (f_mun_pato, f_sh6 e dicionario).
+# Códigos no menor inteiro que os comporta; textos que se repetem a cada linha
+# (UF e descrições) como categorias. KG_LIQUIDO e VL_FOB passam de 2^31 em alguns
+# registros, por isso ficam em int64.
+TIPOS = {
+    'CO_ANO': 'int16',
+    'CO_MES': 'int8',
+    'SH4': 'int16',
+    'CO_PAIS': 'int16',
+    'SG_UF_MUN': 'category',
+    'CO_MUN': 'int32',
+    'KG_LIQUIDO': 'int64',
+    'VL_FOB': 'int64',
+    'NO_SH4_POR': 'category',
+    'NO_PAIS': 'category',
+    'FREQ_SH4': 'int32',
+    'FREQ_PAIS': 'int32',
+    'FREQ_SH4_ANO': 'int32',
+    'FREQ_PAIS_ANO': 'int32',
+    'FLUXO': 'category',
+    'SH2': 'int8',
+    'SECAO': 'int8',
+    'NO_SH2_POR': 'category',
+    'NO_SEC_POR': 'category',
+    'FREQ_SH2': 'int32',
+    'FREQ_SECAO': 'int32',
+    'FREQ_SH2_ANO': 'int32',
+    'FREQ_SECAO_ANO': 'int32',
+}
+
+# Colunas de texto que já podem ser lidas como categoria pelo read_csv
+TIPOS_LEITURA = {col: tipo for col, tipo in TIPOS.items() if tipo == 'category'}
+
+# Formatos de gravação das etapas. 'colunar' é um .npz compactado com um array por
+# coluna já no tipo compacto; textos (UF, descrições) são gravados como dicionário:
+# as descrições distintas uma vez e um código inteiro por linha. O CSV continua
+# disponível para exportação.
+FORMATOS = ('csv', 'colunar')
+EXTENSAO_COLUNAR = '.npz'
+
+# Assinatura de arquivo ZIP (o .npz é um ZIP de .npy)
+_ASSINATURA_ZIP = b'PK\x03\x04'
+
+
+def _converter_inteiro(serie, tipo):
+    """
+    Converte a série para o inteiro compacto 'tipo'. Com valores ausentes usa o
+    inteiro anulável correspondente (Int16, Int32...); valores fora da faixa do tipo
+    ou com casas decimais mantêm o tipo original, sem perda de informação
+    """
+
+    if not pd.api.types.is_numeric_dtype(serie):
+        serie = pd.to_numeric(serie, errors='coerce')
+
+    if serie.dtype == tipo:
+        return serie
+
+    presentes = serie.dropna()
+    if len(presentes):
+        faixa = np.iinfo(tipo)
+        if presentes.min() < faixa.min or presentes.max() > faixa.max:
+            return serie
+        if pd.api.types.is_float_dtype(presentes) and not (presentes % 1 == 0).all():
+            return serie
+
+    if len(presentes) < len(serie):
+        return serie.astype(tipo.capitalize())
+    return serie.astype(tipo)
+
+
+def aplicar_esquema(df):
+    """
+    Converte (no próprio DataFrame) as colunas conhecidas para os tipos de TIPOS.
+    Colunas fora do esquema não são alteradas
+    """
+
+    for col in df.columns:
+        tipo = TIPOS.get(col)
+        if tipo is None:
+            continue
+
+        if tipo == 'category':
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        else:
+            df[col] = _converter_inteiro(df[col], tipo)
+
+    return df
+
+
+def concatenar(partes):
+    """
+    pd.concat que preserva o esquema (categorias com valores diferentes em cada parte
+    viram texto no concat e são reconvertidas aqui)
+    """
+
+    return aplicar_esquema(pd.concat(partes, ignore_index=True))
+
+
+def detectar_separador(arquivo, encoding='utf-8'):
+    """
+    Separador do arquivo (tab, ponto e vírgula ou vírgula), pelo cabeçalho
+    """
+
+    with open(arquivo, 'r', encoding=encoding) as f:
+        cabecalho = f.readline()
+    return max([',', '\t', ';'], key=cabecalho.count)
+
+
+def ler_csv(arquivo, **opcoes):
+    """
+    Lê um CSV/TSV gerado pelas etapas do projeto já no esquema compacto.
+    Sem 'sep', o separador é detectado pelo cabeçalho
+    """
+
+    opcoes.setdefault('encoding', 'utf-8')
+    if 'sep' not in opcoes:
+        opcoes['sep'] = detectar_separador(arquivo, opcoes['encoding'])
+    df = pd.read_csv(arquivo, dtype=TIPOS_LEITURA, **opcoes)
+    return aplicar_esquema(df)
+
+
+def para_numpy(serie):
+    """
+    Array numpy simples (gravável com np.save) de uma coluna no esquema: categorias
+    viram texto (ausentes como '', que é como o to_csv os grava, e não 'nan') e
+    inteiros anuláveis com ausentes viram float64 com NaN
+    """
+
+    if isinstance(serie.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(serie):
+        return serie.astype(object).fillna('').to_numpy(dtype=str)
+    if isinstance(serie.dtype, pd.api.extensions.ExtensionDtype):
+        if serie.isna().any():
+            return serie.to_numpy(dtype='float64', na_value=np.nan)
+        return serie.to_numpy(dtype=serie.dtype.numpy_dtype)
+    return serie.to_numpy()
+
+
+def caminho_no_formato(arquivo, formato):
+    """
+    Nome do arquivo no formato pedido: no colunar, a extensão (.csv, .tsv...) vira .npz
+    """
+
+    if formato not in FORMATOS:
+        raise ValueError(f"formato deve ser um de {FORMATOS}, não {formato!r}")
+    if formato == 'csv':
+        return arquivo
+    return os.path.splitext(arquivo)[0] + EXTENSAO_COLUNAR
+
+
+def eh_colunar(arquivo):
+    """
+    True se o arquivo está no formato colunar (detectado pelo conteúdo, não pelo nome)
+    """
+
+    with open(arquivo, 'rb') as f:
+        return f.read(len(_ASSINATURA_ZIP)) == _ASSINATURA_ZIP
+
+
+def gravar_tabela(df, arquivo, formato='csv', **opcoes_csv):
+    """
+    Grava df como CSV (opcoes_csv repassadas ao to_csv, ex.: sep='\\t') ou no formato
+    colunar. Retorna o caminho gravado (ver caminho_no_formato)
+    """
+
+    arquivo = caminho_no_formato(arquivo, formato)
+
+    if formato == 'csv':
+        opcoes_csv.setdefault('encoding', 'utf-8')
+        df.to_csv(arquivo, index=False, **opcoes_csv)
+        return arquivo
+
+    arrays = {'__colunas__': np.array(list(df.columns), dtype=str)}
+    for col in df.columns:
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(serie):
+            categorica = serie.astype('category').cat.remove_unused_categories()
+            arrays[f"{col}.codigos"] = categorica.cat.codes.to_numpy()
+            arrays[f"{col}.categorias"] = categorica.cat.categories.to_numpy(dtype=str)
+        elif isinstance(serie.dtype, pd.api.extensions.ExtensionDtype):
+            # Inteiros anuláveis: valores (ausentes como 0) e máscara dos ausentes
+            ausentes = serie.isna().to_numpy()
+            arrays[f"{col}.valores"] = serie.to_numpy(dtype=serie.dtype.numpy_dtype, na_value=0)
+            arrays[f"{col}.ausentes"] = ausentes
+        else:
+            arrays[f"{col}.valores"] = serie.to_numpy()
+
+    # Grava com nome temporário para que uma leitura nunca encontre o arquivo pela metade
+    temporario = arquivo + ".tmp"
+    with open(temporario, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(temporario, arquivo)
+    return arquivo
+
+
+def _ler_colunar(arquivo):
+    with np.load(arquivo, allow_pickle=False) as dados:
+        colunas = {}
+        for col in dados['__colunas__']:
+            col = str(col)
+            if f"{col}.codigos" in dados:
+                colunas[col] = pd.Categorical.from_codes(dados[f"{col}.codigos"], dados[f"{col}.categorias"])
+            elif f"{col}.ausentes" in dados:
+                valores, ausentes = dados[f"{col}.valores"], dados[f"{col}.ausentes"]
+                if np.issubdtype(valores.dtype, np.integer):
+                    colunas[col] = pd.arrays.IntegerArray(valores, ausentes)
+                else:
+                    colunas[col] = pd.arrays.FloatingArray(valores.astype('float64'), ausentes)
+            else:
+                colunas[col] = dados[f"{col}.valores"]
+    return aplicar_esquema(pd.DataFrame(colunas))
+
+
+def localizar_tabela(arquivo):
+    """
+    'arquivo' ou, se ele não existe mas sua versão colunar (.npz) existe, a versão
+    colunar: as etapas seguintes encontram a saída gravada com formato='colunar'
+    mesmo quando recebem o nome .csv de sempre
+    """
+
+    colunar = caminho_no_formato(arquivo, 'colunar')
+    if not os.path.exists(arquivo) and os.path.exists(colunar):
+        return colunar
+    return arquivo
+
+
+def ler_tabela(arquivo, **opcoes_csv):
+    """
+    Lê a saída de uma etapa em qualquer formato, já no esquema compacto. O formato é
+    detectado pelo conteúdo (ver também localizar_tabela); opcoes_csv só se aplicam
+    a CSV (ver ler_csv)
+    """
+
+    arquivo = localizar_tabela(arquivo)
+    if eh_colunar(arquivo):
+        return _ler_colunar(arquivo)
+    return ler_csv(arquivo, **opcoes_csv)
@@ -1,109 +1,359 @@
 import pandas as pd
 import os
-import glob
 
-def filtrar_municipio_por_ano(pasta_entrada, arquivo_saida, codigo_municipio=4118501):
+from esquema import COLUNAS, COLUNAS_NUMERICAS, aplicar_esquema, concatenar, gravar_tabela
+from leitor_bruto import (MOTOR_PADRAO, TAMANHO_BLOCO_PADRAO, abrir_texto, converter_linhas, executar_por_arquivo,
+                          filtrar_arquivo_em_blocos, filtrar_arquivo_mmap, listar_arquivos_anuais, mascara_filtro,
+                          normalizar_filtro, resolver_motor)
+from cache_colunar import atualizar_cache, filtrar_cache
+from indice_municipios import carregar_indice, filtrar_por_indice, posicoes_no_cache
+from relatorio import avisar, cronometro, detalhado, etapa, mostrar
+
+# Município filtrado quando nem município nem UF são pedidos (Pato Branco)
+MUNICIPIO_PADRAO = 4118501
+
+
+def _municipio_ou_padrao(codigo_municipio, uf=None):
     """
-    Filtra dados de múltiplos arquivos CSV por código municipal e organiza por ano
+    codigo_municipio, ou MUNICIPIO_PADRAO quando nem município nem UF foram pedidos:
+    uma UF sozinha seleciona o estado inteiro
     """
 
-    # Lista todos os arquivos CSV na pasta
-    padrao_arquivos = os.path.join(pasta_entrada, "*.csv")
-    arquivos_csv = glob.glob(padrao_arquivos)
+    if codigo_municipio is None and uf is None:
+        return MUNICIPIO_PADRAO
+    return codigo_municipio
 
-    if not arquivos_csv:
-        print(f"Nenhum arquivo CSV encontrado em {pasta_entrada}")
-        return
 
-    print(f"Encontrados {len(arquivos_csv)} arquivos CSV")
+def _descrever_filtro(codigos, ufs):
+    """
+    Texto curto do filtro aplicado, usado nas mensagens
+    """
+
+    partes = []
+    if codigos is not None:
+        if len(codigos) == 1:
+            partes.append(f"município {next(iter(codigos))}")
+        else:
+            partes.append(f"{len(codigos)} municípios")
+    if ufs is not None:
+        partes.append(f"UF {', '.join(sorted(ufs))}")
+    return " / ".join(partes) or "todos os municípios"
 
-    # Lista para armazenar todos os dados filtrados
-    dados_filtrados = []
 
-    for arquivo in arquivos_csv:
+def _nome_saida_municipio(arquivo_saida, codigo):
+    """
+    Nome do arquivo de saída de um município: usa '{CO_MUN}' se presente no nome,
+    senão acrescenta '_<CO_MUN>' antes da extensão
+    """
+
+    if '{CO_MUN}' in arquivo_saida:
+        return arquivo_saida.replace('{CO_MUN}', str(codigo))
+    base, extensao = os.path.splitext(arquivo_saida)
+    return f"{base}_{codigo}{extensao}"
+
+
+def _salvar_saida(df_final, arquivo_saida, separar_por_municipio, formato='csv'):
+    """
+    Salva o resultado em um único arquivo ou, com separar_por_municipio=True, em um
+    arquivo por CO_MUN. formato='csv' grava TSV; 'colunar' grava .npz (ver
+    esquema.gravar_tabela). Retorna a lista de arquivos gravados
+    """
+
+    if not separar_por_municipio:
+        return [gravar_tabela(df_final, arquivo_saida, formato, sep='\t')]
+
+    arquivos = []
+    for codigo, df_municipio in df_final.groupby('CO_MUN', sort=True):
+        nome = _nome_saida_municipio(arquivo_saida, int(codigo))
+        arquivos.append(gravar_tabela(df_municipio, nome, formato, sep='\t'))
+    return arquivos
+
+
+def _filtrar_arquivo(arquivo, codigos, ufs, motor='python'):
+    """
+    Lê e filtra um único arquivo anual (usado por filtrar_municipio_por_ano).
+    O layout bruto (';') é convertido pelo motor de leitura pedido (ver leitor_bruto.MOTORES).
+    Retorna (df_filtrado ou None, mensagens para exibir, métricas do arquivo)
+    """
+
+    mensagens = []
+    resultado = None
+    with cronometro() as medida:
+        medida.update(arquivo=os.path.basename(arquivo), modo='pandas', motor=motor,
+                      bytes_lidos=os.path.getsize(arquivo))
         try:
-            print(f"\n--- Processando: {os.path.basename(arquivo)} ---")
+            mensagens.append(f"\n--- Processando: {os.path.basename(arquivo)} ---")
 
             # Lê o arquivo CSV com separador correto
             # Primeiro vamos ler a primeira linha para entender a estrutura
-            with open(arquivo, 'r', encoding='utf-8') as f:
+            with abrir_texto(arquivo) as f:
                 primeira_linha = f.readline().strip()
 
-            print(f"Estrutura da primeira linha: {primeira_linha}")
+            mensagens.append(f"Estrutura da primeira linha: {primeira_linha}")
 
             # Se a primeira linha contém todas as colunas juntas, precisamos reparar o CSV
             if ';' in primeira_linha and primeira_linha.count(';') > 3:
-                # Lê o arquivo ignorando a primeira linha (cabeçalho) e usando ; como separador
-                df = pd.read_csv(arquivo, sep=';', skiprows=1, header=None, encoding='utf-8')
+                # O motor de leitura ignora o cabeçalho, remove as aspas e já devolve as 8 colunas tipadas
+                with abrir_texto(arquivo) as f:
+                    df = converter_linhas(f.readlines(), 0, motor)
 
-                # Define os nomes das colunas manualmente baseado na estrutura
-                colunas = ['CO_ANO', 'CO_MES', 'SH4', 'CO_PAIS', 'SG_UF_MUN', 'CO_MUN', 'KG_LIQUIDO', 'VL_FOB']
-                df.columns = colunas
-
-                print(f"✅ Arquivo reparado! Colunas: {list(df.columns)}")
+                mensagens.append(f"✅ Arquivo reparado! Colunas: {list(df.columns)}")
 
             else:
                 # Tenta ler normalmente
                 df = pd.read_csv(arquivo, encoding='utf-8')
-                print(f"Colunas disponíveis: {list(df.columns)}")
+                mensagens.append(f"Colunas disponíveis: {list(df.columns)}")
 
-            # Remove aspas dos valores se existirem
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    df[col] = df[col].astype(str).str.replace('"', '')
+                # Remove aspas dos valores se existirem
+                for col in df.columns:
+                    if df[col].dtype == 'object':
+                        df[col] = df[col].astype(str).str.replace('"', '')
 
-            # Converte colunas numéricas
-            colunas_numericas = ['CO_ANO', 'CO_MES', 'SH4', 'CO_PAIS', 'CO_MUN', 'KG_LIQUIDO', 'VL_FOB']
-            for col in colunas_numericas:
+            # Converte colunas numéricas e aplica os tipos compactos do esquema
+            for col in COLUNAS_NUMERICAS:
                 if col in df.columns:
                     df[col] = pd.to_numeric(df[col], errors='coerce')
+            aplicar_esquema(df)
+            medida['linhas_lidas'] = len(df)
 
-            print(f"Amostra dos dados processados:")
-            print(df.head(2).to_string())
+            mensagens.append(f"Amostra dos dados processados:")
+            mensagens.append(df.head(2).to_string())
 
-            # Filtra pelo código do município
-            df_filtrado = df[df['CO_MUN'] == codigo_municipio].copy()
+            # Filtra pelo(s) código(s) do município / UF
+            df_filtrado = df[mascara_filtro(df, codigos, ufs)].copy()
+            medida['linhas_selecionadas'] = len(df_filtrado)
 
             if not df_filtrado.empty:
-                dados_filtrados.append(df_filtrado)
-                print(f"✅ {len(df_filtrado)} registros encontrados para município {codigo_municipio}")
+                mensagens.append(f"✅ {len(df_filtrado)} registros encontrados para {_descrever_filtro(codigos, ufs)}")
+                resultado = df_filtrado
             else:
-                print(f"❌ Nenhum registro para município {codigo_municipio}")
+                mensagens.append(f"❌ Nenhum registro para {_descrever_filtro(codigos, ufs)}")
 
         except Exception as e:
-            print(f"❌ Erro ao processar {os.path.basename(arquivo)}: {e}")
+            medida['erro'] = str(e)
+            mensagens.append(f"❌ Erro ao processar {os.path.basename(arquivo)}: {e}")
             # Tentativa alternativa de leitura
             try:
-                print("Tentando leitura alternativa...")
+                mensagens.append("Tentando leitura alternativa...")
                 df = pd.read_csv(arquivo, encoding='latin-1')
-                print(f"Colunas (alternativa): {list(df.columns)}")
+                mensagens.append(f"Colunas (alternativa): {list(df.columns)}")
             except Exception as e2:
-                print(f"❌ Falha na leitura alternativa: {e2}")
+                mensagens.append(f"❌ Falha na leitura alternativa: {e2}")
+
+    return resultado, mensagens, medida
+
+
+def _indice_atual(pasta_indice, arquivo, codigos, mensagens):
+    """
+    Índice por município do arquivo, se houver um atual e o filtro tiver códigos CO_MUN
+    """
+
+    if pasta_indice is None or codigos is None:
+        return None
+
+    indice = carregar_indice(pasta_indice, arquivo)
+    if indice is None:
+        mensagens.append("⚠️  Índice ausente ou desatualizado: lendo o arquivo inteiro")
+    return indice
+
+
+def _processar_arquivo(arquivo, codigos, ufs, tamanho_bloco, pre_filtro=False, pasta_indice=None, motor='python'):
+    """
+    Lê e filtra um único arquivo anual (usado por processar_arquivos_mal_formatados),
+    com o motor de leitura já resolvido (ver leitor_bruto.resolver_motor).
+    Retorna (df_filtrado ou None, mensagens para exibir, métricas do arquivo)
+    """
+
+    mensagens = [f"\n--- Processando: {os.path.basename(arquivo)} ---"]
+    resultado = None
+
+    with cronometro() as medida:
+        medida['arquivo'] = os.path.basename(arquivo)
+        try:
+            indice = _indice_atual(pasta_indice, arquivo, codigos, mensagens)
+
+            if indice is not None:
+                # Lê só as faixas de bytes dos municípios pedidos
+                df_filtrado, bytes_lidos = filtrar_por_indice(arquivo, indice, codigos, ufs)
+                amostra = None
+                mensagens.append(f"🗂️  Índice: {bytes_lidos} de {os.path.getsize(arquivo)} bytes lidos")
+                medida.update(modo='indice', linhas_lidas=len(df_filtrado), bytes_lidos=bytes_lidos)
+            elif pre_filtro:
+                # Procura o município direto nos bytes do arquivo; só as linhas candidatas são lidas
+                df_filtrado, total_candidatas, amostra = filtrar_arquivo_mmap(
+                    arquivo, codigos, ufs, tamanho_bloco, motor
+                )
+                mensagens.append(f"⚡ {total_candidatas} linhas candidatas (pré-filtro em bytes)")
+                medida.update(modo='pre_filtro', linhas_lidas=total_candidatas,
+                              bytes_lidos=os.path.getsize(arquivo))
+            else:
+                # Lê o arquivo em blocos, filtrando o município durante a leitura
+                df_filtrado, total_lidos, amostra = filtrar_arquivo_em_blocos(
+                    arquivo, codigos, ufs, tamanho_bloco, motor
+                )
+                mensagens.append(f"✅ {total_lidos} registros lidos (motor {motor})")
+                medida.update(modo='blocos', motor=motor, linhas_lidas=total_lidos,
+                              bytes_lidos=os.path.getsize(arquivo))
+
+            medida['linhas_selecionadas'] = len(df_filtrado)
+
+            if amostra is not None:
+                mensagens.append(f"Amostra:")
+                mensagens.append(amostra.to_string())
+
+            if len(df_filtrado) > 0:
+                mensagens.append(f"🎯 {len(df_filtrado)} registros para {_descrever_filtro(codigos, ufs)}")
+                resultado = df_filtrado
+            else:
+                mensagens.append(f"❌ Nenhum registro para {_descrever_filtro(codigos, ufs)}")
+
+        except Exception as e:
+            medida['erro'] = str(e)
+            mensagens.append(f"❌ Erro: {e}")
+
+    return resultado, mensagens, medida
+
+
+def _processar_cache(pasta_arquivo, codigos, ufs, pasta_entrada=None, pasta_indice=None):
+    """
+    Mesmo papel de _processar_arquivo, mas lendo as colunas já convertidas do cache
+    """
+
+    mensagens = [f"\n--- Processando (cache): {os.path.basename(pasta_arquivo)} ---"]
+    resultado = None
+
+    with cronometro() as medida:
+        medida.update(arquivo=os.path.basename(pasta_arquivo), modo='cache')
+        try:
+            # Com índice atual, só as linhas dos municípios pedidos são examinadas
+            candidatas = None
+            if pasta_entrada is not None:
+                arquivo = os.path.join(pasta_entrada, os.path.basename(pasta_arquivo) + ".csv")
+                indice = None
+                if not os.path.exists(arquivo):
+                    if pasta_indice is not None:
+                        mensagens.append(f"⚠️  {os.path.basename(arquivo)} não encontrado em {pasta_entrada}: "
+                                         f"sem índice, examinando o cache inteiro")
+                else:
+                    indice = _indice_atual(pasta_indice, arquivo, codigos, mensagens)
+                if indice is not None:
+                    candidatas = posicoes_no_cache(indice, codigos)
+                    mensagens.append(f"🗂️  Índice: {len(candidatas)} linhas candidatas")
+                    medida['modo'] = 'cache_indice'
+
+            df_filtrado, total_lidos, amostra = filtrar_cache(pasta_arquivo, codigos, ufs, candidatas)
+            medida.update(linhas_lidas=total_lidos if candidatas is None else len(candidatas),
+                          linhas_selecionadas=len(df_filtrado))
+
+            mensagens.append(f"📦 {total_lidos} registros no cache")
+            mensagens.append(f"Amostra:")
+            mensagens.append(amostra.to_string())
+
+            if len(df_filtrado) > 0:
+                mensagens.append(f"🎯 {len(df_filtrado)} registros para {_descrever_filtro(codigos, ufs)}")
+                resultado = df_filtrado
+            else:
+                mensagens.append(f"❌ Nenhum registro para {_descrever_filtro(codigos, ufs)}")
 
-    if not dados_filtrados:
-        print(f"\n🚫 Nenhum dado encontrado para o município {codigo_municipio}")
+        except Exception as e:
+            medida['erro'] = str(e)
+            mensagens.append(f"❌ Erro: {e}")
+
+    return resultado, mensagens, medida
+
+
+def _exibir_mensagens(mensagens, medida):
+    """
+    Mensagens de um arquivo: as de um arquivo com erro saem por avisar (aparecem
+    também no modo 'metricas'), as demais só no modo 'detalhado'
+    """
+
+    exibir = avisar if 'erro' in medida else mostrar
+    for mensagem in mensagens:
+        exibir(mensagem)
+
+
+def _resumir_arquivos(metricas, medidas):
+    """
+    Totais da etapa de filtragem a partir das métricas de cada arquivo
+    """
+
+    metricas['linhas_entrada'] = sum(medida.get('linhas_lidas', 0) for medida in medidas)
+    metricas['bytes_lidos'] = sum(medida.get('bytes_lidos', 0) for medida in medidas)
+    metricas['arquivos'] = medidas
+
+
+def filtrar_municipio_por_ano(pasta_entrada, arquivo_saida, codigo_municipio=4118501, workers=1,
+                              uf=None, separar_por_municipio=False, formato='csv', motor=MOTOR_PADRAO):
+    """
+    Filtra dados de múltiplos arquivos CSV por código municipal e organiza por ano.
+    codigo_municipio aceita um código ou um conjunto de códigos; uf (sigla ou conjunto)
+    filtra por SG_UF_MUN (para um estado inteiro use codigo_municipio=None).
+    Todos os municípios saem de uma única leitura; com separar_por_municipio=True é
+    gravado um arquivo por município.
+    Com workers > 1 (ou None = todos os núcleos) os arquivos anuais são lidos em paralelo.
+    formato='colunar' grava a saída em .npz em vez de TSV.
+    motor escolhe o parser das linhas brutas ('python', 'pandas', 'arrow' ou 'auto', o
+    mais rápido disponível; ver leitor_bruto.MOTORES)
+    """
+
+    codigos, ufs = normalizar_filtro(codigo_municipio, uf)
+
+    # Lista todos os arquivos anuais na pasta (CSV ou ZIP/gzip/XZ baixados do Comex Stat)
+    arquivos_csv = listar_arquivos_anuais(pasta_entrada)
+
+    if not arquivos_csv:
+        avisar(f"Nenhum arquivo CSV encontrado em {pasta_entrada}")
         return
 
-    # Combina todos os dados filtrados
-    df_final = pd.concat(dados_filtrados, ignore_index=True)
+    motor = resolver_motor(motor, arquivos_csv)
 
-    # Ordena por ano e mês
-    if 'CO_ANO' in df_final.columns and 'CO_MES' in df_final.columns:
-        df_final = df_final.sort_values(['CO_ANO', 'CO_MES'])
-    elif 'CO_ANO' in df_final.columns:
-        df_final = df_final.sort_values('CO_ANO')
+    mostrar(f"Encontrados {len(arquivos_csv)} arquivos CSV")
+
+    with etapa('filtrar', filtro=_descrever_filtro(codigos, ufs)) as metricas:
+        # Lista para armazenar todos os dados filtrados
+        dados_filtrados = []
+        medidas = []
 
-    # Seleciona e ordena as colunas na sequência desejada
-    colunas_desejadas = ['CO_ANO', 'CO_MES', 'SH4', 'CO_PAIS', 'SG_UF_MUN', 'CO_MUN', 'KG_LIQUIDO', 'VL_FOB']
-    colunas_existentes = [col for col in colunas_desejadas if col in df_final.columns]
-    df_final = df_final[colunas_existentes]
+        # Processa os arquivos (em série ou em paralelo) e recebe os resultados em ordem de ano
+        for df_filtrado, mensagens, medida in executar_por_arquivo(_filtrar_arquivo, arquivos_csv, workers,
+                                                                   codigos, ufs, motor):
+            _exibir_mensagens(mensagens, medida)
+            medidas.append(medida)
+            if df_filtrado is not None:
+                dados_filtrados.append(df_filtrado)
+
+        _resumir_arquivos(metricas, medidas)
+
+        if not dados_filtrados:
+            metricas['linhas_saida'] = 0
+            avisar(f"\n🚫 Nenhum dado encontrado para {_descrever_filtro(codigos, ufs)}")
+            return
+
+        # Combina todos os dados filtrados
+        df_final = concatenar(dados_filtrados)
 
-    # Salva o arquivo de saída
-    df_final.to_csv(arquivo_saida, index=False, sep='\t')
+        # Ordena por ano e mês
+        if 'CO_ANO' in df_final.columns and 'CO_MES' in df_final.columns:
+            df_final = df_final.sort_values(['CO_ANO', 'CO_MES'])
+        elif 'CO_ANO' in df_final.columns:
+            df_final = df_final.sort_values('CO_ANO')
+
+        # Seleciona e ordena as colunas na sequência desejada
+        colunas_existentes = [col for col in COLUNAS if col in df_final.columns]
+        df_final = df_final[colunas_existentes]
+
+        # Salva o(s) arquivo(s) de saída
+        arquivos_salvos = _salvar_saida(df_final, arquivo_saida, separar_por_municipio, formato)
+        metricas.update(linhas_saida=len(df_final), arquivos_saida=arquivos_salvos)
+
+    if not detalhado():
+        return
 
     # Estatísticas
     print(f"\n🎉 PROCESSAMENTO CONCLUÍDO!")
-    print(f"📁 Arquivo salvo: {arquivo_saida}")
+    for arquivo in arquivos_salvos:
+        print(f"📁 Arquivo salvo: {arquivo}")
     print(f"📊 Total de registros: {len(df_final)}")
 
     if 'CO_ANO' in df_final.columns:
@@ -119,90 +369,94 @@ def filtrar_municipio_por_ano(pasta_entrada, arquivo_saida, codigo_municipio=411
     print(f"\n📄 RESULTADO FINAL:")
     print(df_final.to_string(index=False))
 
-# Versão específica para o formato problemático dos seus arquivos
-def processar_arquivos_mal_formatados(pasta_entrada, arquivo_saida, codigo_municipio=4118501):
+def filtrar_arquivos_mal_formatados(pasta_entrada, codigo_municipio=4118501, tamanho_bloco=TAMANHO_BLOCO_PADRAO,
+                                    workers=1, uf=None, pre_filtro=False, pasta_cache=None,
+                                    pasta_indice=None, motor=MOTOR_PADRAO):
     """
-    Versão específica para arquivos onde todas as colunas estão em uma string
+    Núcleo de processar_arquivos_mal_formatados: filtra os arquivos anuais e devolve o
+    DataFrame combinado e ordenado por ano e mês (ou None se nada foi encontrado),
+    sem gravar arquivo. As opções são as de processar_arquivos_mal_formatados
     """
 
-    padrao_arquivos = os.path.join(pasta_entrada, "*.csv")
-    arquivos_csv = glob.glob(padrao_arquivos)
-
-    if not arquivos_csv:
-        print(f"Nenhum arquivo CSV encontrado em {pasta_entrada}")
-        return
-
-    print(f"Encontrados {len(arquivos_csv)} arquivos CSV")
-
-    dados_filtrados = []
-
-    for arquivo in arquivos_csv:
-        print(f"\n--- Processando: {os.path.basename(arquivo)} ---")
-
-        try:
-            # Lê todo o conteúdo do arquivo
-            with open(arquivo, 'r', encoding='utf-8') as f:
-                linhas = f.readlines()
-
-            # Processa cada linha
-            dados = []
-            for i, linha in enumerate(linhas):
-                linha = linha.strip()
-                if not linha:
-                    continue
-
-                if i == 0:  # Cabeçalho
-                    continue
-
-                # Divide a linha por ponto e vírgula
-                partes = linha.split(';')
-
-                # Remove aspas de cada parte
-                partes = [p.replace('"', '') for p in partes]
+    codigos, ufs = normalizar_filtro(codigo_municipio, uf)
 
-                # Verifica se temos 8 colunas (como esperado)
-                if len(partes) == 8:
-                    dados.append(partes)
+    arquivos_csv = listar_arquivos_anuais(pasta_entrada)
 
-            # Cria DataFrame
-            colunas = ['CO_ANO', 'CO_MES', 'SH4', 'CO_PAIS', 'SG_UF_MUN', 'CO_MUN', 'KG_LIQUIDO', 'VL_FOB']
-            df = pd.DataFrame(dados, columns=colunas)
+    if not arquivos_csv:
+        avisar(f"Nenhum arquivo CSV encontrado em {pasta_entrada}")
+        return None
+
+    mostrar(f"Encontrados {len(arquivos_csv)} arquivos CSV")
+
+    with etapa('filtrar', filtro=_descrever_filtro(codigos, ufs)) as metricas:
+        dados_filtrados = []
+        medidas = []
+
+        if pasta_cache is not None:
+            # Atualiza o cache (apenas arquivos novos ou alterados) e filtra a partir dele
+            pastas_cache = atualizar_cache(pasta_entrada, pasta_cache, tamanho_bloco, workers, motor)
+            resultados = executar_por_arquivo(_processar_cache, pastas_cache, workers, codigos, ufs,
+                                              pasta_entrada, pasta_indice)
+        else:
+            motor = resolver_motor(motor, arquivos_csv, tamanho_bloco)
+            resultados = executar_por_arquivo(_processar_arquivo, arquivos_csv, workers,
+                                              codigos, ufs, tamanho_bloco, pre_filtro, pasta_indice, motor)
+
+        # Processa os arquivos (em série ou em paralelo) e recebe os resultados em ordem de ano
+        for df_filtrado, mensagens, medida in resultados:
+            _exibir_mensagens(mensagens, medida)
+            medidas.append(medida)
+            if df_filtrado is not None:
+                dados_filtrados.append(df_filtrado)
 
-            # Converte para tipos numéricos
-            for col in ['CO_ANO', 'CO_MES', 'SH4', 'CO_PAIS', 'CO_MUN', 'KG_LIQUIDO', 'VL_FOB']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+        _resumir_arquivos(metricas, medidas)
 
-            print(f"✅ {len(df)} registros lidos")
-            print(f"Amostra:")
-            print(df.head(2).to_string())
+        if not dados_filtrados:
+            metricas['linhas_saida'] = 0
+            avisar(f"\n🚫 Nenhum dado encontrado para {_descrever_filtro(codigos, ufs)}")
+            return None
 
-            # Filtra pelo município
-            df_filtrado = df[df['CO_MUN'] == codigo_municipio]
+        # Combina resultados
+        df_final = concatenar(dados_filtrados)
+        df_final = df_final.sort_values(['CO_ANO', 'CO_MES'])
+        metricas['linhas_saida'] = len(df_final)
 
-            if len(df_filtrado) > 0:
-                dados_filtrados.append(df_filtrado)
-                print(f"🎯 {len(df_filtrado)} registros para município {codigo_municipio}")
-            else:
-                print(f"❌ Nenhum registro para município {codigo_municipio}")
+    return df_final
 
-        except Exception as e:
-            print(f"❌ Erro: {e}")
+# Versão específica para o formato problemático dos seus arquivos
+def processar_arquivos_mal_formatados(pasta_entrada, arquivo_saida, codigo_municipio=4118501,
+                                      tamanho_bloco=TAMANHO_BLOCO_PADRAO, workers=1,
+                                      uf=None, separar_por_municipio=False, pre_filtro=False,
+                                      pasta_cache=None, pasta_indice=None, formato='csv', motor=MOTOR_PADRAO):
+    """
+    Versão específica para arquivos onde todas as colunas estão em uma string.
+    Cada arquivo é lido em blocos de ~tamanho_bloco bytes (None = arquivo inteiro).
+    Com workers > 1 (ou None = todos os núcleos) os arquivos anuais são lidos em paralelo.
+    Com pre_filtro=True o arquivo é mapeado em memória e só as linhas que contêm o
+    código procurado são divididas e convertidas (mesmo resultado, bem mais rápido).
+    Com pasta_cache, os CSV são convertidos uma única vez para um cache colunar
+    (só os anos que mudaram são reconvertidos) e a filtragem lê as colunas do cache.
+    Com pasta_indice (ver indice_municipios.construir_indice), os anos com índice atual
+    têm lidas apenas as linhas dos municípios pedidos.
+    Filtros, saídas por município, formato e motor funcionam como em filtrar_municipio_por_ano
+    """
 
-    if not dados_filtrados:
-        print(f"\n🚫 Nenhum dado encontrado para o município {codigo_municipio}")
+    df_final = filtrar_arquivos_mal_formatados(pasta_entrada, codigo_municipio, tamanho_bloco, workers, uf,
+                                               pre_filtro, pasta_cache, pasta_indice, motor)
+    if df_final is None:
         return
 
-    # Combina resultados
-    df_final = pd.concat(dados_filtrados, ignore_index=True)
-    df_final = df_final.sort_values(['CO_ANO', 'CO_MES'])
-
     # Salva
-    df_final.to_csv(arquivo_saida, index=False, sep='\t')
+    arquivos_salvos = _salvar_saida(df_final, arquivo_saida, separar_por_municipio, formato)
 
-    print(f"\n🎉 CONCLUÍDO! Arquivo salvo: {arquivo_saida}")
-    print(f"📊 Total de registros: {len(df_final)}")
-    print(f"\n📄 RESULTADO:")
-    print(df_final.to_string(index=False))
+    for arquivo in arquivos_salvos:
+        mostrar(f"\n🎉 CONCLUÍDO! Arquivo salvo: {arquivo}")
+    mostrar(f"📊 Total de registros: {len(df_final)}")
+
+    # A tabela inteira só é formatada no modo detalhado
+    if detalhado():
+        print(f"\n📄 RESULTADO:")
+        print(df_final.to_string(index=False))
 
 # Exemplo de uso
 if __name__ == "__main__":
@@ -210,5 +464,7 @@ if __name__ == "__main__":
     ARQUIVO_SAIDA = "dados_import_filtrados_municipio_4118501.csv"
     CODIGO_MUNICIPIO = 4118501
 
-    # Usa a versão específica para arquivos mal formatados
+    # Usa a versão específica para arquivos mal formatados. Para ler em paralelo e só as
+    # linhas candidatas: workers=os.cpu_count(), pre_filtro=True (ver também uf,
+    # pasta_cache, pasta_indice e motor)
     processar_arquivos_mal_formatados(PASTA_ENTRADA, ARQUIVO_SAIDA, CODIGO_MUNICIPIO)
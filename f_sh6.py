@@ -1,69 +1,107 @@
 import pandas as pd
 import os
 
-def ordenar_hierarquicamente(arquivo_entrada, arquivo_saida):
+from esquema import aplicar_esquema, gravar_tabela, ler_tabela, localizar_tabela
+from relatorio import avisar, detalhado, etapa, mostrar
+
+def _colunas_fluxo(df):
     """
-    Ordena os dados hierarquicamente por:
-    1. Ano (CO_ANO)
-    2. Frequência do SH4 (mais repetido primeiro)
-    3. Frequência do CO_PAIS (mais repetido primeiro)
-    4. Valor FOB (VL_FOB - maior primeiro)
+    ['FLUXO'] se o DataFrame junta exportação e importação, senão []
     """
 
-    print("📖 Lendo arquivo de entrada...")
-
-    try:
-        # Lê o arquivo TSV (separado por tab)
-        df = pd.read_csv(arquivo_entrada, sep='\t', encoding='utf-8')
-        print(f"✅ Arquivo lido com sucesso! {len(df)} registros encontrados")
+    return ['FLUXO'] if 'FLUXO' in df.columns else []
 
-    except Exception as e:
-        print(f"❌ Erro ao ler arquivo: {e}")
-        return
+def calcular_ordem_hierarquica(df):
+    """
+    Núcleo de ordenar_hierarquicamente, sobre um DataFrame já carregado (não o altera).
+    Com a coluna FLUXO (exportação e importação juntas, ver balanca), as frequências
+    são contadas dentro de cada fluxo e cada fluxo é ordenado à parte, como se as
+    tabelas tivessem sido processadas separadamente.
+    Retorna (df_ordenado, freq_sh4, freq_pais), ou None se faltar alguma coluna
+    """
 
     # Verifica se as colunas necessárias existem
     colunas_necessarias = ['CO_ANO', 'SH4', 'CO_PAIS', 'VL_FOB']
     for coluna in colunas_necessarias:
         if coluna not in df.columns:
-            print(f"❌ Coluna '{coluna}' não encontrada no arquivo")
-            print(f"Colunas disponíveis: {list(df.columns)}")
-            return
+            avisar(f"❌ Coluna '{coluna}' não encontrada no arquivo")
+            avisar(f"Colunas disponíveis: {list(df.columns)}")
+            return None
 
-    print("\n📊 Calculando frequências...")
+    mostrar("\n📊 Calculando frequências...")
+    fluxo = _colunas_fluxo(df)
 
     # Calcula frequência de cada SH4 (total geral)
-    freq_sh4 = df['SH4'].value_counts().reset_index()
-    freq_sh4.columns = ['SH4', 'FREQ_SH4']
+    freq_sh4 = df[fluxo + ['SH4']].value_counts().reset_index()
+    freq_sh4.columns = fluxo + ['SH4', 'FREQ_SH4']
 
     # Calcula frequência de cada CO_PAIS (total geral)
-    freq_pais = df['CO_PAIS'].value_counts().reset_index()
-    freq_pais.columns = ['CO_PAIS', 'FREQ_PAIS']
+    freq_pais = df[fluxo + ['CO_PAIS']].value_counts().reset_index()
+    freq_pais.columns = fluxo + ['CO_PAIS', 'FREQ_PAIS']
 
     # Adiciona as frequências ao DataFrame principal
-    df = df.merge(freq_sh4, on='SH4', how='left')
-    df = df.merge(freq_pais, on='CO_PAIS', how='left')
+    df = df.merge(freq_sh4, on=fluxo + ['SH4'], how='left')
+    df = df.merge(freq_pais, on=fluxo + ['CO_PAIS'], how='left')
+    aplicar_esquema(df)
 
-    print("🎯 Ordenando dados hierarquicamente...")
+    mostrar("🎯 Ordenando dados hierarquicamente...")
 
     # Ordenação hierárquica:
     # 1. Primeiro por ano (crescente)
     # 2. Depois por frequência do SH4 (decrescente - mais frequente primeiro)
     # 3. Depois por frequência do CO_PAIS (decrescente - mais frequente primeiro)
     # 4. Finalmente por VL_FOB (decrescente - maior valor primeiro)
-    df_ordenado = df.sort_values([
+    df_ordenado = df.sort_values(fluxo + [
         'CO_ANO',           # Ano em ordem crescente
         'FREQ_SH4',         # SH4 mais frequente primeiro
         'FREQ_PAIS',        # País mais frequente primeiro
         'VL_FOB'            # Maior valor FOB primeiro
-    ], ascending=[True, False, False, False])
+    ], ascending=[True] * len(fluxo) + [True, False, False, False])
 
     # Remove as colunas de frequência temporárias se desejar
     # df_ordenado = df_ordenado.drop(['FREQ_SH4', 'FREQ_PAIS'], axis=1)
 
-    print("💾 Salvando arquivo ordenado...")
+    return df_ordenado, freq_sh4, freq_pais
+
+def ordenar_hierarquicamente(arquivo_entrada, arquivo_saida, formato='csv'):
+    """
+    Ordena os dados hierarquicamente por:
+    1. Ano (CO_ANO)
+    2. Frequência do SH4 (mais repetido primeiro)
+    3. Frequência do CO_PAIS (mais repetido primeiro)
+    4. Valor FOB (VL_FOB - maior primeiro)
+    A entrada pode ser TSV ou colunar (detectado); formato='colunar' grava .npz
+    """
+
+    with etapa('ordenar_hierarquicamente') as metricas:
+        mostrar("📖 Lendo arquivo de entrada...")
+        arquivo_entrada = localizar_tabela(arquivo_entrada)
 
-    # Salva o novo arquivo CSV
-    df_ordenado.to_csv(arquivo_saida, index=False, encoding='utf-8')
+        try:
+            # Lê o arquivo TSV (separado por tab) ou colunar
+            df = ler_tabela(arquivo_entrada, sep='\t')
+            mostrar(f"✅ Arquivo lido com sucesso! {len(df)} registros encontrados")
+            metricas['bytes_lidos'] = os.path.getsize(arquivo_entrada)
+
+        except Exception as e:
+            avisar(f"❌ Erro ao ler arquivo: {e}")
+            metricas['erro'] = str(e)
+            return
+
+        metricas['linhas_entrada'] = len(df)
+        resultado = calcular_ordem_hierarquica(df)
+        if resultado is None:
+            return
+        df_ordenado, freq_sh4, freq_pais = resultado
+
+        mostrar("💾 Salvando arquivo ordenado...")
+
+        # Salva o novo arquivo CSV (ou colunar)
+        arquivo_saida = gravar_tabela(df_ordenado, arquivo_saida, formato)
+        metricas.update(linhas_saida=len(df_ordenado), arquivos_saida=[arquivo_saida])
+
+    if not detalhado():
+        return
 
     # Gera estatísticas
     print(f"\n🎉 PROCESSAMENTO CONCLUÍDO!")
@@ -90,58 +128,62 @@ def ordenar_hierarquicamente(arquivo_entrada, arquivo_saida):
     colunas_existentes = [col for col in colunas_mostrar if col in df_ordenado.columns]
     print(df_ordenado[colunas_existentes].head(10).to_string(index=False))
 
-def ordenar_por_ano_e_frequencia(arquivo_entrada, arquivo_saida):
+def calcular_ordem_por_ano(df):
     """
-    Versão alternativa: ordena considerando frequências dentro de cada ano
+    Núcleo de ordenar_por_ano_e_frequencia, sobre um DataFrame já carregado (não o altera)
     """
 
-    print("📖 Lendo arquivo de entrada...")
-
-    try:
-        df = pd.read_csv(arquivo_entrada, sep='\t', encoding='utf-8')
-        print(f"✅ Arquivo lido com sucesso! {len(df)} registros encontrados")
-
-    except Exception as e:
-        print(f"❌ Erro ao ler arquivo: {e}")
-        return
-
     # Calcula frequências por ano
-    print("\n📊 Calculando frequências por ano...")
-
-    dados_por_ano = []
-
-    for ano in df['CO_ANO'].unique():
-        df_ano = df[df['CO_ANO'] == ano].copy()
-
-        # Frequência SH4 dentro do ano
-        freq_sh4_ano = df_ano['SH4'].value_counts().reset_index()
-        freq_sh4_ano.columns = ['SH4', 'FREQ_SH4_ANO']
-
-        # Frequência CO_PAIS dentro do ano
-        freq_pais_ano = df_ano['CO_PAIS'].value_counts().reset_index()
-        freq_pais_ano.columns = ['CO_PAIS', 'FREQ_PAIS_ANO']
+    mostrar("\n📊 Calculando frequências por ano...")
+
+    # Frequências dentro de cada ano (e fluxo), calculadas de uma vez por grupo (ano, código)
+    fluxo = _colunas_fluxo(df)
+    df = df.assign(
+        FREQ_SH4_ANO=df.groupby(fluxo + ['CO_ANO', 'SH4'], observed=True)['SH4'].transform('size'),
+        FREQ_PAIS_ANO=df.groupby(fluxo + ['CO_ANO', 'CO_PAIS'], observed=True)['CO_PAIS'].transform('size'),
+    )
+    aplicar_esquema(df)
+
+    # Ordenação única e estável: ano crescente e, dentro do ano, SH4 mais frequente,
+    # país mais frequente e maior valor FOB (empates mantêm a ordem de entrada)
+    df_final = df.sort_values(fluxo + [
+        'CO_ANO',          # Ano em ordem crescente
+        'FREQ_SH4_ANO',    # SH4 mais frequente no ano primeiro
+        'FREQ_PAIS_ANO',   # País mais frequente no ano primeiro
+        'VL_FOB'           # Maior valor FOB primeiro
+    ], ascending=[True] * len(fluxo) + [True, False, False, False], kind='stable', ignore_index=True)
+
+    return df_final
+
+def ordenar_por_ano_e_frequencia(arquivo_entrada, arquivo_saida, formato='csv'):
+    """
+    Versão alternativa: ordena considerando frequências dentro de cada ano.
+    Entrada e formato como em ordenar_hierarquicamente
+    """
 
-        # Adiciona frequências do ano
-        df_ano = df_ano.merge(freq_sh4_ano, on='SH4', how='left')
-        df_ano = df_ano.merge(freq_pais_ano, on='CO_PAIS', how='left')
+    with etapa('ordenar_por_ano') as metricas:
+        mostrar("📖 Lendo arquivo de entrada...")
+        arquivo_entrada = localizar_tabela(arquivo_entrada)
 
-        # Ordena dentro do ano
-        df_ano_ordenado = df_ano.sort_values([
-            'FREQ_SH4_ANO',    # SH4 mais frequente no ano primeiro
-            'FREQ_PAIS_ANO',   # País mais frequente no ano primeiro
-            'VL_FOB'           # Maior valor FOB primeiro
-        ], ascending=[False, False, False])
+        try:
+            df = ler_tabela(arquivo_entrada, sep='\t')
+            mostrar(f"✅ Arquivo lido com sucesso! {len(df)} registros encontrados")
+            metricas['bytes_lidos'] = os.path.getsize(arquivo_entrada)
 
-        dados_por_ano.append(df_ano_ordenado)
+        except Exception as e:
+            avisar(f"❌ Erro ao ler arquivo: {e}")
+            metricas['erro'] = str(e)
+            return
 
-    # Combina todos os anos
-    df_final = pd.concat(dados_por_ano, ignore_index=True)
+        metricas['linhas_entrada'] = len(df)
+        df_final = calcular_ordem_por_ano(df)
 
-    # Ordena por ano (crescente)
-    df_final = df_final.sort_values('CO_ANO')
+        mostrar("💾 Salvando arquivo ordenado...")
+        arquivo_saida = gravar_tabela(df_final, arquivo_saida, formato)
+        metricas.update(linhas_saida=len(df_final), arquivos_saida=[arquivo_saida])
 
-    print("💾 Salvando arquivo ordenado...")
-    df_final.to_csv(arquivo_saida, index=False, encoding='utf-8')
+    if not detalhado():
+        return
 
     print(f"\n🎉 PROCESSAMENTO CONCLUÍDO!")
     print(f"📁 Arquivo salvo: {arquivo_saida}")
@@ -158,12 +200,12 @@ if __name__ == "__main__":
     ARQUIVO_SAIDA = "dados_ordenados_hierarquico.csv"
     ARQUIVO_SAIDA_ALTERNATIVO = "dados_ordenados_por_ano.csv"
 
-    print("=" * 60)
-    print("ORDENAÇÃO HIERÁRQUICA - FREQUÊNCIA GERAL")
-    print("=" * 60)
+    mostrar("=" * 60)
+    mostrar("ORDENAÇÃO HIERÁRQUICA - FREQUÊNCIA GERAL")
+    mostrar("=" * 60)
     ordenar_hierarquicamente(ARQUIVO_ENTRADA, ARQUIVO_SAIDA)
 
-    print("\n" + "=" * 60)
-    print("ORDENAÇÃO POR ANO - FREQUÊNCIA POR ANO")
-    print("=" * 60)
+    mostrar("\n" + "=" * 60)
+    mostrar("ORDENAÇÃO POR ANO - FREQUÊNCIA POR ANO")
+    mostrar("=" * 60)
     ordenar_por_ano_e_frequencia(ARQUIVO_ENTRADA, ARQUIVO_SAIDA_ALTERNATIVO)
@@ -0,0 +1,156 @@
+import pandas as pd
+import numpy as np
+
+from dicionario import traduzir_coluna
+from esquema import aplicar_esquema
+from f_sh6 import _colunas_fluxo
+
+# Agregações pela hierarquia do SH: seção → capítulo (SH2) → posição (SH4). Os níveis
+# são obtidos só com aritmética de inteiros sobre o código SH4 (SH2 = SH4 // 100 e a
+# seção pela tabela 'secao_do_sh2' de dicionario.carregar_hierarquia), sem juntar textos.
+# As linhas são agregadas uma única vez em células (ano, SH4, país); os rankings e as
+# versões por capítulo e por seção das ordenações de f_sh6 saem dessas células.
+NIVEIS_SH = ('SECAO', 'SH2', 'SH4')
+MEDIDAS = ['REGISTROS', 'VL_FOB', 'KG_LIQUIDO']
+
+# Nível → (tabela de descrições em carregar_hierarquia, coluna da descrição)
+DESCRICOES = {
+    'SECAO': ('secao', 'NO_SEC_POR'),
+    'SH2': ('sh2', 'NO_SH2_POR'),
+}
+
+
+def codigos_do_nivel(sh4, nivel, hierarquia):
+    """
+    Códigos SH4 convertidos para o nível pedido (SH4, SH2 ou SECAO). Seção
+    desconhecida fica -1, assim como SH4 ausente (<NA> das colunas inteiras
+    anuláveis) em qualquer nível
+    """
+
+    sh4 = pd.Series(sh4)
+    ausentes = sh4.isna().to_numpy()
+    sh4 = sh4.fillna(-1).to_numpy(dtype=np.int64)
+    if nivel == 'SH4':
+        return sh4
+    sh2 = np.where(ausentes, -1, sh4 // 100)
+    if nivel == 'SH2':
+        return sh2
+    if nivel != 'SECAO':
+        raise ValueError(f"nível deve ser um de {NIVEIS_SH}, não {nivel!r}")
+
+    tabela = hierarquia['secao_do_sh2']
+    secao = np.full(len(sh2), -1, dtype=np.int8)
+    validos = (sh2 >= 0) & (sh2 < len(tabela))
+    secao[validos] = tabela[sh2[validos]]
+    return secao
+
+
+def agregar_celulas(df, descartar_ausentes=True):
+    """
+    A única passada sobre as linhas: número de registros e somas de VL_FOB e
+    KG_LIQUIDO por (FLUXO, CO_ANO, SH4, CO_PAIS). Aceita também células já agregadas
+    (com REGISTROS, como as do cubo). Com descartar_ausentes=False, registros com
+    algum código ausente formam células próprias (como no cubo)
+    """
+
+    if 'REGISTROS' not in df.columns:
+        df = df.assign(REGISTROS=1)
+    chaves = _colunas_fluxo(df) + ['CO_ANO', 'SH4', 'CO_PAIS']
+    medidas = [col for col in MEDIDAS if col in df.columns]
+    # Registros com código ausente (<NA>) não entram em nenhuma célula, como nas
+    # frequências de f_sh6
+    if descartar_ausentes:
+        df = df.dropna(subset=chaves)
+    return df.groupby(chaves, observed=True, dropna=descartar_ausentes)[medidas].sum().reset_index()
+
+
+def _celulas_no_nivel(celulas, nivel, hierarquia):
+    """
+    Células reagrupadas no nível pedido: (FLUXO, CO_ANO, nivel, CO_PAIS)
+    """
+
+    chaves = _colunas_fluxo(celulas) + ['CO_ANO', nivel, 'CO_PAIS']
+    celulas = celulas.assign(**{nivel: codigos_do_nivel(celulas['SH4'], nivel, hierarquia)})
+    medidas = [col for col in MEDIDAS if col in celulas.columns]
+    return celulas.groupby(chaves, observed=True)[medidas].sum().reset_index()
+
+
+def ranking_por_nivel(df, hierarquia, nivel='SH2', por_ano=False, limite=None):
+    """
+    Ranking de frequência (número de registros) e de valor por nível do SH, a partir
+    das linhas filtradas ou das células de agregar_celulas. Ordena do mais frequente
+    para o menos frequente (empates pelo menor código); com por_ano=True, dentro de
+    cada ano. limite restringe aos primeiros de cada ranking
+    """
+
+    celulas = agregar_celulas(df) if 'REGISTROS' not in df.columns else df.dropna(subset=['SH4'])
+    celulas = celulas.assign(**{nivel: codigos_do_nivel(celulas['SH4'], nivel, hierarquia)})
+
+    chaves = _colunas_fluxo(celulas) + (['CO_ANO'] if por_ano else []) + [nivel]
+    medidas = [col for col in MEDIDAS if col in celulas.columns]
+    ranking = celulas.groupby(chaves, observed=True)[medidas].sum().reset_index()
+    ranking = ranking.sort_values(chaves[:-1] + ['REGISTROS', nivel],
+                                  ascending=[True] * (len(chaves) - 1) + [False, True],
+                                  kind='stable', ignore_index=True)
+
+    if limite is not None:
+        ranking = ranking.groupby(chaves[:-1], sort=False).head(limite) if len(chaves) > 1 \
+            else ranking.head(limite)
+        ranking = ranking.reset_index(drop=True)
+
+    return traduzir_nivel(ranking, nivel, hierarquia)
+
+
+def ordens_por_nivel(df, hierarquia, niveis=('SH2', 'SECAO')):
+    """
+    Versões por capítulo e/ou por seção das duas ordenações de f_sh6, montadas a partir
+    de uma única agregação das linhas. Cada linha do resultado é um (ano, código do
+    nível, país) com REGISTROS, VL_FOB e KG_LIQUIDO:
+      - hierárquica: ano, FREQ_<nivel> (registros do código em toda a série), FREQ_PAIS e VL_FOB
+      - por ano: ano, FREQ_<nivel>_ANO, FREQ_PAIS_ANO e VL_FOB
+    Com FLUXO, tudo é feito dentro de cada fluxo. Empates ficam na ordem dos códigos.
+    Retorna {nivel: (df_hierarquico, df_por_ano)}
+    """
+
+    celulas = agregar_celulas(df)
+    fluxo = _colunas_fluxo(celulas)
+    ordens = {}
+
+    for nivel in niveis:
+        tabela = _celulas_no_nivel(celulas, nivel, hierarquia)
+        registros = tabela['REGISTROS']
+
+        hierarquica = tabela.assign(**{
+            f"FREQ_{nivel}": registros.groupby([tabela[col] for col in fluxo + [nivel]]).transform('sum'),
+            'FREQ_PAIS': registros.groupby([tabela[col] for col in fluxo + ['CO_PAIS']]).transform('sum'),
+        })
+        hierarquica = hierarquica.sort_values(
+            fluxo + ['CO_ANO', f"FREQ_{nivel}", 'FREQ_PAIS', 'VL_FOB'],
+            ascending=[True] * len(fluxo) + [True, False, False, False], kind='stable', ignore_index=True)
+
+        por_ano = tabela.assign(**{
+            f"FREQ_{nivel}_ANO": registros.groupby([tabela[col] for col in fluxo + ['CO_ANO', nivel]]).transform('sum'),
+            'FREQ_PAIS_ANO': registros.groupby([tabela[col] for col in fluxo + ['CO_ANO', 'CO_PAIS']]).transform('sum'),
+        })
+        por_ano = por_ano.sort_values(
+            fluxo + ['CO_ANO', f"FREQ_{nivel}_ANO", 'FREQ_PAIS_ANO', 'VL_FOB'],
+            ascending=[True] * len(fluxo) + [True, False, False, False], kind='stable', ignore_index=True)
+
+        ordens[nivel] = (aplicar_esquema(hierarquica), aplicar_esquema(por_ano))
+
+    return ordens
+
+
+def traduzir_nivel(df, nivel, hierarquia, tabela_pais=None):
+    """
+    Acrescenta a descrição do nível (NO_SH2_POR ou NO_SEC_POR) ao lado do código e,
+    com tabela_pais, NO_PAIS ao lado de CO_PAIS. Não altera df
+    """
+
+    df = df.copy()
+    if nivel in DESCRICOES:
+        tabela, coluna = DESCRICOES[nivel]
+        df.insert(df.columns.get_loc(nivel) + 1, coluna, traduzir_coluna(df[nivel], hierarquia[tabela])[0])
+    if tabela_pais is not None and 'CO_PAIS' in df.columns:
+        df.insert(df.columns.get_loc('CO_PAIS') + 1, 'NO_PAIS', traduzir_coluna(df['CO_PAIS'], tabela_pais)[0])
+    return aplicar_esquema(df)
@@ -0,0 +1,254 @@
+import pandas as pd
+import numpy as np
+import glob
+import json
+import os
+import shutil
+
+from leitor_bruto import (TAMANHO_BLOCO_PADRAO, compactado, dividir_linhas, executar_por_arquivo,
+                          montar_dataframe, selecionar_linhas)
+from relatorio import mostrar
+
+# Índice por município: para cada arquivo anual, uma pasta com as linhas agrupadas por
+# CO_MUN (.npy, lidos por mapeamento em memória):
+#   municipios.npy - códigos CO_MUN em ordem crescente
+#   ponteiros.npy  - início do grupo de cada município em linhas (+ o total no fim)
+#   byte_ini.npy, tamanho.npy, registro.npy - por linha, em ordem de município e, dentro
+#                    dele, de posição no arquivo: byte inicial e tamanho no CSV e linha
+#                    no cache colunar
+#   estado.json    - versão, tamanho e data do CSV indexado
+# Como os arquivos não vêm ordenados por CO_MUN, um grupo por município (e não faixas de
+# linhas consecutivas) mantém o índice do tamanho do número de linhas, e a consulta só
+# toca os trechos dos municípios pedidos.
+# Só CSV extraídos são indexados: num arquivo compactado não há como saltar até um byte.
+# As linhas são separadas como em leitor_bruto.ler_blocos (modo texto, que aceita '\n',
+# '\r\n' e '\r' sozinho), para que a numeração dos registros seja a mesma do cache.
+
+VERSAO_INDICE = 3
+ARQUIVO_ESTADO = "estado.json"
+ARRAYS_POR_LINHA = ('byte_ini', 'tamanho', 'registro')
+
+# Linhas separadas por menos que isso são lidas de uma vez (uma leitura maior
+# custa menos que muitos seeks; as linhas a mais são descartadas pelo filtro)
+LACUNA_MAXIMA = 64 * 1024
+
+
+def arquivo_do_indice(pasta_indice, arquivo):
+    """
+    Pasta do índice de um arquivo anual
+    """
+
+    return os.path.join(pasta_indice, os.path.splitext(os.path.basename(arquivo))[0])
+
+
+def _linhas_do_bloco(linhas, inicio_linha, inicio_byte, inicio_registro):
+    """
+    Percorre um bloco de linhas (bytes) e devolve, para cada registro válido, os arrays
+    (co_mun, byte_ini, tamanho, registro)
+    """
+
+    co_mun, byte_ini, tamanho, registros = [], [], [], []
+    posicao = inicio_byte
+    registro = inicio_registro
+
+    for i, linha in enumerate(linhas, inicio_linha):
+        texto = linha.decode('utf-8').strip()
+
+        # Mesmas regras de dividir_linhas: ignora cabeçalho, linhas vazias e sem 8 campos
+        if texto and i != 0:
+            partes = texto.split(';')
+            if len(partes) == 8:
+                co_mun.append(partes[5].replace('"', ''))
+                byte_ini.append(posicao)
+                tamanho.append(len(linha))
+                registros.append(registro)
+                registro += 1
+
+        posicao += len(linha)
+
+    return (pd.to_numeric(pd.Series(co_mun, dtype=object), errors='coerce').to_numpy(dtype=float),
+            np.asarray(byte_ini, dtype=np.int64), np.asarray(tamanho, dtype=np.int32),
+            np.asarray(registros, dtype=np.int32))
+
+
+def _indexar_arquivo(arquivo, pasta_indice, tamanho_bloco):
+    """
+    Lê um arquivo anual uma vez e grava seu índice por município.
+    Retorna (nome do arquivo, número de municípios, número de linhas indexadas)
+    """
+
+    estado = os.stat(arquivo)
+    partes = []
+    inicio_linha = 0
+    inicio_byte = 0
+    inicio_registro = 0
+
+    with open(arquivo, 'rb') as f:
+        while True:
+            linhas = f.readlines(tamanho_bloco or -1)
+            if not linhas:
+                break
+
+            # readlines em bytes só quebra em '\n'; um '\r' sozinho também termina a linha
+            # no modo texto (bytes.splitlines reconhece exatamente '\n', '\r\n' e '\r')
+            linhas = [parte for linha in linhas for parte in linha.splitlines(keepends=True)]
+
+            partes.append(_linhas_do_bloco(linhas, inicio_linha, inicio_byte, inicio_registro))
+            inicio_linha += len(linhas)
+            inicio_byte += sum(len(linha) for linha in linhas)
+            inicio_registro += len(partes[-1][0])
+
+    tipos = (float, np.int64, np.int32, np.int32)
+    co_mun, byte_ini, tamanho, registro = [
+        np.concatenate([parte[i] for parte in partes]) if partes else np.empty(0, dtype=tipo)
+        for i, tipo in enumerate(tipos)
+    ]
+
+    # Descarta CO_MUN inválidos (nunca casam com o filtro) e agrupa por município,
+    # mantendo a ordem do arquivo dentro de cada município
+    validos = ~np.isnan(co_mun)
+    co_mun = co_mun[validos].astype(np.int64)
+    ordem = np.argsort(co_mun, kind='stable')
+    municipios, ponteiros = np.unique(co_mun[ordem], return_index=True)
+
+    arrays = {
+        'municipios': municipios,
+        'ponteiros': np.append(ponteiros, len(co_mun)).astype(np.int64),
+        'byte_ini': byte_ini[validos][ordem],
+        'tamanho': tamanho[validos][ordem],
+        'registro': registro[validos][ordem],
+    }
+
+    # Grava numa pasta temporária e só então substitui a versão anterior
+    destino = arquivo_do_indice(pasta_indice, arquivo)
+    temporario = destino + ".tmp"
+    if os.path.exists(temporario):
+        shutil.rmtree(temporario)
+    os.makedirs(temporario)
+
+    for nome, valores in arrays.items():
+        np.save(os.path.join(temporario, f"{nome}.npy"), valores, allow_pickle=False)
+    with open(os.path.join(temporario, ARQUIVO_ESTADO), 'w', encoding='utf-8') as f:
+        json.dump({'versao': VERSAO_INDICE, 'tamanho': estado.st_size, 'mtime': estado.st_mtime}, f)
+
+    if os.path.exists(destino):
+        shutil.rmtree(destino)
+    os.replace(temporario, destino)
+
+    return os.path.basename(arquivo), len(municipios), len(co_mun)
+
+
+def construir_indice(pasta_entrada, pasta_indice, tamanho_bloco=TAMANHO_BLOCO_PADRAO, workers=1,
+                     forcar=False):
+    """
+    Constrói (ou atualiza) o índice por município de cada CSV anual de pasta_entrada.
+    Arquivos cujo índice já está atual são pulados, a menos que forcar=True
+    """
+
+    arquivos_csv = sorted(glob.glob(os.path.join(pasta_entrada, "*.csv")))
+    os.makedirs(pasta_indice, exist_ok=True)
+
+    pendentes = [arquivo for arquivo in arquivos_csv
+                 if forcar or carregar_indice(pasta_indice, arquivo) is None]
+
+    mostrar(f"🗂️  Índice por município: {len(pendentes)} de {len(arquivos_csv)} arquivo(s) a indexar")
+
+    for nome, municipios, linhas in executar_por_arquivo(_indexar_arquivo, pendentes, workers,
+                                                          pasta_indice, tamanho_bloco):
+        mostrar(f"   ✅ {nome}: {municipios} municípios, {linhas} linhas")
+
+
+def carregar_indice(pasta_indice, arquivo):
+    """
+    Abre o índice de um arquivo anual, ou None se não existir ou estiver desatualizado
+    (outra versão, ou tamanho ou data do CSV diferentes dos registrados).
+    municipios e ponteiros são lidos inteiros; os arrays por linha ficam mapeados em
+    memória e só os trechos dos municípios consultados são lidos do disco
+    """
+
+    pasta = arquivo_do_indice(pasta_indice, arquivo)
+    caminho_estado = os.path.join(pasta, ARQUIVO_ESTADO)
+    if compactado(arquivo) or not os.path.exists(caminho_estado):
+        return None
+
+    with open(caminho_estado, encoding='utf-8') as f:
+        registrado = json.load(f)
+    estado = os.stat(arquivo)
+    if (registrado.get('versao') != VERSAO_INDICE or registrado['tamanho'] != estado.st_size
+            or registrado['mtime'] != estado.st_mtime):
+        return None
+
+    indice = {nome: np.load(os.path.join(pasta, f"{nome}.npy")) for nome in ('municipios', 'ponteiros')}
+    for nome in ARRAYS_POR_LINHA:
+        indice[nome] = np.load(os.path.join(pasta, f"{nome}.npy"), mmap_mode='r')
+    return indice
+
+
+def linhas_dos_municipios(indice, codigos):
+    """
+    Linhas (byte_ini, byte_fim, registro) dos municípios pedidos, em ordem de posição
+    no arquivo
+    """
+
+    municipios = indice['municipios']
+    ponteiros = indice['ponteiros']
+    trechos = []
+
+    for codigo in codigos:
+        posicao = np.searchsorted(municipios, codigo)
+        if posicao < len(municipios) and municipios[posicao] == codigo:
+            trechos.append(slice(ponteiros[posicao], ponteiros[posicao + 1]))
+
+    if not trechos:
+        vazio = np.empty(0, dtype=np.int64)
+        return vazio, vazio, vazio
+
+    # Só os trechos dos municípios pedidos saem do mapeamento em memória
+    byte_ini, tamanho, registro = (np.concatenate([indice[nome][trecho] for trecho in trechos])
+                                   for nome in ARRAYS_POR_LINHA)
+    ordem = np.argsort(byte_ini, kind='stable')
+    byte_ini = byte_ini[ordem]
+
+    return byte_ini, byte_ini + tamanho[ordem], registro[ordem]
+
+
+def filtrar_por_indice(arquivo, indice, codigos, ufs=None):
+    """
+    Filtra um CSV anual lendo apenas as linhas dos municípios pedidos.
+    Retorna (df_filtrado, bytes_lidos)
+    """
+
+    byte_ini, byte_fim, _ = linhas_dos_municipios(indice, codigos)
+    if len(byte_ini) == 0:
+        return montar_dataframe([]), 0
+
+    # Junta linhas próximas numa só leitura (menos seeks); dentro de cada leitura só
+    # as linhas dos municípios são decodificadas e divididas
+    quebra = np.ones(len(byte_ini), dtype=bool)
+    quebra[1:] = byte_ini[1:] - byte_fim[:-1] > LACUNA_MAXIMA
+    grupos = np.split(np.arange(len(byte_ini)), quebra.nonzero()[0][1:])
+
+    dados = []
+    bytes_lidos = 0
+    with open(arquivo, 'rb') as f:
+        for grupo in grupos:
+            inicio = byte_ini[grupo[0]]
+            f.seek(inicio)
+            leitura = f.read(byte_fim[grupo[-1]] - inicio)
+            bytes_lidos += len(leitura)
+
+            # Cada trecho é uma linha (que pode terminar só em '\r'); as linhas indexadas
+            # nunca são o cabeçalho (linha 0)
+            linhas = [leitura[ini - inicio:fim - inicio].decode('utf-8')
+                      for ini, fim in zip(byte_ini[grupo], byte_fim[grupo])]
+            dados.extend(dividir_linhas(linhas, inicio=1))
+
+    return montar_dataframe(selecionar_linhas(dados, codigos, ufs)), bytes_lidos
+
+
+def posicoes_no_cache(indice, codigos):
+    """
+    Posições (linhas do cache colunar) dos municípios pedidos, em ordem crescente
+    """
+
+    return linhas_dos_municipios(indice, codigos)[2]
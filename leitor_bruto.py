@@ -0,0 +1,554 @@
+import csv
+import glob
+import gzip
+import io
+import lzma
+import mmap
+import os
+import queue
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from esquema import COLUNAS, COLUNAS_NUMERICAS, aplicar_esquema, concatenar
+
+# Motor de leitura opcional (ver MOTORES): usado só se o pyarrow estiver instalado
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+# Tamanho aproximado (em bytes) de cada bloco lido dos arquivos anuais.
+# O pico de memória da leitura passa a depender deste valor, e não do tamanho do ano.
+TAMANHO_BLOCO_PADRAO = 16 * 1024 * 1024
+
+
+# Formatos aceitos para os arquivos anuais: o CSV extraído ou o arquivo baixado do
+# Comex Stat ainda compactado (ZIP, ou recompactado em gzip/XZ), lido como fluxo
+EXTENSOES_COMPACTADAS = ('.zip', '.gz', '.xz')
+
+# Blocos já descompactados que podem ficar à espera do parser
+BLOCOS_ANTECIPADOS = 2
+
+
+def nome_base(arquivo):
+    """
+    Nome do arquivo anual sem extensões ('IMP_2024_MUN.csv.gz' -> 'IMP_2024_MUN')
+    """
+
+    nome = os.path.basename(arquivo)
+    for extensao in EXTENSOES_COMPACTADAS + ('.csv',):
+        if nome.lower().endswith(extensao):
+            nome = nome[:-len(extensao)]
+    return nome
+
+
+def compactado(arquivo):
+    return arquivo.lower().endswith(EXTENSOES_COMPACTADAS)
+
+
+def listar_arquivos_anuais(pasta_entrada):
+    """
+    Arquivos anuais de pasta_entrada (CSV, ZIP, .csv.gz ou .csv.xz), em ordem de nome.
+    Se o mesmo ano existir extraído e compactado, fica só o CSV
+    """
+
+    arquivos = {}
+    for padrao in ("*.csv", "*.zip", "*.csv.gz", "*.csv.xz"):
+        for arquivo in sorted(glob.glob(os.path.join(pasta_entrada, padrao))):
+            arquivos.setdefault(nome_base(arquivo), arquivo)
+    return [arquivos[nome] for nome in sorted(arquivos)]
+
+
+@contextmanager
+def abrir_texto(arquivo, encoding='utf-8'):
+    """
+    Abre um arquivo anual como texto. ZIP (primeiro .csv do pacote), gzip e XZ são
+    descompactados aos poucos, durante a leitura, sem extrair nada para o disco
+    """
+
+    if arquivo.lower().endswith('.zip'):
+        with zipfile.ZipFile(arquivo) as pacote:
+            nomes = [nome for nome in pacote.namelist() if nome.lower().endswith('.csv')]
+            if not nomes:
+                raise ValueError(f"nenhum .csv dentro de {os.path.basename(arquivo)}")
+            with pacote.open(nomes[0]) as bruto:
+                yield io.TextIOWrapper(bruto, encoding=encoding)
+    elif arquivo.lower().endswith('.gz'):
+        with gzip.open(arquivo, 'rt', encoding=encoding) as f:
+            yield f
+    elif arquivo.lower().endswith('.xz'):
+        with lzma.open(arquivo, 'rt', encoding=encoding) as f:
+            yield f
+    else:
+        with open(arquivo, 'r', encoding=encoding) as f:
+            yield f
+
+
+def _antecipar_blocos(f, tamanho_bloco, fila, parar):
+    try:
+        while not parar.is_set():
+            linhas = f.readlines(tamanho_bloco or -1)
+            fila.put(linhas)
+            if not linhas:
+                return
+    except Exception as e:
+        fila.put(e)
+
+
+def ler_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Gera as linhas do arquivo em blocos de ~tamanho_bloco bytes (None = de uma vez).
+    Nos arquivos compactados a descompactação roda numa thread, sempre até
+    BLOCOS_ANTECIPADOS blocos à frente, enquanto o bloco atual é dividido e filtrado
+    (zlib e lzma liberam o GIL, então as duas etapas se sobrepõem)
+    """
+
+    with abrir_texto(arquivo) as f:
+        if not compactado(arquivo):
+            while True:
+                linhas = f.readlines(tamanho_bloco or -1)
+                if not linhas:
+                    return
+                yield linhas
+
+        fila = queue.Queue(maxsize=BLOCOS_ANTECIPADOS)
+        parar = threading.Event()
+        leitor = threading.Thread(target=_antecipar_blocos, args=(f, tamanho_bloco, fila, parar), daemon=True)
+        leitor.start()
+
+        try:
+            while True:
+                linhas = fila.get()
+                if isinstance(linhas, Exception):
+                    raise linhas
+                if not linhas:
+                    return
+                yield linhas
+        finally:
+            # Se o consumidor parou antes do fim, libera a thread antes de fechar o arquivo
+            parar.set()
+            while leitor.is_alive():
+                try:
+                    fila.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            leitor.join()
+
+
+def _tamanho(caminho):
+    """
+    Tamanho em bytes de um arquivo ou, para pastas (cache colunar), da soma dos arquivos
+    """
+
+    if os.path.isdir(caminho):
+        return sum(entrada.stat().st_size for entrada in os.scandir(caminho) if entrada.is_file())
+    return os.path.getsize(caminho)
+
+
+def executar_por_arquivo(funcao, arquivos, workers, *args):
+    """
+    Aplica funcao(arquivo, *args) a cada arquivo e devolve os resultados na ordem
+    da lista (ordem de ano). Com workers > 1 os arquivos são distribuídos num pool
+    de processos, enviando primeiro os maiores para equilibrar a carga.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or len(arquivos) <= 1:
+        for arquivo in arquivos:
+            yield funcao(arquivo, *args)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(arquivos))) as executor:
+        futuros = {}
+        for arquivo in sorted(arquivos, key=_tamanho, reverse=True):
+            futuros[arquivo] = executor.submit(funcao, arquivo, *args)
+
+        for arquivo in arquivos:
+            yield futuros[arquivo].result()
+
+
+def dividir_linhas(linhas, inicio=0):
+    """
+    Divide as linhas brutas em listas de 8 campos, sem aspas.
+    'inicio' é o índice da primeira linha no arquivo (a linha 0 é o cabeçalho)
+    """
+
+    dados = []
+    for i, linha in enumerate(linhas, inicio):
+        linha = linha.strip()
+        if not linha:
+            continue
+
+        if i == 0:  # Cabeçalho
+            continue
+
+        # Divide a linha por ponto e vírgula e remove aspas de cada parte
+        partes = [p.replace('"', '') for p in linha.split(';')]
+
+        # Verifica se temos 8 colunas (como esperado)
+        if len(partes) == 8:
+            dados.append(partes)
+
+    return dados
+
+
+def montar_dataframe(dados):
+    """
+    Cria o DataFrame com as 8 colunas, converte as colunas numéricas e aplica
+    o esquema compacto
+    """
+
+    return _tipar(pd.DataFrame(dados, columns=COLUNAS))
+
+
+def _tipar(df):
+    """
+    Colunas de texto das 8 colunas → números (inválidos viram ausentes) e esquema compacto
+    """
+
+    for col in COLUNAS_NUMERICAS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return aplicar_esquema(df)
+
+
+# Motores de leitura: convertem um bloco de linhas brutas no DataFrame tipado das 8
+# colunas com as mesmas regras de dividir_linhas e o mesmo resultado:
+#   - 'python': a divisão linha a linha de dividir_linhas;
+#   - 'pandas': o parser em C do pandas;
+#   - 'arrow': o leitor de CSV do pyarrow, com várias threads (só se instalado).
+# Os motores em C não interpretam aspas: recebem só as linhas que dividir_linhas
+# aproveitaria (sem espaços nas pontas e com exatamente 8 campos) e sem nenhuma '"',
+# dividem em ';' e convertem os números como montar_dataframe. Assim aspas sem par,
+# aspas no meio do campo e campos com espaços saem iguais nos três motores.
+# Diferente de dividir_linhas + selecionar_linhas, eles tipam o bloco inteiro antes
+# de filtrar (ver filtrar_arquivo_em_blocos).
+# 'auto' mede os motores disponíveis no primeiro bloco lido e fica com o mais rápido.
+MOTOR_PADRAO = 'python'
+
+# Linhas do primeiro bloco usadas para medir os motores em escolher_motor
+LINHAS_CALIBRACAO = 20_000
+
+# Motor escolhido por escolher_motor (a escolha é feita uma vez por processo)
+_MOTOR_ESCOLHIDO = {}
+
+
+def _texto_valido(linhas, inicio):
+    """
+    As linhas que dividir_linhas aproveitaria (sem o cabeçalho, sem espaços nas pontas,
+    com exatamente 8 campos), sem aspas, num único texto separado por '\n'
+    """
+
+    if inicio == 0:
+        linhas = linhas[1:]
+    validas = [linha.strip() for linha in linhas if linha.count(';') == 7]
+    return '\n'.join(validas).replace('"', ''), len(validas)
+
+
+def _converter_python(linhas, inicio=0):
+    return montar_dataframe(dividir_linhas(linhas, inicio))
+
+
+def _converter_pandas(linhas, inicio=0):
+    texto, quantidade = _texto_valido(linhas, inicio)
+    if not quantidade:
+        return montar_dataframe([])
+
+    # Tudo como texto, sem aspas nem ausentes: só a divisão dos campos é feita em C
+    df = pd.read_csv(io.StringIO(texto), sep=';', header=None, names=COLUNAS, index_col=False, dtype=str,
+                     na_filter=False, quoting=csv.QUOTE_NONE, lineterminator='\n', skip_blank_lines=False)
+    return _tipar(df)
+
+
+def _converter_arrow(linhas, inicio=0):
+    texto, quantidade = _texto_valido(linhas, inicio)
+    if not quantidade:
+        return montar_dataframe([])
+    if '\r' in texto:
+        # O pyarrow sempre trata '\r' como fim de linha; dividir_linhas o mantém no campo
+        return _converter_python(linhas, inicio)
+
+    tabela = pa_csv.read_csv(
+        io.BytesIO(texto.encode('utf-8')),
+        read_options=pa_csv.ReadOptions(column_names=COLUNAS, use_threads=True),
+        parse_options=pa_csv.ParseOptions(delimiter=';', quote_char=False, ignore_empty_lines=False),
+        convert_options=pa_csv.ConvertOptions(column_types={col: pa.string() for col in COLUNAS},
+                                              strings_can_be_null=False),
+    )
+    return _tipar(tabela.to_pandas())
+
+
+MOTORES = {
+    'python': _converter_python,
+    'pandas': _converter_pandas,
+    'arrow': _converter_arrow,
+}
+
+
+def motores_disponiveis():
+    """
+    Nomes dos motores de leitura que podem ser usados neste ambiente
+    """
+
+    return [nome for nome in MOTORES if nome != 'arrow' or pa_csv is not None]
+
+
+def converter_linhas(linhas, inicio=0, motor='python'):
+    """
+    DataFrame tipado (8 colunas, esquema compacto) das linhas brutas de um bloco,
+    convertido pelo motor pedido. 'inicio' como em dividir_linhas
+    """
+
+    if motor not in motores_disponiveis():
+        raise ValueError(f"motor deve ser um de {motores_disponiveis()}, não {motor!r}")
+    return MOTORES[motor](linhas, inicio)
+
+
+def escolher_motor(arquivo, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    O motor disponível mais rápido, medido nas primeiras LINHAS_CALIBRACAO linhas de
+    'arquivo'. A medição é feita uma vez por processo e reaproveitada
+    """
+
+    if 'motor' in _MOTOR_ESCOLHIDO:
+        return _MOTOR_ESCOLHIDO['motor']
+
+    disponiveis = motores_disponiveis()
+    linhas = []
+    if len(disponiveis) > 1:
+        for bloco in ler_blocos(arquivo, tamanho_bloco):
+            linhas += bloco
+            if len(linhas) >= LINHAS_CALIBRACAO:
+                break
+        linhas = linhas[:LINHAS_CALIBRACAO]
+
+    if len(linhas) < 2:
+        # Sem dados para medir: o parser em C do pandas costuma ser o mais rápido
+        return 'pandas'
+
+    tempos = {}
+    for nome in disponiveis:
+        inicio = time.perf_counter()
+        MOTORES[nome](linhas, 0)
+        tempos[nome] = time.perf_counter() - inicio
+
+    _MOTOR_ESCOLHIDO['motor'] = min(tempos, key=tempos.get)
+    return _MOTOR_ESCOLHIDO['motor']
+
+
+def resolver_motor(motor, arquivos, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Nome do motor a usar na leitura de 'arquivos': o próprio motor ou, com 'auto',
+    o escolhido por escolher_motor no primeiro arquivo
+    """
+
+    if motor != 'auto':
+        if motor not in motores_disponiveis():
+            raise ValueError(f"motor deve ser 'auto' ou um de {motores_disponiveis()}, não {motor!r}")
+        return motor
+    if not arquivos:
+        return 'python'
+    return escolher_motor(arquivos[0], tamanho_bloco)
+
+
+def normalizar_filtro(codigo_municipio=None, uf=None):
+    """
+    Converte os argumentos de filtro em conjuntos: códigos CO_MUN (um código ou
+    vários) e siglas SG_UF_MUN. None significa "sem restrição" naquele campo.
+    Retorna (codigos, ufs)
+    """
+
+    codigos = None
+    if codigo_municipio is not None:
+        if isinstance(codigo_municipio, (int, str, np.integer)):
+            codigo_municipio = [codigo_municipio]
+        codigos = frozenset(int(codigo) for codigo in codigo_municipio)
+
+    ufs = None
+    if uf is not None:
+        if isinstance(uf, str):
+            uf = [uf]
+        ufs = frozenset(sigla.strip().upper() for sigla in uf)
+
+    return codigos, ufs
+
+
+def selecionar_linhas(dados, codigos=None, ufs=None):
+    """
+    Mantém apenas as linhas (ainda como texto) cujo CO_MUN numérico está em 'codigos'
+    e cuja SG_UF_MUN está em 'ufs'. O teste é feito por conjunto (hash), de modo que o
+    custo não cresce com a quantidade de municípios pedidos
+    """
+
+    if not dados or (codigos is None and ufs is None):
+        return dados
+
+    mascara = np.ones(len(dados), dtype=bool)
+
+    if codigos is not None:
+        co_mun = pd.to_numeric(pd.Series([partes[5] for partes in dados]), errors='coerce')
+        mascara &= co_mun.isin(list(codigos)).to_numpy()
+
+    if ufs is not None:
+        mascara &= np.fromiter((partes[4] in ufs for partes in dados), dtype=bool, count=len(dados))
+
+    return [dados[i] for i in mascara.nonzero()[0]]
+
+
+def mascara_filtro(df, codigos=None, ufs=None):
+    """
+    Versão do filtro para um DataFrame já convertido (máscara booleana)
+    """
+
+    mascara = pd.Series(True, index=df.index)
+    if codigos is not None:
+        mascara &= df['CO_MUN'].isin(list(codigos))
+    if ufs is not None:
+        mascara &= df['SG_UF_MUN'].isin(list(ufs))
+    return mascara
+
+
+def filtrar_arquivo_em_blocos(arquivo, codigos=None, ufs=None, tamanho_bloco=TAMANHO_BLOCO_PADRAO, motor='python'):
+    """
+    Lê um arquivo anual em blocos de ~tamanho_bloco bytes, aplicando o filtro de
+    municípios/UF (ver normalizar_filtro) durante a leitura. Com tamanho_bloco=None o
+    arquivo é lido de uma só vez. Aceita também os arquivos compactados (ver abrir_texto).
+    Com o motor 'python' (padrão) só as linhas selecionadas viram colunas tipadas. Os
+    outros motores (ver MOTORES) dividem e tipam o bloco inteiro em C e só então filtram
+    as colunas: trocam memória (o bloco todo tipado de uma vez) por velocidade, o que só
+    compensa quando boa parte das linhas é selecionada (UF inteira, todos os municípios).
+
+    Retorna (df_filtrado, total_de_registros_lidos, amostra)
+    """
+
+    partes_filtradas = []
+    total_lidos = 0
+    amostra = None
+    inicio = 0
+
+    for linhas in ler_blocos(arquivo, tamanho_bloco):
+        if motor != 'python':
+            df = converter_linhas(linhas, inicio, motor)
+            inicio += len(linhas)
+            total_lidos += len(df)
+
+            if amostra is None and len(df):
+                amostra = df.head(2)
+
+            if codigos is not None or ufs is not None:
+                # Sem as UFs que só existiam no bloco inteiro, como no motor 'python'
+                df = df[mascara_filtro(df, codigos, ufs)]
+                df = df.assign(SG_UF_MUN=df['SG_UF_MUN'].cat.remove_unused_categories())
+            if len(df):
+                partes_filtradas.append(df)
+            continue
+
+        dados = dividir_linhas(linhas, inicio)
+        inicio += len(linhas)
+        total_lidos += len(dados)
+
+        if amostra is None and dados:
+            amostra = montar_dataframe(dados[:2])
+
+        selecionados = selecionar_linhas(dados, codigos, ufs)
+        if selecionados:
+            partes_filtradas.append(montar_dataframe(selecionados))
+
+    if amostra is None:
+        amostra = montar_dataframe([])
+
+    if partes_filtradas:
+        df_filtrado = concatenar(partes_filtradas)
+    else:
+        df_filtrado = montar_dataframe([])
+
+    return df_filtrado, total_lidos, amostra
+
+
+# Acima deste número de tokens o pré-filtro em bytes deixa de compensar (é feita
+# uma busca no arquivo por token) e a leitura volta a ser feita em blocos
+LIMITE_TOKENS_PRE_FILTRO = 32
+
+
+def tokens_pre_filtro(codigos=None, ufs=None):
+    """
+    Sequências de bytes que obrigatoriamente aparecem numa linha selecionada pelo
+    filtro: os dígitos de cada CO_MUN ou, sem códigos, as siglas de UF.
+    Retorna None quando o pré-filtro não se aplica
+    """
+
+    if codigos is not None:
+        tokens = [str(codigo).encode('ascii') for codigo in sorted(codigos)]
+    elif ufs is not None:
+        tokens = [sigla.encode('utf-8') for sigla in sorted(ufs)]
+    else:
+        return None
+
+    if not tokens or len(tokens) > LIMITE_TOKENS_PRE_FILTRO:
+        return None
+    return tokens
+
+
+def _linhas_candidatas(mapa, tokens):
+    """
+    Procura os tokens nos bytes do arquivo mapeado e devolve as linhas que os contêm,
+    na ordem do arquivo, como (posição_inicial, texto_da_linha)
+    """
+
+    limites = set()
+    for token in tokens:
+        posicao = mapa.find(token)
+        while posicao != -1:
+            inicio = mapa.rfind(b'\n', 0, posicao) + 1
+            fim = mapa.find(b'\n', posicao)
+            if fim == -1:
+                fim = len(mapa)
+            limites.add((inicio, fim))
+            posicao = mapa.find(token, fim)
+
+    return [(inicio, mapa[inicio:fim].decode('utf-8')) for inicio, fim in sorted(limites)]
+
+
+def filtrar_arquivo_mmap(arquivo, codigos=None, ufs=None, tamanho_bloco=TAMANHO_BLOCO_PADRAO, motor='python'):
+    """
+    Caminho rápido de filtrar_arquivo_em_blocos: mapeia o arquivo em memória e procura
+    os tokens do filtro diretamente nos bytes. Só as linhas candidatas passam pela
+    validação de 8 colunas e pela conversão numérica, com o mesmo resultado da leitura
+    completa. Se o filtro não gera tokens (ou o arquivo é compactado), cai na leitura
+    em blocos, com o motor pedido (as poucas linhas candidatas são sempre divididas
+    em Python).
+
+    Retorna (df_filtrado, total_de_linhas_candidatas, amostra)
+    """
+
+    tokens = tokens_pre_filtro(codigos, ufs)
+    if tokens is None or compactado(arquivo):
+        return filtrar_arquivo_em_blocos(arquivo, codigos, ufs, tamanho_bloco, motor)
+
+    with open(arquivo, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return montar_dataframe([]), 0, montar_dataframe([])
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            # Amostra: as duas primeiras linhas de dados do arquivo
+            fim_amostra = 0
+            for _ in range(3):
+                proxima = mapa.find(b'\n', fim_amostra)
+                fim_amostra = len(mapa) if proxima == -1 else proxima + 1
+            amostra = montar_dataframe(dividir_linhas(mapa[:fim_amostra].decode('utf-8').splitlines())[:2])
+
+            candidatas = _linhas_candidatas(mapa, tokens)
+
+    # A linha que começa no byte 0 é o cabeçalho, ignorado como na leitura completa
+    dados = dividir_linhas([linha for inicio, linha in candidatas if inicio > 0], inicio=1)
+    selecionados = selecionar_linhas(dados, codigos, ufs)
+
+    return montar_dataframe(selecionados), len(candidatas), amostra
@@ -0,0 +1,353 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import shutil
+import hashlib
+
+from esquema import aplicar_esquema, concatenar, gravar_tabela, ler_tabela, localizar_tabela
+from relatorio import avisar, etapa, mostrar
+
+# Ordenações de f_sh6 mantidas ano a ano. Para cada ano filtrado a pasta de estado guarda
+# os registros do ano (formato colunar), as contagens de SH4 e de país do ano e as
+# permutações que ordenam esses registros. As frequências gerais (FREQ_SH4, FREQ_PAIS)
+# são a soma das contagens dos anos; um ano novo ou alterado só recalcula as suas.
+# A ordem de um ano só depende da ordem relativa das frequências dos códigos presentes
+# nele: se ela não mudou com a soma, a permutação gravada continua valendo e o ano não é
+# reordenado. A ordenação por ano (FREQ_*_ANO) só depende do próprio ano.
+# Registros com CO_ANO ausente (<NA>) formam um "ano" à parte, depois dos demais: contam
+# nas frequências gerais e, como em f_sh6, ficam sem FREQ_*_ANO (só VL_FOB os ordena).
+ARQUIVO_MANIFESTO = "manifesto.json"
+
+# Chave do manifesto (e nome da pasta) dos registros sem CO_ANO; vem depois dos anos
+# numéricos na ordem das chaves
+ANO_AUSENTE = "sem_ano"
+
+# Incrementar quando o formato do estado mudar (força o recálculo de tudo)
+VERSAO_ESTADO = 1
+
+
+def _carregar_manifesto(pasta_estado):
+    caminho = os.path.join(pasta_estado, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {}
+
+    with open(caminho, 'r', encoding='utf-8') as f:
+        manifesto = json.load(f)
+
+    if manifesto.get('versao') != VERSAO_ESTADO:
+        return {}
+    return manifesto.get('anos', {})
+
+
+def _salvar_manifesto(pasta_estado, entradas):
+    caminho = os.path.join(pasta_estado, ARQUIVO_MANIFESTO)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({'versao': VERSAO_ESTADO, 'anos': entradas}, f, indent=2, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+def _pasta_ano(pasta_estado, ano):
+    return os.path.join(pasta_estado, f"ano_{ano}")
+
+
+def _chave_do_ano(ano):
+    return ANO_AUSENTE if pd.isna(ano) else str(int(ano))
+
+
+def _numero_do_ano(chave):
+    return None if chave == ANO_AUSENTE else int(chave)
+
+
+def _assinatura(df_ano):
+    """
+    Hash do conteúdo e da ordem dos registros de um ano
+    """
+
+    return hashlib.sha256(pd.util.hash_pandas_object(df_ano, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def _contar(serie):
+    """
+    (códigos, contagens) de uma coluna, com os códigos em ordem crescente. Valores
+    ausentes (<NA> das colunas inteiras anuláveis) não são contados, como no
+    value_counts/groupby de f_sh6
+    """
+
+    codigos, contagens = np.unique(serie.dropna().to_numpy(dtype=np.int64), return_counts=True)
+    return codigos, contagens.astype(np.int64)
+
+
+def _frequencia_por_linha(valores, codigos, contagens):
+    """
+    Frequência de cada valor da coluna, pela tabela (codigos crescentes, contagens).
+    Valores ausentes ficam com frequência 0
+    """
+
+    valores = pd.Series(valores)
+    presentes = valores.notna().to_numpy()
+    frequencias = np.zeros(len(valores), dtype=np.int64)
+    frequencias[presentes] = contagens[np.searchsorted(codigos, valores[presentes].to_numpy(dtype=np.int64))]
+    return frequencias
+
+
+def _coluna_de_frequencia(valores, codigos, contagens):
+    """
+    FREQ_* de uma coluna para as tabelas montadas: <NA> onde o código é ausente, como
+    em f_sh6
+    """
+
+    frequencias = pd.Series(_frequencia_por_linha(valores, codigos, contagens), dtype='Int64')
+    return frequencias.mask(pd.Series(valores).isna().to_numpy())
+
+
+def _permutacao(freq_sh4, freq_pais, vl_fob):
+    """
+    Ordem de f_sh6 dentro de um ano: SH4 mais frequente, país mais frequente e maior
+    VL_FOB; empates mantêm a ordem de entrada (np.lexsort é estável). Códigos e
+    VL_FOB ausentes vão para o fim, como no sort_values de f_sh6
+    """
+
+    vl_fob = pd.Series(vl_fob)
+    chave_fob = np.where(vl_fob.isna().to_numpy(), np.iinfo(np.int64).max,
+                         -vl_fob.fillna(0).to_numpy(dtype=np.int64))
+    return np.lexsort((chave_fob, -freq_pais, -freq_sh4)).astype(np.int64)
+
+
+def _mesma_ordem(anteriores, novas):
+    """
+    True se as duas sequências de frequências têm a mesma ordem relativa (inclusive
+    empates), ou seja, ordenam os mesmos códigos do mesmo jeito
+    """
+
+    if len(anteriores) != len(novas):
+        return False
+    return np.array_equal(np.unique(anteriores, return_inverse=True)[1],
+                          np.unique(novas, return_inverse=True)[1])
+
+
+def _ler_estado(pasta_estado, ano, chaves=None):
+    """
+    Arrays do estado de um ano (só 'chaves', se dado: as permutações têm uma posição
+    por registro e não precisam ser lidas para somar as contagens)
+    """
+
+    with np.load(os.path.join(_pasta_ano(pasta_estado, ano), "estado.npz")) as dados:
+        return {chave: dados[chave] for chave in dados.files if chaves is None or chave in chaves}
+
+
+def _salvar_estado(pasta, estado):
+    temporario = os.path.join(pasta, "estado.tmp.npz")
+    np.savez(temporario, **estado)
+    os.replace(temporario, os.path.join(pasta, "estado.npz"))
+
+
+def atualizar_anos(df, pasta_estado, substituir=False):
+    """
+    Grava no estado os anos presentes em df (um DataFrame filtrado, no layout de
+    f_mun_pato). Anos cujos registros não mudaram são mantidos como estão. Anos do
+    estado ausentes de df são mantidos (atualização só do último ano), a menos que
+    substituir=True (df é a série inteira).
+    Retorna a lista dos anos gravados (None para os registros sem CO_ANO)
+    """
+
+    os.makedirs(pasta_estado, exist_ok=True)
+    entradas = _carregar_manifesto(pasta_estado)
+    atualizados = []
+    presentes = set()
+
+    for ano, df_ano in df.groupby('CO_ANO', sort=True, observed=True, dropna=False):
+        ano = _chave_do_ano(ano)
+        presentes.add(ano)
+        df_ano = df_ano.reset_index(drop=True)
+        assinatura = _assinatura(df_ano)
+        destino = _pasta_ano(pasta_estado, ano)
+        if entradas.get(ano, {}).get('assinatura') == assinatura and os.path.isdir(destino):
+            continue
+
+        temporario = destino + ".tmp"
+        if os.path.exists(temporario):
+            shutil.rmtree(temporario)
+        os.makedirs(temporario)
+
+        gravar_tabela(df_ano, os.path.join(temporario, "registros.npz"), 'colunar')
+
+        sh4, freq_sh4 = _contar(df_ano['SH4'])
+        pais, freq_pais = _contar(df_ano['CO_PAIS'])
+        if ano == ANO_AUSENTE:
+            # Sem frequências no ano: só o VL_FOB ordena
+            sem_frequencia = np.zeros(len(df_ano), dtype=np.int64)
+            ordem_por_ano = _permutacao(sem_frequencia, sem_frequencia, df_ano['VL_FOB'])
+        else:
+            ordem_por_ano = _permutacao(_frequencia_por_linha(df_ano['SH4'], sh4, freq_sh4),
+                                        _frequencia_por_linha(df_ano['CO_PAIS'], pais, freq_pais),
+                                        df_ano['VL_FOB'])
+        # Sem 'usada_*': a ordem hierárquica do ano ainda precisa ser calculada
+        _salvar_estado(temporario, {'sh4': sh4, 'freq_sh4': freq_sh4, 'pais': pais, 'freq_pais': freq_pais,
+                                    'ordem_por_ano': ordem_por_ano})
+
+        if os.path.exists(destino):
+            shutil.rmtree(destino)
+        os.replace(temporario, destino)
+
+        entradas[ano] = {'assinatura': assinatura, 'registros': len(df_ano)}
+        atualizados.append(_numero_do_ano(ano))
+
+    if substituir:
+        for ano in set(entradas) - presentes:
+            shutil.rmtree(_pasta_ano(pasta_estado, ano), ignore_errors=True)
+            del entradas[ano]
+
+    _salvar_manifesto(pasta_estado, entradas)
+    mostrar(f"🧮 Estado das ordenações: {len(atualizados)} de {len(entradas)} ano(s) atualizado(s)")
+    return atualizados
+
+
+def frequencias_gerais(pasta_estado):
+    """
+    Soma das contagens de todos os anos do estado:
+    ((codigos_sh4, freq_sh4), (codigos_pais, freq_pais)), códigos em ordem crescente
+    """
+
+    partes = {'sh4': [], 'pais': []}
+    for ano in sorted(_carregar_manifesto(pasta_estado)):
+        estado = _ler_estado(pasta_estado, ano, ('sh4', 'freq_sh4', 'pais', 'freq_pais'))
+        for chave in partes:
+            partes[chave].append(pd.Series(estado[f"freq_{chave}"], index=estado[chave]))
+
+    resultado = []
+    for chave in ('sh4', 'pais'):
+        if not partes[chave]:
+            resultado.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)))
+            continue
+        total = pd.concat(partes[chave]).groupby(level=0).sum()
+        resultado.append((total.index.to_numpy(dtype=np.int64), total.to_numpy(dtype=np.int64)))
+    return tuple(resultado)
+
+
+def reordenar_anos(pasta_estado):
+    """
+    Recalcula a ordem hierárquica só dos anos em que a ordem relativa das frequências
+    gerais dos seus SH4 ou países mudou. Retorna a lista dos anos reordenados
+    """
+
+    (sh4_geral, freq_sh4_geral), (pais_geral, freq_pais_geral) = frequencias_gerais(pasta_estado)
+    reordenados = []
+
+    for ano in sorted(_carregar_manifesto(pasta_estado)):
+        estado = _ler_estado(pasta_estado, ano, ('sh4', 'pais', 'usada_sh4', 'usada_pais'))
+        usada_sh4 = _frequencia_por_linha(estado['sh4'], sh4_geral, freq_sh4_geral)
+        usada_pais = _frequencia_por_linha(estado['pais'], pais_geral, freq_pais_geral)
+        if ('usada_sh4' in estado and _mesma_ordem(estado['usada_sh4'], usada_sh4)
+                and _mesma_ordem(estado['usada_pais'], usada_pais)):
+            continue
+
+        estado = _ler_estado(pasta_estado, ano)
+        df_ano = ler_tabela(os.path.join(_pasta_ano(pasta_estado, ano), "registros.npz"))
+        estado['ordem_hierarquica'] = _permutacao(
+            _frequencia_por_linha(df_ano['SH4'], estado['sh4'], usada_sh4),
+            _frequencia_por_linha(df_ano['CO_PAIS'], estado['pais'], usada_pais),
+            df_ano['VL_FOB'])
+        estado['usada_sh4'], estado['usada_pais'] = usada_sh4, usada_pais
+        _salvar_estado(_pasta_ano(pasta_estado, ano), estado)
+        reordenados.append(_numero_do_ano(ano))
+
+    mostrar(f"🔀 Anos reordenados: {reordenados if reordenados else 'nenhum'}")
+    return reordenados
+
+
+def _tabela_frequencia(coluna, codigos, contagens):
+    """
+    Tabela (coluna, FREQ_<coluna>) do mais frequente para o menos frequente
+    """
+
+    ordem = np.lexsort((codigos, -contagens))
+    nome = 'FREQ_SH4' if coluna == 'SH4' else 'FREQ_PAIS'
+    return aplicar_esquema(pd.DataFrame({coluna: codigos[ordem], nome: contagens[ordem]}))
+
+
+def montar_ordem_hierarquica(pasta_estado):
+    """
+    Tabela de ordenar_hierarquicamente montada a partir do estado (rode reordenar_anos
+    antes). Retorna (df_ordenado, freq_sh4, freq_pais), como calcular_ordem_hierarquica
+    """
+
+    (sh4_geral, freq_sh4_geral), (pais_geral, freq_pais_geral) = frequencias_gerais(pasta_estado)
+    partes = []
+
+    for ano in sorted(_carregar_manifesto(pasta_estado)):
+        estado = _ler_estado(pasta_estado, ano)
+        df_ano = ler_tabela(os.path.join(_pasta_ano(pasta_estado, ano), "registros.npz"))
+        df_ano = df_ano.take(estado['ordem_hierarquica']).reset_index(drop=True)
+        df_ano['FREQ_SH4'] = _coluna_de_frequencia(df_ano['SH4'], sh4_geral, freq_sh4_geral)
+        df_ano['FREQ_PAIS'] = _coluna_de_frequencia(df_ano['CO_PAIS'], pais_geral, freq_pais_geral)
+        partes.append(df_ano)
+
+    if not partes:
+        return None
+    return (concatenar(partes), _tabela_frequencia('SH4', sh4_geral, freq_sh4_geral),
+            _tabela_frequencia('CO_PAIS', pais_geral, freq_pais_geral))
+
+
+def montar_ordem_por_ano(pasta_estado):
+    """
+    Tabela de ordenar_por_ano_e_frequencia montada a partir do estado
+    """
+
+    partes = []
+    for ano in sorted(_carregar_manifesto(pasta_estado)):
+        estado = _ler_estado(pasta_estado, ano)
+        df_ano = ler_tabela(os.path.join(_pasta_ano(pasta_estado, ano), "registros.npz"))
+        df_ano = df_ano.take(estado['ordem_por_ano']).reset_index(drop=True)
+        if ano == ANO_AUSENTE:
+            df_ano['FREQ_SH4_ANO'] = df_ano['FREQ_PAIS_ANO'] = pd.Series(pd.NA, index=df_ano.index, dtype='Int64')
+        else:
+            df_ano['FREQ_SH4_ANO'] = _coluna_de_frequencia(df_ano['SH4'], estado['sh4'], estado['freq_sh4'])
+            df_ano['FREQ_PAIS_ANO'] = _coluna_de_frequencia(df_ano['CO_PAIS'], estado['pais'],
+                                                            estado['freq_pais'])
+        partes.append(df_ano)
+
+    return concatenar(partes) if partes else None
+
+
+def ordenar_incremental(arquivo_entrada, pasta_estado, arquivo_hierarquico, arquivo_por_ano=None,
+                        substituir=False, formato='csv'):
+    """
+    Versão incremental de ordenar_hierarquicamente e ordenar_por_ano_e_frequencia.
+    arquivo_entrada pode trazer só os anos novos ou alterados (ex.: o filtro do último
+    ano na atualização mensal): os demais anos vêm de pasta_estado. Grava as mesmas
+    tabelas das versões completas, no formato pedido
+    """
+
+    with etapa('ordenar_incremental') as metricas:
+        arquivo_entrada = localizar_tabela(arquivo_entrada)
+        try:
+            df = ler_tabela(arquivo_entrada, sep='\t')
+        except Exception as e:
+            avisar(f"❌ Erro ao ler arquivo: {e}")
+            metricas['erro'] = str(e)
+            return
+        metricas.update(linhas_entrada=len(df), bytes_lidos=os.path.getsize(arquivo_entrada))
+
+        metricas['anos_atualizados'] = atualizar_anos(df, pasta_estado, substituir)
+        metricas['anos_reordenados'] = reordenar_anos(pasta_estado)
+
+        resultado = montar_ordem_hierarquica(pasta_estado)
+        if resultado is None:
+            avisar("🚫 Estado das ordenações vazio")
+            return
+        arquivos_salvos = [gravar_tabela(resultado[0], arquivo_hierarquico, formato)]
+        if arquivo_por_ano is not None:
+            arquivos_salvos.append(gravar_tabela(montar_ordem_por_ano(pasta_estado), arquivo_por_ano, formato))
+        metricas.update(linhas_saida=len(resultado[0]), arquivos_saida=arquivos_salvos)
+
+    for arquivo in arquivos_salvos:
+        mostrar(f"📁 Arquivo salvo: {arquivo}")
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    # Atualização mensal: só o ano corrente foi filtrado de novo
+    ordenar_incremental("dados_import_filtrados_2025.csv", "ordem_incremental",
+                        "dados_ordenados_hierarquico.csv", "dados_ordenados_por_ano.csv")
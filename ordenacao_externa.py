@@ -0,0 +1,286 @@
+import argparse
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from esquema import (TIPOS_LEITURA, aplicar_esquema, concatenar, detectar_separador, eh_colunar, ler_tabela,
+                     localizar_tabela, para_numpy)
+from f_sh6 import _colunas_fluxo
+from relatorio import NIVEIS, avisar, definir_verbosidade, detalhado, etapa, mostrar
+
+# Ordenação externa das duas ordenações de f_sh6, para extratos maiores que a memória
+# (um estado inteiro, todos os municípios). Três passadas com memória limitada:
+#   1. o arquivo é lido em blocos só para contar as frequências (tabelas pequenas);
+#   2. cada bloco recebe as frequências, é ordenado pela chave
+#      (CO_ANO, -FREQ_SH4, -FREQ_PAIS, -VL_FOB, posição na entrada) e gravado em disco
+#      como uma "corrida" (um .npy por coluna);
+#   3. as corridas são intercaladas (k-way merge) em fatias lidas por mapeamento em
+#      memória e o resultado é gravado no CSV de saída aos poucos.
+# A posição na entrada desempata como a ordenação estável em memória, por isso o
+# resultado é idêntico ao de calcular_ordem_hierarquica / calcular_ordem_por_ano.
+
+# Memória padrão para os blocos (MB)
+MEMORIA_PADRAO_MB = 256
+
+# Fator entre a memória ocupada por um bloco e a estimada pelas suas colunas (cópias da
+# ordenação, colunas de frequência e chave)
+FATOR_MEMORIA = 4
+
+# Frequências de cada ordenação: coluna -> colunas que definem o grupo contado
+FREQUENCIAS = {
+    'hierarquica': {'FREQ_SH4': ['SH4'], 'FREQ_PAIS': ['CO_PAIS']},
+    'por_ano': {'FREQ_SH4_ANO': ['CO_ANO', 'SH4'], 'FREQ_PAIS_ANO': ['CO_ANO', 'CO_PAIS']},
+}
+
+# Maior int64: valores ausentes vão para o fim, como o na_position='last' do pandas
+_AUSENTE = np.iinfo(np.int64).max
+
+POSICAO = '_POSICAO'
+
+
+def _ler_blocos(arquivo, linhas_por_bloco):
+    """
+    DataFrames consecutivos de até linhas_por_bloco linhas, no esquema compacto.
+    CSV/TSV é lido aos poucos; o formato colunar (compactado) só pode ser lido inteiro
+    """
+
+    if eh_colunar(arquivo):
+        df = ler_tabela(arquivo)
+        for inicio in range(0, len(df), linhas_por_bloco):
+            yield df.iloc[inicio:inicio + linhas_por_bloco]
+        return
+
+    leitor = pd.read_csv(arquivo, sep=detectar_separador(arquivo), encoding='utf-8', dtype=TIPOS_LEITURA,
+                         chunksize=linhas_por_bloco)
+    with leitor:
+        for bloco in leitor:
+            yield aplicar_esquema(bloco)
+
+
+def _linhas_por_bloco(arquivo, memoria_mb):
+    """
+    Quantas linhas cabem em memoria_mb, estimado pelas primeiras linhas do arquivo
+    """
+
+    amostra = next(_ler_blocos(arquivo, 1000), None)
+    if amostra is None or not len(amostra):
+        return 1000
+    bytes_por_linha = amostra.memory_usage(index=False, deep=True).sum() / len(amostra) * FATOR_MEMORIA
+    return max(1000, int(memoria_mb * 2 ** 20 / bytes_por_linha))
+
+
+def _grupos(df, colunas):
+    if len(colunas) == 1:
+        return pd.Index(df[colunas[0]].to_numpy())
+    return pd.MultiIndex.from_arrays([df[col].to_numpy() for col in colunas])
+
+
+def contar_frequencias(arquivo, criterio, linhas_por_bloco):
+    """
+    Primeira passada: as contagens de FREQUENCIAS[criterio], somadas bloco a bloco.
+    Retorna {coluna de frequência: Series de contagens indexada pelo grupo}
+    """
+
+    contagens = {}
+    for bloco in _ler_blocos(arquivo, linhas_por_bloco):
+        for coluna, grupo in FREQUENCIAS[criterio].items():
+            grupo = _colunas_fluxo(bloco) + grupo
+            parcial = pd.Series(1, index=_grupos(bloco, grupo)).groupby(level=list(range(len(grupo)))).sum()
+            anterior = contagens.get(coluna)
+            contagens[coluna] = parcial if anterior is None else anterior.add(parcial, fill_value=0)
+
+    return {coluna: serie.astype('int64') for coluna, serie in contagens.items()}
+
+
+def _com_frequencias(bloco, criterio, contagens):
+    for coluna, grupo in FREQUENCIAS[criterio].items():
+        grupo = _colunas_fluxo(bloco) + grupo
+        bloco[coluna] = contagens[coluna].reindex(_grupos(bloco, grupo)).to_numpy()
+    return aplicar_esquema(bloco)
+
+
+def _chave(serie, sinal=1):
+    """
+    Coluna como chave crescente do np.lexsort: texto como str, números multiplicados
+    por 'sinal' (-1 para ordem decrescente) e ausentes no fim, como na_position='last'
+    """
+
+    if isinstance(serie.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(serie):
+        return serie.to_numpy(dtype=str)
+    ausentes = serie.isna().to_numpy()
+    chave = serie.fillna(0).to_numpy(dtype=np.int64) * sinal
+    chave[ausentes] = _AUSENTE
+    return chave
+
+
+def chaves_de_ordenacao(df, criterio):
+    """
+    Colunas da chave, da mais para a menos importante, todas em ordem crescente:
+    FLUXO, CO_ANO, -frequência do SH4, -frequência do país, -VL_FOB e a posição na entrada
+    """
+
+    freq_sh4, freq_pais = FREQUENCIAS[criterio]
+    chaves = [_chave(df[col]) for col in _colunas_fluxo(df) + ['CO_ANO']]
+    chaves += [_chave(df[col], -1) for col in (freq_sh4, freq_pais, 'VL_FOB')]
+    chaves.append(df[POSICAO].to_numpy())
+    return chaves
+
+
+def _gravar_corrida(bloco, pasta):
+    os.makedirs(pasta)
+    for col in bloco.columns:
+        np.save(os.path.join(pasta, f"{col}.npy"), para_numpy(bloco[col]), allow_pickle=False)
+
+
+def gerar_corridas(arquivo, criterio, contagens, linhas_por_bloco, pasta_temporaria):
+    """
+    Segunda passada: ordena cada bloco pela chave e grava-o como uma corrida.
+    Retorna (lista de pastas das corridas, colunas da saída)
+    """
+
+    corridas = []
+    colunas = None
+    inicio = 0
+
+    for bloco in _ler_blocos(arquivo, linhas_por_bloco):
+        bloco = _com_frequencias(bloco.reset_index(drop=True), criterio, contagens)
+        colunas = list(bloco.columns)
+        bloco[POSICAO] = np.arange(inicio, inicio + len(bloco), dtype=np.int64)
+        inicio += len(bloco)
+
+        ordem = np.lexsort(chaves_de_ordenacao(bloco, criterio)[::-1])
+        pasta = os.path.join(pasta_temporaria, f"corrida_{len(corridas):05d}")
+        _gravar_corrida(bloco.take(ordem), pasta)
+        corridas.append(pasta)
+
+    return corridas, colunas
+
+
+def _ate_o_limite(chaves, limite):
+    """
+    Máscara das linhas (já ordenadas) cuja chave é menor ou igual à chave 'limite'
+    """
+
+    menor = np.zeros(len(chaves[0]), dtype=bool)
+    iguais = np.ones(len(chaves[0]), dtype=bool)
+    for coluna, valor in zip(chaves, limite):
+        menor |= iguais & (coluna < valor)
+        iguais &= coluna == valor
+    return menor | iguais
+
+
+def intercalar_corridas(corridas, colunas, criterio, arquivo_saida, linhas_por_bloco):
+    """
+    Terceira passada: k-way merge das corridas em fatias. A cada rodada, cada corrida
+    contribui com uma fatia; todas as linhas até a menor das últimas chaves das fatias
+    já estão na posição final, são ordenadas juntas e acrescentadas à saída.
+    Retorna o número de linhas gravadas
+    """
+
+    arrays = [{col: np.load(os.path.join(pasta, f"{col}.npy"), mmap_mode='r') for col in colunas + [POSICAO]}
+              for pasta in corridas]
+    cursores = [0] * len(corridas)
+    tamanhos = [len(corrida[POSICAO]) for corrida in arrays]
+    fatia = max(1, linhas_por_bloco // (len(corridas) + 1))
+    gravadas = 0
+
+    while any(cursor < tamanho for cursor, tamanho in zip(cursores, tamanhos)):
+        partes = []
+        for i, corrida in enumerate(arrays):
+            if cursores[i] < tamanhos[i]:
+                fim = min(cursores[i] + fatia, tamanhos[i])
+                partes.append((i, aplicar_esquema(pd.DataFrame({col: np.asarray(valores[cursores[i]:fim])
+                                                                 for col, valores in corrida.items()}))))
+
+        chaves = {i: chaves_de_ordenacao(parte, criterio) for i, parte in partes}
+
+        # Até a menor das últimas chaves (entre as corridas que ainda têm linhas depois
+        # da fatia) nenhuma linha de fatia futura pode vir antes
+        ultimas = [tuple(coluna[-1] for coluna in chaves[i]) for i, parte in partes
+                   if cursores[i] + len(parte) < tamanhos[i]]
+        limite = min(ultimas) if ultimas else None
+
+        selecionadas = []
+        for i, parte in partes:
+            quantidade = len(parte) if limite is None else int(_ate_o_limite(chaves[i], limite).sum())
+            cursores[i] += quantidade
+            if quantidade:
+                selecionadas.append(parte.iloc[:quantidade])
+
+        rodada = concatenar(selecionadas)
+        rodada = rodada.take(np.lexsort(chaves_de_ordenacao(rodada, criterio)[::-1]))
+        rodada[colunas].to_csv(arquivo_saida, index=False, encoding='utf-8', mode='w' if gravadas == 0 else 'a',
+                               header=gravadas == 0)
+        gravadas += len(rodada)
+
+    return gravadas
+
+
+def ordenar_externamente(arquivo_entrada, arquivo_saida, criterio='hierarquica', memoria_mb=MEMORIA_PADRAO_MB,
+                         pasta_temporaria=None):
+    """
+    Grava em arquivo_saida (CSV) a mesma tabela de ordenar_hierarquicamente
+    (criterio='hierarquica') ou de ordenar_por_ano_e_frequencia (criterio='por_ano'),
+    mantendo em memória só blocos de cerca de memoria_mb. As corridas ficam numa pasta
+    temporária (em pasta_temporaria, se dada), removida ao final
+    """
+
+    if criterio not in FREQUENCIAS:
+        raise ValueError(f"critério deve ser um de {tuple(FREQUENCIAS)}, não {criterio!r}")
+
+    with etapa('ordenar_externamente', criterio=criterio, memoria_mb=memoria_mb) as metricas:
+        arquivo_entrada = localizar_tabela(arquivo_entrada)
+        if not os.path.exists(arquivo_entrada):
+            avisar(f"❌ Arquivo não encontrado: {arquivo_entrada}")
+            metricas['erro'] = "arquivo não encontrado"
+            return
+
+        linhas_por_bloco = _linhas_por_bloco(arquivo_entrada, memoria_mb)
+        mostrar(f"📏 Blocos de até {linhas_por_bloco} linhas")
+
+        contagens = contar_frequencias(arquivo_entrada, criterio, linhas_por_bloco)
+
+        pasta = tempfile.mkdtemp(prefix="ordenacao_", dir=pasta_temporaria)
+        try:
+            corridas, colunas = gerar_corridas(arquivo_entrada, criterio, contagens, linhas_por_bloco, pasta)
+            mostrar(f"💾 {len(corridas)} corrida(s) gravada(s) em disco")
+            if not corridas:
+                avisar("🚫 Arquivo de entrada vazio")
+                return
+            linhas = intercalar_corridas(corridas, colunas, criterio, arquivo_saida, linhas_por_bloco)
+        finally:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+        metricas.update(bytes_lidos=os.path.getsize(arquivo_entrada), linhas_por_bloco=linhas_por_bloco,
+                        corridas=len(corridas), linhas_saida=linhas, arquivos_saida=[arquivo_saida])
+
+    if detalhado():
+        print(f"\n🎉 PROCESSAMENTO CONCLUÍDO!")
+        print(f"📁 Arquivo salvo: {arquivo_saida}")
+        print(f"📊 Total de registros: {linhas}")
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(
+        description="Ordena (como f_sh6) extratos maiores que a memória, em blocos gravados em disco")
+    parser.add_argument("entrada", help="TSV filtrado (saída de f_mun_pato)")
+    parser.add_argument("--hierarquico", default="dados_ordenados_hierarquico.csv",
+                        help="saída da ordenação hierárquica")
+    parser.add_argument("--por-ano", default="dados_ordenados_por_ano.csv", help="saída da ordenação por ano")
+    parser.add_argument("--memoria", type=float, default=MEMORIA_PADRAO_MB, help="memória para os blocos (MB)")
+    parser.add_argument("--temporaria", help="pasta para as corridas (padrão: a pasta temporária do sistema)")
+    parser.add_argument("--verbosidade", choices=NIVEIS, default="metricas")
+    parser.add_argument("--metricas", help="arquivo onde acrescentar as métricas JSON (padrão: a saída padrão)")
+    return parser.parse_args()
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    args = _argumentos()
+    definir_verbosidade(args.verbosidade, args.metricas)
+
+    ordenar_externamente(args.entrada, args.hierarquico, 'hierarquica', args.memoria, args.temporaria)
+    ordenar_externamente(args.entrada, args.por_ano, 'por_ano', args.memoria, args.temporaria)
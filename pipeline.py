@@ -0,0 +1,194 @@
+import argparse
+import os
+
+from dicionario import carregar_dicionarios, carregar_hierarquia, traduzir_dataframe
+from esquema import FORMATOS, gravar_tabela
+from f_mun_pato import _municipio_ou_padrao, _salvar_saida, filtrar_arquivos_mal_formatados
+from f_sh6 import calcular_ordem_hierarquica, calcular_ordem_por_ano
+from hierarquia_sh import ordens_por_nivel, traduzir_nivel
+from leitor_bruto import MOTOR_PADRAO, MOTORES
+from ordem_incremental import atualizar_anos, montar_ordem_hierarquica, montar_ordem_por_ano, reordenar_anos
+from relatorio import NIVEIS, definir_verbosidade, etapa, mostrar
+
+# Pipeline completo em memória: filtragem (f_mun_pato) → as duas ordenações (f_sh6) →
+# tradução (dicionario), sem gravar e reler CSV entre as etapas. Só as tabelas finais
+# traduzidas são gravadas; os intermediários são opcionais.
+
+
+def ordenar_e_traduzir(df_filtrado, pasta_saida, tabela_sh4, tabela_pais, prefixo="dados",
+                       salvar_intermediarios=False, formato='csv', pasta_ordem=None, hierarquia=None,
+                       niveis_sh=()):
+    """
+    Parte de executar_pipeline depois da filtragem: as duas ordenações de f_sh6 e a
+    tradução de cada uma, gravadas em pasta_saida. Para cada nível de niveis_sh ('SH2',
+    'SECAO') grava também as versões agregadas no nível (ver hierarquia_sh), o que exige
+    a hierarquia de dicionario.carregar_hierarquia. Retorna a lista de arquivos gravados
+    """
+
+    os.makedirs(pasta_saida, exist_ok=True)
+    caminho = lambda nome: os.path.join(pasta_saida, f"{prefixo}_{nome}")
+    arquivos_salvos = []
+
+    if salvar_intermediarios:
+        arquivos_salvos += _salvar_saida(df_filtrado, caminho("filtrados.csv"), False, formato)
+
+    if pasta_ordem is not None:
+        with etapa('ordenar_incremental', prefixo=prefixo) as metricas:
+            metricas['linhas_entrada'] = len(df_filtrado)
+            pasta_estado = os.path.join(pasta_ordem, prefixo)
+            metricas['anos_atualizados'] = atualizar_anos(df_filtrado, pasta_estado, substituir=True)
+            metricas['anos_reordenados'] = reordenar_anos(pasta_estado)
+            resultado = montar_ordem_hierarquica(pasta_estado)
+            df_por_ano = montar_ordem_por_ano(pasta_estado)
+            metricas['linhas_saida'] = len(df_por_ano)
+    else:
+        with etapa('ordenar_hierarquicamente', prefixo=prefixo) as metricas:
+            metricas['linhas_entrada'] = len(df_filtrado)
+            resultado = calcular_ordem_hierarquica(df_filtrado)
+            if resultado is not None:
+                metricas['linhas_saida'] = len(resultado[0])
+        if resultado is None:
+            return arquivos_salvos
+
+        with etapa('ordenar_por_ano', prefixo=prefixo) as metricas:
+            metricas['linhas_entrada'] = len(df_filtrado)
+            df_por_ano = calcular_ordem_por_ano(df_filtrado)
+            metricas['linhas_saida'] = len(df_por_ano)
+
+    ordenacoes = {
+        'ordenados_hierarquicos': resultado[0],
+        'ordenados_por_ano': df_por_ano,
+    }
+
+    for nome, df_ordenado in ordenacoes.items():
+        if salvar_intermediarios:
+            arquivos_salvos.append(gravar_tabela(df_ordenado, caminho(f"{nome}.csv"), formato))
+
+        with etapa('traduzir', prefixo=prefixo, tabela=nome) as metricas:
+            metricas['linhas_entrada'] = len(df_ordenado)
+            traducao = traduzir_dataframe(df_ordenado, tabela_sh4, tabela_pais)
+            if traducao is None:
+                continue
+
+            arquivo_saida = gravar_tabela(traducao[0], caminho(f"{nome}_traduzidos.csv"), formato)
+            arquivos_salvos.append(arquivo_saida)
+            metricas.update(linhas_saida=len(traducao[0]), sh4_traduzidos=traducao[1],
+                            paises_traduzidos=traducao[2], arquivos_saida=[arquivo_saida])
+
+    if niveis_sh:
+        with etapa('ordenar_niveis', prefixo=prefixo, niveis=list(niveis_sh)) as metricas:
+            metricas.update(linhas_entrada=len(df_filtrado), arquivos_saida=[])
+            for nivel, tabelas in ordens_por_nivel(df_filtrado, hierarquia, niveis_sh).items():
+                for nome, df_nivel in zip(ordenacoes, tabelas):
+                    arquivo_saida = gravar_tabela(traduzir_nivel(df_nivel, nivel, hierarquia, tabela_pais),
+                                                  caminho(f"{nome}_{nivel.lower()}_traduzidos.csv"), formato)
+                    metricas['arquivos_saida'].append(arquivo_saida)
+            arquivos_salvos += metricas['arquivos_saida']
+
+    return arquivos_salvos
+
+
+def executar_pipeline(pasta_entrada, pasta_saida, arquivo_sh4, arquivo_pais, codigo_municipio=None,
+                      prefixo="dados", salvar_intermediarios=False, dicionarios=None, formato='csv',
+                      pasta_ordem=None, niveis_sh=(), **opcoes_filtro):
+    """
+    Filtra os arquivos anuais de pasta_entrada, ordena o resultado hierarquicamente e
+    por ano, traduz as duas ordenações e grava em pasta_saida:
+    <prefixo>_ordenados_hierarquicos_traduzidos.csv e <prefixo>_ordenados_por_ano_traduzidos.csv.
+    Com salvar_intermediarios=True grava também o TSV filtrado e as ordenações sem tradução,
+    com os mesmos nomes das etapas separadas.
+    formato='colunar' grava todas as tabelas em .npz (ver esquema.gravar_tabela) em vez de CSV.
+    Com pasta_ordem, as ordenações são mantidas ano a ano (ver ordem_incremental): só os
+    anos cujos registros mudaram são recontados e só os anos cujas posições mudaram são
+    reordenados.
+    niveis_sh ('SH2' e/ou 'SECAO') grava também as ordenações por capítulo e por seção
+    (<prefixo>_ordenados_hierarquicos_sh2_traduzidos.csv etc.).
+    'dicionarios' permite reaproveitar o resultado de carregar_dicionarios entre chamadas;
+    opcoes_filtro são repassadas a filtrar_arquivos_mal_formatados (workers, uf, pre_filtro,
+    pasta_cache, pasta_indice, tamanho_bloco, motor). Sem codigo_municipio nem uf, filtra
+    o município 4118501 (Pato Branco); só com uf, a UF inteira.
+    Retorna a lista de arquivos gravados (vazia se nada foi encontrado)
+    """
+
+    mostrar("🚀 PIPELINE: FILTRAGEM → ORDENAÇÃO → TRADUÇÃO")
+    mostrar("=" * 60)
+
+    if dicionarios is None:
+        dicionarios = carregar_dicionarios(arquivo_sh4, arquivo_pais)
+        if dicionarios is None:
+            return []
+    tabela_sh4, tabela_pais = dicionarios
+
+    hierarquia = None
+    if niveis_sh:
+        hierarquia = carregar_hierarquia(arquivo_sh4)
+        if hierarquia is None:
+            return []
+
+    mostrar(f"\n📂 Filtrando {pasta_entrada}...")
+    codigo_municipio = _municipio_ou_padrao(codigo_municipio, opcoes_filtro.get('uf'))
+    df_filtrado = filtrar_arquivos_mal_formatados(pasta_entrada, codigo_municipio, **opcoes_filtro)
+    if df_filtrado is None:
+        return []
+    mostrar(f"✅ Registros filtrados: {len(df_filtrado)}")
+
+    arquivos_salvos = ordenar_e_traduzir(df_filtrado, pasta_saida, tabela_sh4, tabela_pais, prefixo,
+                                         salvar_intermediarios, formato, pasta_ordem, hierarquia, niveis_sh)
+
+    mostrar(f"\n🎉 PIPELINE CONCLUÍDO!")
+    for arquivo in arquivos_salvos:
+        mostrar(f"📁 Arquivo salvo: {arquivo}")
+
+    return arquivos_salvos
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(
+        description="Filtra, ordena e traduz os dados do Comex Stat sem arquivos intermediários")
+    parser.add_argument("--exportacoes", help="pasta com os CSV anuais de exportação (EXP_*.csv)")
+    parser.add_argument("--importacoes", default="Bruto", help="pasta com os CSV anuais de importação")
+    parser.add_argument("--saida", default=".", help="pasta onde gravar as tabelas")
+    parser.add_argument("--municipio", type=int, nargs="+",
+                        help="código(s) CO_MUN (sem --municipio nem --uf: 4118501, Pato Branco)")
+    parser.add_argument("--uf", nargs="+", help="sigla(s) SG_UF_MUN")
+    parser.add_argument("--sh4", default="dicionario_sh4.csv", help="dicionário de SH4")
+    parser.add_argument("--pais", default="dicionario_pais.csv", help="dicionário de países")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processos de leitura")
+    parser.add_argument("--cache", help="pasta do cache colunar")
+    parser.add_argument("--indice", help="pasta do índice por município")
+    parser.add_argument("--motor", choices=["auto"] + list(MOTORES), default=MOTOR_PADRAO,
+                        help="parser das linhas brutas: python, pandas (C), arrow (pyarrow) ou auto, o mais rápido")
+    parser.add_argument("--niveis", nargs="+", choices=["SH2", "SECAO"], default=[],
+                        help="grava também as ordenações por capítulo (SH2) e/ou por seção")
+    parser.add_argument("--ordem", help="pasta do estado das ordenações incrementais (por ano)")
+    parser.add_argument("--intermediarios", action="store_true", help="grava também as etapas intermediárias")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv",
+                        help="csv ou colunar (.npz compactado, descrições como dicionário)")
+    parser.add_argument("--verbosidade", choices=NIVEIS, default="metricas",
+                        help="silencioso, metricas (um JSON por etapa) ou detalhado (mensagens e amostras)")
+    parser.add_argument("--metricas", help="arquivo onde acrescentar as métricas JSON (padrão: a saída padrão)")
+    # Sem --municipio nem --uf, executar_pipeline usa o município padrão
+    return parser.parse_args()
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    args = _argumentos()
+    definir_verbosidade(args.verbosidade, args.metricas)
+
+    # As tabelas de tradução compiladas ficam junto do cache colunar
+    pasta_dicionarios = os.path.join(args.cache, "dicionarios") if args.cache else None
+    dicionarios = carregar_dicionarios(args.sh4, args.pais, pasta_dicionarios)
+    if dicionarios is not None:
+        # Importação e exportação geram as quatro tabelas finais (duas ordenações cada);
+        # cada fluxo tem sua subpasta no cache colunar
+        fluxos = [("import", args.importacoes), ("export", args.exportacoes)]
+        for prefixo, pasta in fluxos:
+            if pasta is None:
+                continue
+            pasta_cache = os.path.join(args.cache, prefixo) if args.cache else None
+            executar_pipeline(pasta, args.saida, args.sh4, args.pais, args.municipio, prefixo=f"dados_{prefixo}",
+                              salvar_intermediarios=args.intermediarios, dicionarios=dicionarios, formato=args.formato,
+                              workers=args.workers, uf=args.uf, pre_filtro=True, pasta_cache=pasta_cache,
+                              pasta_indice=args.indice, pasta_ordem=args.ordem, niveis_sh=args.niveis,
+                              motor=args.motor)
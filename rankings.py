@@ -0,0 +1,155 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from dicionario import carregar_dicionarios, traduzir_coluna
+from esquema import aplicar_esquema, concatenar, ler_tabela
+from f_sh6 import _colunas_fluxo
+from hierarquia_sh import MEDIDAS, agregar_celulas
+from relatorio import NIVEIS, definir_verbosidade, etapa
+
+# Rankings "TOP K" (SH4, países e pares SH4 x país, por frequência ou por VL_FOB) sem
+# ordenar a tabela de registros: as linhas são agregadas uma vez em células (ano, SH4,
+# país), somadas por código e, em cada grupo (ano e/ou fluxo), os K maiores são
+# separados com np.partition (seleção parcial, O(n)); só esses poucos são ordenados.
+# Empates com o K-ésimo entram todos (a lista pode passar de K), e a ordem entre
+# empatados é a dos códigos, de modo que o resultado não depende da ordem das linhas.
+# Como nas frequências de f_sh6, um registro só fica fora do ranking da dimensão cujo
+# código está ausente: um SH4 <NA> ainda conta para o ranking de países.
+
+# Dimensão do ranking → colunas que a identificam
+DIMENSOES = {
+    'SH4': ['SH4'],
+    'CO_PAIS': ['CO_PAIS'],
+    'SH4_PAIS': ['SH4', 'CO_PAIS'],
+}
+
+# Quantos primeiros em cada ranking, como os "TOP 5" de f_sh6
+K_PADRAO = 5
+
+
+def maiores(valores, k, desempate=(), incluir_empates=True):
+    """
+    Índices dos k maiores 'valores', do maior para o menor; empates pela ordem
+    crescente dos arrays de 'desempate' (o primeiro é o mais importante). Com
+    incluir_empates=True também entram todos os empatados com o k-ésimo.
+    Só os candidatos separados por np.partition são ordenados
+    """
+
+    valores = np.asarray(valores)
+    if k <= 0 or not len(valores):
+        return np.array([], dtype=np.intp)
+
+    if k < len(valores):
+        limiar = np.partition(valores, len(valores) - k)[len(valores) - k]
+        candidatos = np.flatnonzero(valores >= limiar)
+    else:
+        candidatos = np.arange(len(valores))
+
+    chaves = [np.asarray(coluna)[candidatos] for coluna in reversed(desempate)] + [-valores[candidatos]]
+    ordem = candidatos[np.lexsort(chaves)]
+    return ordem if incluir_empates else ordem[:k]
+
+
+def _posicoes(valores):
+    """
+    Posição no ranking de valores já em ordem decrescente; empatados dividem a
+    posição (1, 2, 2, 4...)
+    """
+
+    return np.searchsorted(-valores, -valores, side='left') + 1
+
+
+def ranking_top(df, dimensao='SH4', medida='REGISTROS', k=K_PADRAO, por_ano=False, incluir_empates=True):
+    """
+    Os k primeiros de 'dimensao' (SH4, CO_PAIS ou SH4_PAIS) por 'medida' (REGISTROS,
+    a frequência de f_sh6, VL_FOB ou KG_LIQUIDO), no período todo ou, com por_ano=True,
+    em cada ano; com FLUXO, dentro de cada fluxo. Aceita as linhas filtradas ou as
+    células de hierarquia_sh.agregar_celulas / do cubo (com REGISTROS).
+    Colunas: [FLUXO], [CO_ANO], POSICAO, os códigos da dimensão, REGISTROS, VL_FOB, KG_LIQUIDO
+    """
+
+    if dimensao not in DIMENSOES:
+        raise ValueError(f"dimensão deve ser uma de {tuple(DIMENSOES)}, não {dimensao!r}")
+    if medida not in MEDIDAS:
+        raise ValueError(f"medida deve ser uma de {MEDIDAS}, não {medida!r}")
+
+    celulas = agregar_celulas(df, descartar_ausentes=False) if 'REGISTROS' not in df.columns else df
+    grupo = _colunas_fluxo(celulas) + (['CO_ANO'] if por_ano else [])
+    codigos = DIMENSOES[dimensao]
+    medidas = [col for col in MEDIDAS if col in celulas.columns]
+
+    # Somas por código sem ordenar (a ordem sai da seleção parcial)
+    somas = celulas.groupby(grupo + codigos, observed=True, sort=False)[medidas].sum().reset_index()
+    indices = somas.groupby(grupo, observed=True).indices if grupo else {(): np.arange(len(somas))}
+
+    partes = []
+    for chave in sorted(indices):
+        parte = somas.take(indices[chave])
+        valores = parte[medida].to_numpy(dtype=np.int64)
+        ordem = maiores(valores, k, [parte[col].to_numpy() for col in codigos], incluir_empates)
+        parte = parte.take(ordem)
+        parte.insert(len(grupo), 'POSICAO', _posicoes(valores[ordem]))
+        partes.append(parte)
+
+    if not partes:
+        return aplicar_esquema(pd.DataFrame(columns=grupo + ['POSICAO'] + codigos + medidas))
+    return concatenar(partes)
+
+
+def rankings_top(df, k=K_PADRAO, por_ano=False, medidas=('REGISTROS', 'VL_FOB'), dimensoes=tuple(DIMENSOES),
+                 incluir_empates=True):
+    """
+    Todos os rankings de uma vez (uma única agregação das linhas), para painéis.
+    Retorna {(dimensao, medida): DataFrame de ranking_top}
+    """
+
+    celulas = agregar_celulas(df, descartar_ausentes=False)
+    return {(dimensao, medida): ranking_top(celulas, dimensao, medida, k, por_ano, incluir_empates)
+            for dimensao in dimensoes for medida in medidas}
+
+
+def traduzir_ranking(df, tabela_sh4=None, tabela_pais=None):
+    """
+    Acrescenta NO_SH4_POR ao lado de SH4 e NO_PAIS ao lado de CO_PAIS (tabelas de
+    dicionario.carregar_dicionarios). Não altera df
+    """
+
+    df = df.copy()
+    for coluna, nome, tabela in (('SH4', 'NO_SH4_POR', tabela_sh4), ('CO_PAIS', 'NO_PAIS', tabela_pais)):
+        if tabela is not None and coluna in df.columns:
+            df.insert(df.columns.get_loc(coluna) + 1, nome, traduzir_coluna(df[coluna], tabela)[0])
+    return aplicar_esquema(df)
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="TOP K de SH4, países e pares SH4 x país de um extrato filtrado")
+    parser.add_argument("entrada", help="TSV filtrado (saída de f_mun_pato) ou sua versão colunar")
+    parser.add_argument("-k", type=int, default=K_PADRAO, help="quantos primeiros em cada ranking")
+    parser.add_argument("--por-ano", action="store_true", help="um ranking por ano")
+    parser.add_argument("--medidas", nargs="+", choices=MEDIDAS, default=['REGISTROS', 'VL_FOB'])
+    parser.add_argument("--sh4", help="dicionário de SH4 (para as descrições)")
+    parser.add_argument("--pais", help="dicionário de países (para os nomes)")
+    parser.add_argument("--verbosidade", choices=NIVEIS, default="silencioso")
+    parser.add_argument("--metricas", help="arquivo onde acrescentar as métricas JSON (padrão: a saída padrão)")
+    return parser.parse_args()
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    args = _argumentos()
+    definir_verbosidade(args.verbosidade, args.metricas)
+
+    dicionarios = (None, None)
+    if args.sh4 and args.pais:
+        dicionarios = carregar_dicionarios(args.sh4, args.pais) or dicionarios
+
+    with etapa('rankings_top', k=args.k, por_ano=args.por_ano) as metricas:
+        df = ler_tabela(args.entrada, sep='\t')
+        metricas['linhas_entrada'] = len(df)
+        rankings = rankings_top(df, args.k, args.por_ano, args.medidas)
+
+    for (dimensao, medida), ranking in rankings.items():
+        print(f"\n🏆 TOP {args.k} {dimensao} por {medida}:")
+        print(traduzir_ranking(ranking, *dicionarios).to_string(index=False))
@@ -0,0 +1,146 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage, o pico de RSS não é informado
+    resource = None
+
+# Verbosidade comum a todas as etapas:
+#   'silencioso' - nada é impresso (nem as métricas)
+#   'metricas'   - padrão: só um registro JSON por etapa (tempo, linhas, bytes, pico de
+#                  RSS e tempos por arquivo), sem tabelas nem mensagens por arquivo
+#   'detalhado'  - as mensagens e amostras de sempre, além das métricas
+# O padrão pode vir da variável de ambiente COMEX_VERBOSIDADE.
+NIVEIS = ('silencioso', 'metricas', 'detalhado')
+
+NIVEL_PADRAO = 'metricas'
+
+
+def _nivel_do_ambiente():
+    """
+    Verbosidade de COMEX_VERBOSIDADE; um valor fora de NIVEIS é avisado (stderr) e
+    trocado pelo padrão
+    """
+
+    nivel = os.environ.get('COMEX_VERBOSIDADE', NIVEL_PADRAO)
+    if nivel not in NIVEIS:
+        print(f"⚠️  COMEX_VERBOSIDADE={nivel!r} inválida (use uma de {NIVEIS}): usando {NIVEL_PADRAO!r}",
+              file=sys.stderr)
+        return NIVEL_PADRAO
+    return nivel
+
+
+_configuracao = {
+    'nivel': _nivel_do_ambiente(),
+    'arquivo_metricas': None,
+}
+
+
+def definir_verbosidade(nivel, arquivo_metricas=None):
+    """
+    Define a verbosidade (ver NIVEIS). Com arquivo_metricas, os registros JSON são
+    acrescentados a esse arquivo (um por linha) em vez de impressos
+    """
+
+    if nivel not in NIVEIS:
+        raise ValueError(f"verbosidade deve ser uma de {NIVEIS}, não {nivel!r}")
+    _configuracao['nivel'] = nivel
+    _configuracao['arquivo_metricas'] = arquivo_metricas
+
+
+def detalhado():
+    """
+    True se as mensagens e amostras devem ser impressas. Use para evitar montar
+    textos caros (to_string, iterrows) que não seriam exibidos
+    """
+
+    return _configuracao['nivel'] == 'detalhado'
+
+
+def mostrar(*args, **kwargs):
+    """
+    print que só imprime no modo 'detalhado'
+    """
+
+    if detalhado():
+        print(*args, **kwargs)
+
+
+def avisar(*args, **kwargs):
+    """
+    print para erros e avisos: só o modo 'silencioso' os omite (vão para stderr fora
+    do modo 'detalhado', para não se misturar às métricas)
+    """
+
+    if _configuracao['nivel'] == 'silencioso':
+        return
+    print(*args, file=sys.stdout if detalhado() else sys.stderr, **kwargs)
+
+
+def pico_rss_mb():
+    """
+    Pico de memória residente (MB) deste processo e dos processos filhos já encerrados
+    (os workers), ou None onde getrusage não existe
+    """
+
+    if resource is None:
+        return None
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    unidade = 1 if sys.platform == 'darwin' else 1024
+    processo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(processo, filhos) * unidade / 2 ** 20
+
+
+def emitir(registro):
+    """
+    Imprime (ou grava em arquivo_metricas) um registro de métricas como uma linha JSON
+    """
+
+    if _configuracao['nivel'] == 'silencioso':
+        return
+
+    linha = json.dumps(registro, ensure_ascii=False, default=str)
+    if _configuracao['arquivo_metricas']:
+        with open(_configuracao['arquivo_metricas'], 'a', encoding='utf-8') as f:
+            f.write(linha + "\n")
+    else:
+        print(linha)
+
+
+@contextmanager
+def etapa(nome, **campos):
+    """
+    Mede uma etapa e emite seu registro de métricas ao final. O bloco recebe o
+    dicionário do registro para preencher linhas_entrada, linhas_saida, bytes_lidos,
+    arquivos (tempos por arquivo) etc.; tempo de parede e pico de RSS são acrescentados
+    aqui
+    """
+
+    registro = {'etapa': nome, **campos}
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro['segundos'] = round(time.perf_counter() - inicio, 6)
+        registro['pico_rss_mb'] = pico_rss_mb()
+        emitir(registro)
+
+
+@contextmanager
+def cronometro():
+    """
+    Mede o tempo de um trecho (ex.: um arquivo dentro de um worker): o bloco recebe
+    um dicionário que, ao final, tem 'segundos'
+    """
+
+    medida = {}
+    inicio = time.perf_counter()
+    try:
+        yield medida
+    finally:
+        medida['segundos'] = round(time.perf_counter() - inicio, 6)
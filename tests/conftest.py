@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório (sem pacote instalável)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CABECALHO = '"CO_ANO";"CO_MES";"SH4";"CO_PAIS";"SG_UF_MUN";"CO_MUN";"KG_LIQUIDO";"VL_FOB"\n'
+MUNICIPIOS = [(4118501, 'PR'), (4106902, 'PR'), (3550308, 'SP'), (3509502, 'SP')]
+
+
+@pytest.fixture
+def importacoes_e_dicionarios(tmp_path):
+    """
+    Um ano de importação com dois municípios do PR e dois de SP, e dicionários mínimos.
+    Retorna (pasta, arquivo_sh4, arquivo_pais)
+    """
+
+    pasta = tmp_path / 'imp'
+    os.makedirs(pasta)
+    with open(pasta / 'IMP_2024_MUN.csv', 'w', encoding='utf-8') as f:
+        f.write(CABECALHO)
+        for i in range(40):
+            co_mun, uf = MUNICIPIOS[i % len(MUNICIPIOS)]
+            f.write(f'"2024";"{i % 12 + 1:02d}";"{101 + i % 3}";"{23 + i % 2}";"{uf}";"{co_mun}";"1";"{i}"\n')
+
+    arquivo_sh4, arquivo_pais = tmp_path / 'NCM_SH.csv', tmp_path / 'PAIS.csv'
+    arquivo_sh4.write_text('CO_SH4,NO_SH4_POR\n0101,Cavalos\n0102,Bovinos\n0103,Suínos\n', encoding='utf-8')
+    arquivo_pais.write_text('CO_PAIS,NO_PAIS\n23,Alemanha\n24,Angola\n', encoding='utf-8')
+    return str(pasta), str(arquivo_sh4), str(arquivo_pais)
@@ -0,0 +1,9 @@
+from balanca import filtrar_fluxos
+
+
+def test_filtrar_fluxos_com_uf_sozinha(importacoes_e_dicionarios):
+    pasta, _, _ = importacoes_e_dicionarios
+
+    assert set(filtrar_fluxos(None, pasta, uf='SP')['CO_MUN']) == {3550308, 3509502}
+    assert set(filtrar_fluxos(None, pasta)['CO_MUN']) == {4118501}
+    assert set(filtrar_fluxos(pasta, None, [4106902, 3550308], uf='PR')['CO_MUN']) == {4106902}
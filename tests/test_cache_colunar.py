@@ -0,0 +1,51 @@
+import os
+
+from cache_colunar import atualizar_cache, filtrar_cache, pasta_do_arquivo
+
+CABECALHO = '"CO_ANO";"CO_MES";"SH4";"CO_PAIS";"SG_UF_MUN";"CO_MUN";"KG_LIQUIDO";"VL_FOB"\n'
+
+
+def _gravar(pasta, nome, ano):
+    os.makedirs(pasta, exist_ok=True)
+    with open(os.path.join(pasta, nome), 'w', encoding='utf-8') as f:
+        f.write(CABECALHO + f'"{ano}";"01";"0101";"23";"PR";"4118501";"10";"50"\n')
+
+
+def test_duas_origens_na_mesma_pasta_de_cache(tmp_path):
+    importacoes, exportacoes, cache = str(tmp_path / 'imp'), str(tmp_path / 'exp'), str(tmp_path / 'cache')
+    for ano in (2023, 2024):
+        _gravar(importacoes, f"IMP_{ano}_MUN.csv", ano)
+        _gravar(exportacoes, f"EXP_{ano}_MUN.csv", ano)
+
+    atualizar_cache(importacoes, cache)
+    atualizar_cache(exportacoes, cache)
+
+    # Na segunda rodada nenhuma das origens apaga ou reconverte a outra
+    for pasta in (importacoes, exportacoes):
+        primeiro = os.path.join(pasta, sorted(os.listdir(pasta))[0])
+        mtime = os.path.getmtime(os.path.join(pasta_do_arquivo(cache, primeiro), 'CO_MUN.npy'))
+        atualizar_cache(pasta, cache)
+        assert os.path.getmtime(os.path.join(pasta_do_arquivo(cache, primeiro), 'CO_MUN.npy')) == mtime
+
+    # Um ano removido de uma origem sai do cache sem afetar a outra
+    os.remove(os.path.join(importacoes, "IMP_2023_MUN.csv"))
+    atualizar_cache(importacoes, cache)
+    assert not os.path.isdir(pasta_do_arquivo(cache, os.path.join(importacoes, "IMP_2023_MUN.csv")))
+    assert os.path.isdir(pasta_do_arquivo(cache, os.path.join(importacoes, "IMP_2024_MUN.csv")))
+    assert os.path.isdir(pasta_do_arquivo(cache, os.path.join(exportacoes, "EXP_2023_MUN.csv")))
+
+
+def test_mesmo_nome_de_arquivo_em_duas_origens(tmp_path):
+    primeira, segunda, cache = str(tmp_path / 'a' / 'Bruto'), str(tmp_path / 'b' / 'Bruto'), str(tmp_path / 'cache')
+    _gravar(primeira, "EXP_2024.csv", 2023)
+    _gravar(segunda, "EXP_2024.csv", 2024)
+
+    pastas = atualizar_cache(primeira, cache) + atualizar_cache(segunda, cache)
+    assert pastas[0] != pastas[1]
+
+    # Cada origem lê os seus próprios dados, também depois de reaproveitar o cache
+    for _ in range(2):
+        for pasta_entrada, ano in ((primeira, 2023), (segunda, 2024)):
+            pasta, = atualizar_cache(pasta_entrada, cache)
+            df, total, _ = filtrar_cache(pasta)
+            assert total == 1 and list(df['CO_ANO']) == [ano]
@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+import pytest
+
+from consulta import ano_do_arquivo, consultar
+from indice_municipios import construir_indice
+from leitor_bruto import filtrar_arquivo_em_blocos, listar_arquivos_anuais
+
+CABECALHO = '"CO_ANO";"CO_MES";"SH4";"CO_PAIS";"SG_UF_MUN";"CO_MUN";"KG_LIQUIDO";"VL_FOB"\n'
+MUNICIPIOS = [(4118501, 'PR'), (4106902, 'PR'), (3550308, 'SP')]
+SH4 = [101, 102, 8401, 8471, 8702, 'xx']
+
+
+def _gravar(pasta, anos=(2022, 2023, 2024)):
+    # Alguns campos inválidos (<NA> na leitura) e linhas mal formadas no meio
+    os.makedirs(pasta, exist_ok=True)
+    for ano in anos:
+        with open(os.path.join(pasta, f"EXP_{ano}_MUN.csv"), 'w', encoding='utf-8') as f:
+            f.write(CABECALHO)
+            for i in range(150):
+                co_mun, uf = MUNICIPIOS[(i * 5) % len(MUNICIPIOS)]
+                pais = 'xx' if i % 23 == 0 else 20 + i % 4
+                f.write(f'"{ano}";"{i % 12 + 1:02d}";"{SH4[i % len(SH4)]}";"{pais}";"{uf}";"{co_mun}";"{i}";"{i * 3}"\n')
+                if i % 47 == 0:
+                    f.write('"2023";"01"\n')
+
+
+def _filtrar_com_pandas(pasta, codigo_municipio=None, uf=None, anos=None, meses=None, sh2=None, paises=None):
+    df = pd.concat([filtrar_arquivo_em_blocos(arquivo)[0] for arquivo in listar_arquivos_anuais(pasta)],
+                   ignore_index=True)
+    for coluna, valores in (('CO_MUN', codigo_municipio), ('SG_UF_MUN', uf), ('CO_ANO', anos),
+                            ('CO_MES', meses), ('CO_PAIS', paises)):
+        if valores is not None:
+            df = df[df[coluna].isin(list(valores))]
+    if sh2 is not None:
+        df = df[(df['SH4'] // 100).isin(list(sh2)).fillna(False)]
+    df = df.assign(SG_UF_MUN=df['SG_UF_MUN'].cat.remove_unused_categories())
+    return df.reset_index(drop=True)
+
+
+FILTROS = [
+    {},
+    {'anos': [2023]},
+    {'anos': range(2023, 2030), 'meses': [1, 2, 12]},
+    {'sh2': [84], 'paises': [21, 22]},
+    {'uf': ['SP'], 'sh2': [1]},
+    {'codigo_municipio': [4118501], 'anos': [2022, 2024], 'sh2': [84]},
+    {'codigo_municipio': [4106902, 3550308], 'uf': ['PR'], 'meses': range(1, 7)},
+]
+
+
+@pytest.mark.parametrize('com_indice', [False, True])
+@pytest.mark.parametrize('filtros', FILTROS)
+def test_consulta_igual_ao_filtro_com_pandas(tmp_path, filtros, com_indice):
+    pasta = str(tmp_path / 'exp')
+    _gravar(pasta)
+    pasta_indice = None
+    if com_indice:
+        pasta_indice = str(tmp_path / 'indice')
+        construir_indice(pasta, pasta_indice)
+
+    # Só o tipo pode diferir: sem <NA> entre as linhas selecionadas a coluna não é anulável
+    obtido = consultar(pasta, tamanho_bloco=512, pasta_indice=pasta_indice, **filtros)
+    pd.testing.assert_frame_equal(obtido, _filtrar_com_pandas(pasta, **filtros), check_dtype=False)
+
+
+def test_arquivos_fora_dos_anos_nao_sao_lidos(tmp_path):
+    pasta = str(tmp_path / 'exp')
+    _gravar(pasta)
+    # Um arquivo ilegível só daria erro se fosse aberto
+    with open(os.path.join(pasta, 'EXP_2022_MUN.csv'), 'wb') as f:
+        f.write(b'\xff\xfe\x00')
+
+    obtido = consultar(pasta, anos=2024, colunas=['CO_ANO', 'VL_FOB'])
+    assert list(obtido.columns) == ['CO_ANO', 'VL_FOB']
+    assert (obtido['CO_ANO'] == 2024).all() and len(obtido) == 150
+    assert ano_do_arquivo('IMP_1997_MUN.zip') == 1997 and ano_do_arquivo('NCM_SH.csv') is None
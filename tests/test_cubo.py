@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+import pytest
+
+from cubo import carregar_cubo, construir_cubo, consultar_cubo
+from f_sh6 import calcular_ordem_hierarquica
+from leitor_bruto import filtrar_arquivo_em_blocos, listar_arquivos_anuais
+
+CABECALHO = '"CO_ANO";"CO_MES";"SH4";"CO_PAIS";"SG_UF_MUN";"CO_MUN";"KG_LIQUIDO";"VL_FOB"\n'
+MUNICIPIOS = [(4118501, 'PR'), (3550308, 'SP'), ('xx', 'PR')]
+
+
+def _gravar(pasta, prefixo, anos=(2023, 2024)):
+    # Campos inválidos em SH4, CO_PAIS e CO_MUN viram <NA> na leitura
+    os.makedirs(pasta, exist_ok=True)
+    for ano in anos:
+        with open(os.path.join(pasta, f"{prefixo}_{ano}_MUN.csv"), 'w', encoding='utf-8') as f:
+            f.write(CABECALHO)
+            for i in range(120):
+                co_mun, uf = MUNICIPIOS[i % len(MUNICIPIOS) if i % 10 == 0 else i % 2]
+                sh4 = 'xx' if i % 17 == 0 else 100 + i % 6
+                pais = 'xx' if i % 13 == 0 else i % 5
+                f.write(f'"{ano}";"{i % 12 + 1:02d}";"{sh4}";"{pais}";"{uf}";"{co_mun}";"{i}";"{i * 7}"\n')
+
+
+def _linhas(pasta):
+    return pd.concat([filtrar_arquivo_em_blocos(arquivo)[0] for arquivo in listar_arquivos_anuais(pasta)],
+                     ignore_index=True)
+
+
+def test_registros_iguais_as_frequencias_de_f_sh6(tmp_path):
+    pasta, pasta_cubo = str(tmp_path / 'exp'), str(tmp_path / 'cubo')
+    _gravar(pasta, 'EXP')
+    construir_cubo(pasta, pasta_cubo, tamanho_bloco=512)
+
+    linhas = _linhas(pasta)
+    cubo = carregar_cubo(pasta_cubo)
+    assert cubo['REGISTROS'].sum() == len(linhas)
+    assert cubo['VL_FOB'].sum() == linhas['VL_FOB'].sum()
+
+    _, freq_sh4, freq_pais = calcular_ordem_hierarquica(linhas)
+    for coluna, freq in (('SH4', freq_sh4), ('CO_PAIS', freq_pais)):
+        ranking = consultar_cubo(pasta_cubo, coluna)
+        esperado = freq.set_index(coluna)[freq.columns[-1]].sort_index()
+        obtido = ranking.set_index(coluna)['REGISTROS'].sort_index()
+        pd.testing.assert_series_equal(obtido, esperado, check_names=False, check_dtype=False,
+                                       check_index_type=False)
+
+
+def test_consulta_por_municipio_e_ano(tmp_path):
+    pasta, pasta_cubo = str(tmp_path / 'exp'), str(tmp_path / 'cubo')
+    _gravar(pasta, 'EXP')
+    construir_cubo(pasta, pasta_cubo)
+
+    linhas = _linhas(pasta)
+    linhas = linhas[(linhas['CO_MUN'] == 4118501) & (linhas['CO_ANO'] == 2024)]
+    esperado = linhas.groupby('SH4')['VL_FOB'].sum()
+
+    ranking = consultar_cubo(pasta_cubo, 'SH4', 4118501, ano_inicial=2024)
+    pd.testing.assert_series_equal(ranking.set_index('SH4')['VL_FOB'].sort_index(), esperado,
+                                   check_names=False, check_dtype=False, check_index_type=False)
+
+
+def test_pasta_de_cubo_de_outra_origem(tmp_path):
+    exportacoes, importacoes, pasta_cubo = str(tmp_path / 'exp'), str(tmp_path / 'imp'), str(tmp_path / 'cubo')
+    _gravar(exportacoes, 'EXP')
+    _gravar(importacoes, 'IMP')
+    construir_cubo(exportacoes, pasta_cubo)
+    antes = carregar_cubo(pasta_cubo)
+
+    with pytest.raises(ValueError):
+        construir_cubo(importacoes, pasta_cubo)
+
+    # O cubo da exportação continua inteiro e é reaproveitado
+    construir_cubo(exportacoes, pasta_cubo)
+    pd.testing.assert_frame_equal(carregar_cubo(pasta_cubo), antes)
+    assert sorted(os.listdir(pasta_cubo)) == ['EXP_2023_MUN', 'EXP_2024_MUN', 'manifesto.json']
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from dicionario import compilar_hierarquia
+from esquema import aplicar_esquema
+from hierarquia_sh import agregar_celulas, codigos_do_nivel, ordens_por_nivel, ranking_por_nivel
+
+HIERARQUIA = compilar_hierarquia(pd.DataFrame({
+    'CO_SH4': ['0101', '0102', '0201'],
+    'NO_SH4_POR': ['Cavalos', 'Bovinos', 'Carnes'],
+    'CO_SH2': ['01', '01', '02'],
+    'NO_SH2_POR': ['Animais vivos', 'Animais vivos', 'Carnes'],
+    'CO_NCM_SECROM': ['I', 'I', 'I'],
+    'NO_SEC_POR': ['Animais', 'Animais', 'Animais'],
+}))
+
+
+def _registros(sh4):
+    df = pd.DataFrame({'CO_ANO': 2023, 'CO_MES': 1, 'SH4': pd.array(sh4, dtype='Int64'), 'CO_PAIS': 23,
+                       'SG_UF_MUN': 'PR', 'CO_MUN': 4118501, 'KG_LIQUIDO': 1, 'VL_FOB': 10})
+    return aplicar_esquema(df)
+
+
+def test_codigos_do_nivel_com_ausentes():
+    sh4 = pd.Series([101, None, 201, 9999], dtype='Int16')
+    assert list(codigos_do_nivel(sh4, 'SH4', HIERARQUIA)) == [101, -1, 201, 9999]
+    assert list(codigos_do_nivel(sh4, 'SH2', HIERARQUIA)) == [1, -1, 2, 99]
+    assert list(codigos_do_nivel(sh4, 'SECAO', HIERARQUIA)) == [1, -1, 1, -1]
+    assert codigos_do_nivel(np.array([101, 201]), 'SH2', HIERARQUIA).dtype == np.int64
+
+
+def test_agregacoes_descartam_sh4_ausente():
+    com_ausentes = _registros([101, None, 102, 201, None, 101])
+    sem_ausentes = _registros([101, 102, 201, 101])
+
+    # Só o tipo de SH4 (anulável) difere
+    pd.testing.assert_frame_equal(agregar_celulas(com_ausentes), agregar_celulas(sem_ausentes), check_dtype=False)
+    for nivel in ('SH2', 'SECAO'):
+        pd.testing.assert_frame_equal(ranking_por_nivel(com_ausentes, HIERARQUIA, nivel),
+                                      ranking_por_nivel(sem_ausentes, HIERARQUIA, nivel), check_dtype=False)
+        for obtido, esperado in zip(ordens_por_nivel(com_ausentes, HIERARQUIA, [nivel])[nivel],
+                                    ordens_por_nivel(sem_ausentes, HIERARQUIA, [nivel])[nivel]):
+            pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False)
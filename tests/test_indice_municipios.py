@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache_colunar import atualizar_cache, filtrar_cache, pasta_do_arquivo
+from f_mun_pato import _processar_cache
+from indice_municipios import (arquivo_do_indice, carregar_indice, construir_indice, filtrar_por_indice,
+                               posicoes_no_cache)
+from leitor_bruto import filtrar_arquivo_em_blocos
+
+CABECALHO = '"CO_ANO";"CO_MES";"SH4";"CO_PAIS";"SG_UF_MUN";"CO_MUN";"KG_LIQUIDO";"VL_FOB"\n'
+MUNICIPIOS = [(4118501, 'PR'), (4106902, 'PR'), (3550308, 'SP')]
+
+
+def _gravar_ano(pasta, linhas=300):
+    # Municípios intercalados (os arquivos do Comex não vêm ordenados por CO_MUN),
+    # com algumas linhas inválidas no meio
+    os.makedirs(pasta, exist_ok=True)
+    arquivo = os.path.join(pasta, "EXP_2023.csv")
+    with open(arquivo, 'w', encoding='utf-8') as f:
+        f.write(CABECALHO)
+        for i in range(linhas):
+            co_mun, uf = MUNICIPIOS[(i * 7) % len(MUNICIPIOS)]
+            f.write(f'"2023";"{i % 12 + 1:02d}";"{1000 + i % 50}";"{i % 9}";"{uf}";"{co_mun}";"{i}";"{i * 3}"\n')
+            if i % 41 == 0:
+                f.write('"2023";"01";"0101"\n\n')
+    return arquivo
+
+
+def test_indice_agrupa_as_linhas_por_municipio(tmp_path):
+    arquivo = _gravar_ano(str(tmp_path / 'exp'))
+    pasta_indice = str(tmp_path / 'indice')
+    construir_indice(str(tmp_path / 'exp'), pasta_indice, tamanho_bloco=512)
+
+    indice = carregar_indice(pasta_indice, arquivo)
+    assert list(indice['municipios']) == sorted(codigo for codigo, _ in MUNICIPIOS)
+    assert indice['ponteiros'][-1] == len(indice['byte_ini']) == 300
+    assert isinstance(indice['byte_ini'], np.memmap)
+
+    for codigos in ({4118501}, {4106902, 3550308}, {9999999}):
+        esperado, _, _ = filtrar_arquivo_em_blocos(arquivo, codigos, None, 512)
+        obtido, bytes_lidos = filtrar_por_indice(arquivo, indice, codigos)
+        pd.testing.assert_frame_equal(obtido.reset_index(drop=True), esperado.reset_index(drop=True))
+        assert bytes_lidos <= os.path.getsize(arquivo)
+
+
+def test_posicoes_no_cache(tmp_path):
+    arquivo = _gravar_ano(str(tmp_path / 'exp'))
+    pasta_indice, cache = str(tmp_path / 'indice'), str(tmp_path / 'cache')
+    construir_indice(str(tmp_path / 'exp'), pasta_indice)
+    atualizar_cache(str(tmp_path / 'exp'), cache)
+
+    indice = carregar_indice(pasta_indice, arquivo)
+    posicoes = posicoes_no_cache(indice, {4106902})
+    assert (np.diff(posicoes) > 0).all()
+
+    esperado, _, _ = filtrar_cache(pasta_do_arquivo(cache, arquivo), {4106902})
+    obtido, _, _ = filtrar_cache(pasta_do_arquivo(cache, arquivo), {4106902}, candidatas=posicoes)
+    pd.testing.assert_frame_equal(obtido, esperado)
+
+
+def test_indice_desatualizado(tmp_path):
+    arquivo = _gravar_ano(str(tmp_path / 'exp'))
+    pasta_indice = str(tmp_path / 'indice')
+    construir_indice(str(tmp_path / 'exp'), pasta_indice)
+
+    with open(arquivo, 'a', encoding='utf-8') as f:
+        f.write('"2023";"12";"0101";"1";"PR";"4118501";"1";"1"\n')
+    assert carregar_indice(pasta_indice, arquivo) is None
+
+    construir_indice(str(tmp_path / 'exp'), pasta_indice)
+    assert carregar_indice(pasta_indice, arquivo)['ponteiros'][-1] == 301
+    assert sorted(os.listdir(pasta_indice)) == [os.path.basename(arquivo_do_indice(pasta_indice, arquivo))]
+
+
+def test_cache_sem_o_csv_de_origem(tmp_path):
+    arquivo = _gravar_ano(str(tmp_path / 'exp'))
+    pasta_indice, cache = str(tmp_path / 'indice'), str(tmp_path / 'cache')
+    construir_indice(str(tmp_path / 'exp'), pasta_indice)
+    atualizar_cache(str(tmp_path / 'exp'), cache)
+    os.remove(arquivo)
+
+    resultado, mensagens, medida = _processar_cache(pasta_do_arquivo(cache, arquivo), {4118501}, None,
+                                                    str(tmp_path / 'exp'), pasta_indice)
+    assert 'erro' not in medida and medida['modo'] == 'cache'
+    assert any('sem índice' in mensagem for mensagem in mensagens)
+    assert (resultado['CO_MUN'] == 4118501).all() and len(resultado) == 100
+
+
+def test_fins_de_linha_crlf_e_cr_sozinho(tmp_path):
+    # Linhas terminadas em '\r\n', '\n' e '\r' sozinho (o modo texto quebra nos três)
+    pasta = str(tmp_path / 'exp')
+    arquivo = _gravar_ano(pasta, linhas=120)
+    with open(arquivo, 'r', encoding='utf-8', newline='') as f:
+        linhas = f.read().split('\n')
+    fins = ['\r\n', '\r', '\n']
+    with open(arquivo, 'w', encoding='utf-8', newline='') as f:
+        f.write(''.join(linha + fins[i % len(fins)] for i, linha in enumerate(linhas[:-1])))
+
+    pasta_indice, cache = str(tmp_path / 'indice'), str(tmp_path / 'cache')
+    construir_indice(pasta, pasta_indice, tamanho_bloco=256)
+    atualizar_cache(pasta, cache, tamanho_bloco=256)
+    indice = carregar_indice(pasta_indice, arquivo)
+    assert indice['ponteiros'][-1] == 120
+
+    for codigos in ({4118501}, {4106902, 3550308}):
+        esperado, _, _ = filtrar_arquivo_em_blocos(arquivo, codigos, None, 256)
+        obtido, _ = filtrar_por_indice(arquivo, indice, codigos)
+        pd.testing.assert_frame_equal(obtido.reset_index(drop=True), esperado.reset_index(drop=True))
+
+        pasta_cache = pasta_do_arquivo(cache, arquivo)
+        obtido, _, _ = filtrar_cache(pasta_cache, codigos, candidatas=posicoes_no_cache(indice, codigos))
+        pd.testing.assert_frame_equal(obtido.reset_index(drop=True), esperado.reset_index(drop=True))
@@ -0,0 +1,97 @@
+import gzip
+import lzma
+
+import pandas as pd
+import pytest
+
+from leitor_bruto import converter_linhas, dividir_linhas, filtrar_arquivo_em_blocos, motores_disponiveis
+
+CABECALHO = '"CO_ANO";"CO_MES";"SH4";"CO_PAIS";"SG_UF_MUN";"CO_MUN";"KG_LIQUIDO";"VL_FOB"\n'
+NORMAL = '"2024";"01";"0101";"23";"PR";"4118501";"10";"50"\n'
+
+# Linhas malformadas que dividir_linhas precisa tratar e que os motores em C devem
+# converter exatamente da mesma forma
+ANOMALAS = {
+    'campo_vazio': '"2024";"01";"0101";"23";"PR";"4118501";"";"5"\n',
+    'cinco_campos': '"2024";"01";"0101";"23";"PR"\n',
+    'nove_campos': '"2024";"01";"0101";"23";"PR";"4118501";"1";"5";"9"\n',
+    'numero_invalido_e_crlf': '"2024";"xx";"0101";"23";"";"4118501";"1";"5"\r\n',
+    'decimal_e_na': '"2024";"01";"01.5";"23";"NA";"4118501";"1";"5"\n',
+    'em_branco': '  \n',
+    'aspas_sem_par': '"2024";"01";"0101";"23";"PR";"4118501";"1";"5\n',
+    'aspas_no_meio': '"2024";"01";"0101";"23";"P"R";"4118501";"1";"5"\n',
+    'campos_com_espacos': ' "2024" ;"01"; "0101";"23"; "PR";"4118501";"1";"5" \n',
+    'ponto_e_virgula_entre_aspas': '"2024";"01";"0101";"23";"P;R";"4118501";"1"\n',
+    'retorno_no_meio': '"2024";"01";"0101";"23";"P\rR";"4118501";"1";"5"\n',
+    'aspas_duplicadas': '"2024";"01";"0101";"23";"""PR""";"4118501";"1";"5"\n',
+}
+
+MOTORES_EM_C = [motor for motor in motores_disponiveis() if motor != 'python']
+
+
+def _bloco(*linhas):
+    return [CABECALHO, NORMAL, *linhas, NORMAL]
+
+
+@pytest.mark.parametrize('motor', MOTORES_EM_C)
+@pytest.mark.parametrize('caso', sorted(ANOMALAS))
+def test_motor_igual_ao_python_em_linha_anomala(motor, caso):
+    linhas = _bloco(ANOMALAS[caso])
+    pd.testing.assert_frame_equal(converter_linhas(linhas, 0, motor), converter_linhas(linhas, 0, 'python'))
+
+
+@pytest.mark.parametrize('motor', MOTORES_EM_C)
+def test_motor_igual_ao_python_com_todas_as_anomalas(motor):
+    linhas = _bloco(*ANOMALAS.values())
+    esperado = converter_linhas(linhas, 0, 'python')
+    assert len(esperado) == len(dividir_linhas(linhas))
+    pd.testing.assert_frame_equal(converter_linhas(linhas, 0, motor), esperado)
+
+
+@pytest.mark.parametrize('motor', MOTORES_EM_C)
+def test_motor_em_bloco_do_meio_do_arquivo(motor):
+    # Fora do primeiro bloco (inicio > 0) a primeira linha é dado, não cabeçalho
+    linhas = [NORMAL, *ANOMALAS.values()]
+    pd.testing.assert_frame_equal(converter_linhas(linhas, 5, motor), converter_linhas(linhas, 5, 'python'))
+
+
+@pytest.mark.parametrize('motor', MOTORES_EM_C)
+def test_motor_sem_linhas_validas(motor):
+    linhas = [CABECALHO, ANOMALAS['cinco_campos'], ANOMALAS['em_branco']]
+    pd.testing.assert_frame_equal(converter_linhas(linhas, 0, motor), converter_linhas(linhas, 0, 'python'))
+
+
+@pytest.mark.parametrize('motor', MOTORES_EM_C)
+def test_filtro_em_blocos_igual_entre_motores(motor, tmp_path):
+    arquivo = tmp_path / 'IMP_2024_MUN.csv'
+    outro = '"2024";"02";"0202";"160";"SP";"3550308";"7";"70"\n'
+    arquivo.write_text(''.join(_bloco(*ANOMALAS.values(), outro)), encoding='utf-8')
+
+    for codigos, ufs in ((frozenset({4118501}), None), (None, frozenset({'PR', 'SP'})), (None, None)):
+        esperado, total_esperado, _ = filtrar_arquivo_em_blocos(str(arquivo), codigos, ufs, 64, 'python')
+        df, total, _ = filtrar_arquivo_em_blocos(str(arquivo), codigos, ufs, 64, motor)
+        assert total == total_esperado
+        pd.testing.assert_frame_equal(df, esperado)
+
+
+@pytest.mark.parametrize('motor', MOTORES_EM_C)
+@pytest.mark.parametrize('extensao, abrir', [('.csv', open), ('.csv.gz', gzip.open), ('.csv.xz', lzma.open)])
+def test_filtro_em_bloco_unico_sem_ufs_fantasmas(motor, extensao, abrir, tmp_path):
+    # Num bloco só, o motor em C tipa todas as UFs antes do filtro; o resultado
+    # filtrado não pode guardar as categorias das linhas descartadas
+    arquivo = str(tmp_path / f'IMP_2024_MUN{extensao}')
+    linhas = [CABECALHO, NORMAL] + [f'"2024";"01";"0101";"23";"{uf}";"{codigo}";"1";"5"\n'
+                                    for uf, codigo in (('SP', 3550308), ('SC', 4205407), ('RS', 4314902))]
+    with abrir(arquivo, 'wt', encoding='utf-8') as f:
+        f.write(''.join(linhas + [NORMAL]))
+
+    for codigos, ufs in ((frozenset({4118501}), None), (None, frozenset({'PR', 'SC'}))):
+        esperado, _, _ = filtrar_arquivo_em_blocos(arquivo, codigos, ufs, None, 'python')
+        df, _, _ = filtrar_arquivo_em_blocos(arquivo, codigos, ufs, None, motor)
+        pd.testing.assert_frame_equal(df, esperado)
+        assert list(df['SG_UF_MUN'].cat.categories) == sorted(ufs or {'PR'})
+
+
+def test_motor_desconhecido():
+    with pytest.raises(ValueError):
+        converter_linhas([NORMAL], 1, 'inexistente')
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from esquema import aplicar_esquema
+from f_sh6 import calcular_ordem_hierarquica, calcular_ordem_por_ano
+from ordem_incremental import _contar, atualizar_anos, montar_ordem_hierarquica, montar_ordem_por_ano, reordenar_anos
+
+
+def _registros_com_ausentes():
+    # CO_ANO, SH4, CO_PAIS e VL_FOB com <NA> (inteiros anuláveis, como sai de um CSV com
+    # campos inválidos)
+    linhas = []
+    for i in range(40):
+        linhas.append({'CO_ANO': None if i % 9 == 4 else 2020 + i % 2, 'CO_MES': 1,
+                       'SH4': None if i % 7 == 0 else 100 + i % 4,
+                       'CO_PAIS': None if i % 11 == 0 else i % 3,
+                       'SG_UF_MUN': 'PR', 'CO_MUN': 4118501, 'KG_LIQUIDO': 1,
+                       'VL_FOB': None if i % 13 == 0 else i * 10})
+    df = pd.DataFrame(linhas)
+    for coluna in ('CO_ANO', 'SH4', 'CO_PAIS', 'VL_FOB'):
+        df[coluna] = df[coluna].astype('Int64')
+    return aplicar_esquema(df)
+
+
+def test_contar_ignora_ausentes():
+    codigos, contagens = _contar(pd.Series([3, None, 1, 3, None], dtype='Int16'))
+    assert list(codigos) == [1, 3] and list(contagens) == [1, 2]
+
+
+def test_ordens_com_ausentes_iguais_as_de_f_sh6(tmp_path):
+    df = _registros_com_ausentes()
+    pasta_estado = str(tmp_path / 'estado')
+    assert atualizar_anos(df, pasta_estado) == [2020, 2021, None]
+    reordenar_anos(pasta_estado)
+
+    pd.testing.assert_frame_equal(montar_ordem_por_ano(pasta_estado), calcular_ordem_por_ano(df))
+    pd.testing.assert_frame_equal(montar_ordem_hierarquica(pasta_estado)[0],
+                                  calcular_ordem_hierarquica(df)[0].reset_index(drop=True))
+
+
+def test_registros_sem_ano_na_atualizacao(tmp_path):
+    df = _registros_com_ausentes()
+    pasta_estado = str(tmp_path / 'estado')
+    atualizar_anos(df, pasta_estado)
+    reordenar_anos(pasta_estado)
+
+    # Só os registros sem ano mudaram: os anos numéricos não são regravados
+    df.loc[df['CO_ANO'].isna(), 'VL_FOB'] = 1
+    assert atualizar_anos(df, pasta_estado) == [None]
+    reordenar_anos(pasta_estado)
+    pd.testing.assert_frame_equal(montar_ordem_por_ano(pasta_estado), calcular_ordem_por_ano(df))
+
+    assert atualizar_anos(df[df['CO_ANO'].notna()], pasta_estado, substituir=True) == []
+    assert montar_ordem_por_ano(pasta_estado)['CO_ANO'].notna().all()
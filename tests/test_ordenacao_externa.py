@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from esquema import aplicar_esquema, gravar_tabela, ler_tabela, para_numpy
+from f_sh6 import calcular_ordem_hierarquica, calcular_ordem_por_ano
+from ordenacao_externa import (FREQUENCIAS, POSICAO, _gravar_corrida, contar_frequencias, gerar_corridas,
+                               intercalar_corridas, ordenar_externamente)
+
+ORDENACOES = {'hierarquica': calcular_ordem_hierarquica, 'por_ano': lambda df: (calcular_ordem_por_ano(df),)}
+
+
+def _filtrados(tmp_path, linhas=60):
+    # TSV como o de f_mun_pato, com empates, UF vazia e SH4/VL_FOB ausentes
+    df = pd.DataFrame({
+        'CO_ANO': [2022 + i % 3 for i in range(linhas)],
+        'CO_MES': [i % 12 + 1 for i in range(linhas)],
+        'SH4': [None if i % 11 == 0 else 101 + i % 4 for i in range(linhas)],
+        'CO_PAIS': [23 + i % 3 for i in range(linhas)],
+        'SG_UF_MUN': [None if i % 9 == 0 else 'PR' for i in range(linhas)],
+        'CO_MUN': 4118501,
+        'KG_LIQUIDO': 1,
+        'VL_FOB': [None if i % 13 == 0 else (i * 7) % 5 for i in range(linhas)],
+    })
+    arquivo = str(tmp_path / 'filtrados.tsv')
+    aplicar_esquema(df).to_csv(arquivo, sep='\t', index=False)
+    return arquivo
+
+
+def _ordenar_com_sort_values(arquivo, criterio):
+    df = ler_tabela(arquivo, sep='\t')
+    for coluna, grupo in FREQUENCIAS[criterio].items():
+        df[coluna] = df.groupby(grupo)[grupo[-1]].transform('size')
+    freq_sh4, freq_pais = FREQUENCIAS[criterio]
+    return aplicar_esquema(df.sort_values(['CO_ANO', freq_sh4, freq_pais, 'VL_FOB'],
+                                          ascending=[True, False, False, False], kind='stable'))
+
+
+def _intercalar(arquivo, criterio, linhas_por_bloco, pasta, corrida_vazia=False):
+    contagens = contar_frequencias(arquivo, criterio, linhas_por_bloco)
+    corridas, colunas = gerar_corridas(arquivo, criterio, contagens, linhas_por_bloco, pasta)
+    if corrida_vazia:
+        # Mesmas colunas (e tipos) das outras corridas, sem nenhuma linha
+        vazia = os.path.join(pasta, "corrida_vazia")
+        _gravar_corrida(pd.DataFrame({col: np.load(os.path.join(corridas[0], f"{col}.npy"))[:0]
+                                      for col in colunas + [POSICAO]}), vazia)
+        corridas.insert(1, vazia)
+    saida = os.path.join(pasta, "saida.csv")
+    assert intercalar_corridas(corridas, colunas, criterio, saida, linhas_por_bloco) == 60
+    return len(corridas), pd.read_csv(saida, keep_default_na=False, dtype=str)
+
+
+@pytest.mark.parametrize('criterio', sorted(FREQUENCIAS))
+@pytest.mark.parametrize('linhas_por_bloco, corrida_vazia', [(20, False), (20, True), (1000, False)])
+def test_intercalar_igual_ao_sort_values(criterio, linhas_por_bloco, corrida_vazia, tmp_path):
+    arquivo = _filtrados(tmp_path)
+    esperado = _ordenar_com_sort_values(arquivo, criterio)
+    esperado_csv = str(tmp_path / 'esperado.csv')
+    gravar_tabela(esperado, esperado_csv)
+
+    pasta = str(tmp_path / 'corridas')
+    os.makedirs(pasta)
+    corridas, obtido = _intercalar(arquivo, criterio, linhas_por_bloco, pasta, corrida_vazia)
+    assert corridas == (1 if linhas_por_bloco >= 60 else 3) + corrida_vazia
+    pd.testing.assert_frame_equal(obtido, pd.read_csv(esperado_csv, keep_default_na=False, dtype=str))
+
+
+@pytest.mark.parametrize('criterio', sorted(FREQUENCIAS))
+def test_ordenar_externamente_igual_a_f_sh6(criterio, tmp_path):
+    arquivo = _filtrados(tmp_path)
+    saida, esperado = str(tmp_path / 'externa.csv'), str(tmp_path / 'memoria.csv')
+    ordenar_externamente(arquivo, saida, criterio, memoria_mb=1)
+    gravar_tabela(ORDENACOES[criterio](ler_tabela(arquivo, sep='\t'))[0], esperado)
+
+    with open(saida, encoding='utf-8') as obtido, open(esperado, encoding='utf-8') as referencia:
+        assert obtido.read() == referencia.read()
+
+
+def test_para_numpy_nao_grava_categoria_ausente_como_nan():
+    serie = aplicar_esquema(pd.DataFrame({'SG_UF_MUN': ['PR', None, 'SP']}))['SG_UF_MUN']
+    assert list(para_numpy(serie)) == ['PR', '', 'SP']
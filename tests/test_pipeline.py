@@ -0,0 +1,23 @@
+import os
+
+from esquema import ler_tabela
+from pipeline import executar_pipeline
+
+
+def _municipios_gravados(pasta_saida, prefixo):
+    df = ler_tabela(os.path.join(pasta_saida, f"{prefixo}_ordenados_por_ano_traduzidos.csv"))
+    return set(df['CO_MUN'])
+
+
+def test_uf_sozinha_seleciona_o_estado_inteiro(tmp_path, importacoes_e_dicionarios):
+    pasta, arquivo_sh4, arquivo_pais = importacoes_e_dicionarios
+    saida = str(tmp_path / 'saida')
+
+    assert executar_pipeline(pasta, saida, arquivo_sh4, arquivo_pais, prefixo='uf', uf='SP')
+    assert _municipios_gravados(saida, 'uf') == {3550308, 3509502}
+
+    # Sem município nem UF vale o município padrão; com os dois, a interseção
+    assert executar_pipeline(pasta, saida, arquivo_sh4, arquivo_pais, prefixo='padrao')
+    assert _municipios_gravados(saida, 'padrao') == {4118501}
+    assert executar_pipeline(pasta, saida, arquivo_sh4, arquivo_pais, 4106902, prefixo='ambos', uf='PR')
+    assert _municipios_gravados(saida, 'ambos') == {4106902}
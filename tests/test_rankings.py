@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from esquema import aplicar_esquema
+from f_sh6 import calcular_ordem_hierarquica
+from hierarquia_sh import agregar_celulas
+from rankings import DIMENSOES, maiores, ranking_top, rankings_top
+
+
+def _registros(linhas=300, fluxo=False):
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        'CO_ANO': pd.array(rng.integers(2022, 2025, linhas), dtype='Int64'),
+        'CO_MES': rng.integers(1, 13, linhas),
+        'SH4': pd.array(rng.integers(101, 112, linhas), dtype='Int64'),
+        'CO_PAIS': pd.array(rng.integers(20, 28, linhas), dtype='Int64'),
+        'SG_UF_MUN': 'PR',
+        'CO_MUN': 4118501,
+        'KG_LIQUIDO': rng.integers(1, 50, linhas),
+        'VL_FOB': rng.integers(1, 8, linhas) * 10,
+    })
+    # Códigos ausentes só tiram o registro do ranking da própria dimensão
+    df.loc[::37, 'SH4'] = pd.NA
+    df.loc[5::29, 'CO_PAIS'] = pd.NA
+    df.loc[3::41, 'CO_ANO'] = pd.NA
+    if fluxo:
+        df['FLUXO'] = np.where(np.arange(linhas) % 3 == 0, 'IMP', 'EXP')
+    return aplicar_esquema(df)
+
+
+def _ranking_com_pandas(df, dimensao, medida, k, por_ano):
+    # Referência: soma por código, ordenação completa e corte no k-ésimo valor (com empates)
+    grupo = (['FLUXO'] if 'FLUXO' in df.columns else []) + (['CO_ANO'] if por_ano else [])
+    codigos = DIMENSOES[dimensao]
+    somas = df.assign(REGISTROS=1).groupby(grupo + codigos, observed=True)[['REGISTROS', 'VL_FOB', 'KG_LIQUIDO']]
+    somas = somas.sum().reset_index().sort_values(grupo + [medida] + codigos,
+                                                  ascending=[True] * len(grupo) + [False] + [True] * len(codigos),
+                                                  kind='stable')
+    partes = []
+    for _, parte in (somas.groupby(grupo, observed=True, sort=True) if grupo else [((), somas)]):
+        parte = parte[parte[medida] >= parte[medida].iloc[min(k, len(parte)) - 1]]
+        partes.append(parte.assign(POSICAO=parte[medida].rank(method='min', ascending=False).astype(int)))
+    esperado = pd.concat(partes, ignore_index=True)
+    return esperado[grupo + ['POSICAO'] + codigos + ['REGISTROS', 'VL_FOB', 'KG_LIQUIDO']]
+
+
+@pytest.mark.parametrize('fluxo', [False, True])
+@pytest.mark.parametrize('por_ano', [False, True])
+@pytest.mark.parametrize('medida', ['REGISTROS', 'VL_FOB'])
+@pytest.mark.parametrize('dimensao', sorted(DIMENSOES))
+def test_ranking_igual_ao_pandas(dimensao, medida, por_ano, fluxo):
+    df = _registros(fluxo=fluxo)
+    for k in (1, 3, 1000):
+        obtido = ranking_top(df, dimensao, medida, k, por_ano)
+        esperado = _ranking_com_pandas(df, dimensao, medida, k, por_ano)
+        pd.testing.assert_frame_equal(obtido.astype(str), esperado.astype(str))
+
+
+def test_rankings_iguais_as_frequencias_de_f_sh6():
+    df = _registros()
+    _, freq_sh4, freq_pais = calcular_ordem_hierarquica(df)
+    for coluna, freq in (('SH4', freq_sh4), ('CO_PAIS', freq_pais)):
+        ranking = ranking_top(df, coluna, 'REGISTROS', k=len(freq))
+        assert dict(zip(ranking[coluna], ranking['REGISTROS'])) == dict(zip(freq[coluna], freq[freq.columns[-1]]))
+
+
+def test_rankings_das_celulas_iguais_aos_das_linhas():
+    df = _registros(fluxo=True)
+    celulas = agregar_celulas(df, descartar_ausentes=False)
+    for chave, ranking in rankings_top(df, k=4, por_ano=True).items():
+        pd.testing.assert_frame_equal(ranking, ranking_top(celulas, *chave, k=4, por_ano=True))
+
+
+def test_maiores():
+    valores = np.array([5, 9, 9, 1, 7, 9])
+    assert maiores(valores, 2).tolist() == [1, 2, 5]
+    assert maiores(valores, 2, incluir_empates=False).tolist() == [1, 2]
+    assert maiores(valores, 2, [np.array([0, 3, 2, 0, 0, 1])]).tolist() == [5, 2, 1]
+    assert maiores(valores, 0).tolist() == [] and maiores([], 3).tolist() == []
@@ -0,0 +1,30 @@
+import pytest
+
+import relatorio
+from f_mun_pato import _exibir_mensagens
+
+
+@pytest.fixture
+def nivel_metricas():
+    anterior = dict(relatorio._configuracao)
+    relatorio.definir_verbosidade('metricas')
+    yield
+    relatorio._configuracao.update(anterior)
+
+
+def test_verbosidade_invalida_no_ambiente_usa_o_padrao(monkeypatch, capsys):
+    monkeypatch.setenv('COMEX_VERBOSIDADE', 'verboso')
+    assert relatorio._nivel_do_ambiente() == relatorio.NIVEL_PADRAO
+    assert 'COMEX_VERBOSIDADE' in capsys.readouterr().err
+
+    monkeypatch.setenv('COMEX_VERBOSIDADE', 'detalhado')
+    assert relatorio._nivel_do_ambiente() == 'detalhado'
+
+
+def test_mensagens_de_arquivo_com_erro_aparecem_no_modo_metricas(nivel_metricas, capsys):
+    _exibir_mensagens(["--- Processando: EXP_2023.csv ---", "✅ 10 registros lidos"], {'arquivo': 'EXP_2023.csv'})
+    assert capsys.readouterr().err == ''
+
+    _exibir_mensagens(["--- Processando: EXP_2024.csv ---", "❌ Erro: falhou"], {'erro': 'falhou'})
+    saida = capsys.readouterr().err
+    assert 'EXP_2024.csv' in saida and '❌ Erro: falhou' in saida